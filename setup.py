@@ -25,7 +25,7 @@ with open("README.rst", "r") as fh:
 
 setup_requirements = []
 
-test_requirements = []
+test_requirements = ['pytest']
 
 setup(
     name='uatg',
@@ -0,0 +1,100 @@
+# See LICENSE.incore for details
+"""Fixtures shared by the tests of uatg."""
+
+from os import makedirs
+from os.path import join
+
+import pytest
+
+from uatg.test_generator import generate_tests
+
+plugin_template = '''from yapsy.IPlugin import IPlugin
+
+
+class {name}(IPlugin):
+
+    def execute(self, config_dict):
+        with open({calls!r}, 'a') as f:
+            f.write('{name}\\n')
+        return True
+
+    def generate_asm(self):
+        return [{{'asm_code': '{code}', 'asm_data': '', 'asm_sig': '',
+                  'name_postfix': str(i)}} for i in range({tests})]
+'''
+
+
+def write_plugin(modules_dir, module, name, code='nop', tests=2):
+    """
+        writes the test plugin name into the module. The plugin records each
+        of its runs in the calls.log file of modules_dir.
+    """
+    with open(join(modules_dir, module, name + '.py'), 'w') as f:
+        f.write(plugin_template.format(name=name, code=code, tests=tests,
+                                       calls=join(modules_dir, 'calls.log')))
+
+
+def plugin_calls(modules_dir):
+    """
+        :return: names of the plugins run since the last call, in the order
+                 of the runs
+    """
+    path = join(modules_dir, 'calls.log')
+    try:
+        with open(path) as f:
+            calls = f.read().split()
+    except FileNotFoundError:
+        return []
+    open(path, 'w').close()
+    return calls
+
+
+@pytest.fixture
+def modules_dir(tmp_path):
+    """
+        modules directory with a 'demo' module of three enabled plugins
+    """
+    modules_dir = str(tmp_path / 'modules')
+    makedirs(join(modules_dir, 'demo'))
+    names = [f'demo_{i}' for i in range(3)]
+    for name in names:
+        write_plugin(modules_dir, 'demo', name)
+    with open(join(modules_dir, 'index.yaml'), 'w') as f:
+        f.write('demo:\n' + ''.join(f'  {name}: True\n' for name in names))
+    return modules_dir
+
+
+@pytest.fixture
+def demo_plugin(modules_dir):
+    """
+        function (re)writing a test plugin of the demo module, with the
+        keyword arguments of write_plugin
+    """
+    def demo_plugin(name, **kwargs):
+        write_plugin(modules_dir, 'demo', name, **kwargs)
+    return demo_plugin
+
+
+@pytest.fixture
+def plugin_runs(modules_dir):
+    """
+        function returning the names of the plugins run since its last call
+    """
+    return lambda: plugin_calls(modules_dir)
+
+
+@pytest.fixture
+def generate(modules_dir):
+    """
+        function generating the tests of the demo module into a work
+        directory, with the keyword arguments of generate_tests
+    """
+    def generate(work_dir, linker_dir=None, isa='RV64IMAFDCZicsr_Zifencei',
+                 **kwargs):
+        config_dict = {'isa_dict': {'hart0': {'ISA': isa}}}
+        generate_tests(work_dir=work_dir, linker_dir=linker_dir or work_dir,
+                       modules=['demo'], config_dict=config_dict,
+                       test_list='True', modules_dir=modules_dir,
+                       index_path=join(modules_dir, 'index.yaml'),
+                       paging_modes=None, jobs=1, **kwargs)
+    return generate
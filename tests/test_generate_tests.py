@@ -0,0 +1,94 @@
+# See LICENSE.incore for details
+"""Tests of uatg.test_generator.generate_tests."""
+
+from glob import glob
+from os import makedirs, remove, stat
+from os.path import join
+
+import pytest
+
+from uatg.utils import create_linker, create_model_test_h, load_yaml
+
+
+def mtimes(work_dir):
+    """
+        :return: modification time of each file generated in work_dir
+    """
+    paths = glob(join(work_dir, 'demo', '*', '*.S')) + [
+        join(work_dir, name)
+        for name in ('link.ld', 'model_test.h', 'makefile', 'test_list.yaml')
+    ]
+    return {path: stat(path).st_mtime_ns for path in paths}
+
+
+@pytest.mark.parametrize('user_files', [False, True])
+def test_deterministic_run_keeps_unchanged_files(generate, tmp_path,
+                                                 user_files):
+    work_dir = str(tmp_path / 'work')
+    linker_dir = str(tmp_path / 'target')
+    makedirs(linker_dir)
+    if user_files:
+        create_linker(target_dir=linker_dir)
+        create_model_test_h(target_dir=linker_dir)
+
+    generate(work_dir, linker_dir, deterministic=True)
+    before = mtimes(work_dir)
+    assert len(before) == 3 * 2 + 4
+
+    generate(work_dir, linker_dir, deterministic=True)
+    assert mtimes(work_dir) == before
+
+
+@pytest.mark.parametrize('isa, xlen, march', [
+    ('RV32IMACZicsr', 32, 'rv32imac_zicsr'),
+    ('RV64IMAFDCZicsr_Zifencei', 64, 'rv64imafdc_zicsr_zifencei'),
+])
+def test_tests_follow_the_isa_profile(generate, tmp_path, isa, xlen, march):
+    work_dir = str(tmp_path / 'work')
+    generate(work_dir, isa=isa)
+    test_list = load_yaml(join(work_dir, 'test_list.yaml'), typ='safe')
+    assert len(test_list) == 3 * 2
+    for entry in test_list.values():
+        assert entry['compile_macros'] == [f'XLEN={xlen}']
+        assert entry['march'] == march
+    with open(join(work_dir, 'makefile')) as f:
+        assert f.read().count(f'-march={march} ') == 3 * 2
+
+
+def test_incremental_run_skips_unchanged_plugins(generate, demo_plugin,
+                                                 plugin_runs, tmp_path):
+    work_dir = str(tmp_path / 'work')
+    generate(work_dir, incremental=True)
+    assert sorted(plugin_runs()) == ['demo_0', 'demo_1', 'demo_2']
+    # the plugins are ordered by yapsy, only the deterministic mode sorts
+    # them
+    with open(join(work_dir, 'makefile')) as f:
+        makefile = sorted(f.read().split())
+    before = mtimes(work_dir)
+
+    generate(work_dir, incremental=True)
+    assert plugin_runs() == []
+    with open(join(work_dir, 'makefile')) as f:
+        assert sorted(f.read().split()) == makefile
+
+    # only the changed plugin runs again, the other tests are kept
+    demo_plugin('demo_1', code='addi x1, x1, 1')
+    generate(work_dir, incremental=True)
+    assert plugin_runs() == ['demo_1']
+    after = mtimes(work_dir)
+    for path in glob(join(work_dir, 'demo', 'demo_0-*', '*.S')):
+        assert after[path] == before[path]
+    for path in glob(join(work_dir, 'demo', 'demo_1-*', '*.S')):
+        with open(path) as f:
+            assert 'addi x1, x1, 1' in f.read()
+
+    # a plugin whose tests are missing runs again
+    remove(glob(join(work_dir, 'demo', 'demo_2-*', '*.S'))[0])
+    generate(work_dir, incremental=True)
+    assert plugin_runs() == ['demo_2']
+
+    # a run with other arguments, or without incremental, runs every plugin
+    generate(work_dir, incremental=True, deterministic=True)
+    assert len(plugin_runs()) == 3
+    generate(work_dir)
+    assert len(plugin_runs()) == 3
@@ -0,0 +1,144 @@
+# See LICENSE.incore for details
+"""Tests of the illegal instruction generators of instruction_constants."""
+
+import sys
+from itertools import combinations
+
+import pytest
+
+from uatg.instruction_constants import illegal_generator, iter_illegal, \
+    illegal_array, encoding_fields, rv32_encodings, rv64_encodings
+
+isas = ['RV32I', 'RV64I', 'RV32IMAF', 'RV64IMAFD']
+
+
+def baseline_illegal(isa):
+    """
+        :return: the illegal instructions of isa, enumerated the way the
+                 original illegal_generator did
+    """
+    encodings = rv32_encodings if 'RV32' in isa else rv64_encodings
+    instructions = {}
+    for extension in isa[4:]:
+        for inst in encodings[extension.lower()]:
+            consts = {}
+            for field in inst.split():
+                if field[0].isalpha():
+                    continue
+                end, beg = field.split('..')
+                beg, val = beg.split('=')
+                consts.setdefault((int(beg), int(end)), set()).add(
+                    int(val, 16))
+            opcode = (min(consts.pop((2, 6))) << 2) + min(consts.pop((0, 1)))
+            # as in the original, the opcodes without other fields (lui,
+            # auipc) are not recorded, and an instruction with a new field
+            # replaces the fields of its opcode
+            try:
+                for key in consts:
+                    instructions[opcode][key].update(consts[key])
+            except KeyError:
+                instructions[opcode] = consts
+
+    illegal_list = [i for i in range(2**7)
+                    if i not in instructions and i % 4 == 3]
+    for opcode, legal_values in instructions.items():
+        for j in range(1, len(legal_values) + 1):
+            for selection in combinations(legal_values, j):
+                legal_fields = [rng for rng in legal_values
+                                if rng not in selection]
+                for beg_i, end_i in selection:
+                    for ival in (set(range(2**(end_i - beg_i + 1))) -
+                                 legal_values[(beg_i, end_i)]):
+                        if not legal_fields:
+                            illegal_list.append(opcode + (ival << beg_i))
+                        for beg_l, end_l in legal_fields:
+                            for lval in legal_values[(beg_l, end_l)]:
+                                illegal_list.append(opcode + (ival << beg_i) +
+                                                    (lval << beg_l))
+
+    # the special cases, which the original applied after every opcode
+    for i, inst in enumerate(illegal_list):
+        opcode = inst % 128
+        if opcode in (55, 23, 19, 27, 51, 59) and (inst >> 7) % 32 == 0:
+            inst += 6 << 7
+        if opcode in (3, 35) and (inst >> 15) % 32 == 0:
+            inst += 5 << 15
+        if opcode == 47 and (inst >> 12) % 8 in (2, 3):
+            inst -= 2 << 12
+        illegal_list[i] = inst
+    return illegal_list
+
+
+@pytest.fixture(scope='module', params=isas)
+def baseline(request):
+    return request.param, baseline_illegal(request.param)
+
+
+def test_illegal_generator_matches_the_baseline(baseline):
+    isa, expected = baseline
+    assert illegal_generator(isa) == expected
+
+
+def test_iter_illegal_matches_the_baseline(baseline):
+    isa, expected = baseline
+    assert list(iter_illegal(isa)) == expected
+
+
+def test_illegal_array_matches_the_baseline(baseline, tmp_path):
+    np = pytest.importorskip('numpy')
+    isa, expected = baseline
+    words = illegal_array(isa, unique=False)
+    assert words.dtype == np.uint32
+    assert words.tolist() == expected
+    assert illegal_array(isa).tolist() == sorted(set(expected))
+
+    path = str(tmp_path / 'illegal.npy')
+    saved = illegal_array(isa, path=path)
+    assert saved.tolist() == sorted(set(expected))
+    assert np.load(path).tolist() == sorted(set(expected))
+
+
+def test_illegal_array_needs_numpy(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+    with pytest.raises(ImportError, match='pip install numpy'):
+        illegal_array('RV32I')
+
+
+@pytest.mark.parametrize('stratify', [None, 'opcode', 'fields'])
+def test_illegal_sample_is_drawn_from_the_baseline(baseline, stratify):
+    isa, expected = baseline
+    sample = illegal_generator(isa, sample=200, seed=3, stratify=stratify)
+    assert len(sample) == 200
+    assert len(set(sample)) == 200
+    assert set(sample) <= set(expected)
+    assert sample == illegal_generator(isa, sample=200, seed=3,
+                                       stratify=stratify)
+    assert sample != illegal_generator(isa, sample=200, seed=4,
+                                       stratify=stratify)
+
+
+@pytest.mark.parametrize('stratify', [None, 'opcode', 'fields'])
+def test_illegal_sample_exhausts_the_baseline(baseline, stratify):
+    isa, expected = baseline
+    sample = illegal_generator(isa, sample=len(expected) + 10, seed=1,
+                               stratify=stratify)
+    assert sorted(sample) == sorted(set(expected))
+
+
+def test_illegal_sample_per_opcode(baseline):
+    isa, expected = baseline
+    instructions = encoding_fields(isa)
+
+    def opcode(inst):
+        # the illegal opcodes share one stratum
+        return inst % 128 if inst % 128 in instructions else None
+
+    opcodes = {opcode(inst) for inst in expected}
+    sample = illegal_generator(isa, sample=len(opcodes), seed=0,
+                               stratify='opcode')
+    assert {opcode(inst) for inst in sample} == opcodes
+
+
+def test_illegal_sample_rejects_unknown_strata():
+    with pytest.raises(ValueError, match='Invalid stratify option'):
+        illegal_generator('RV32I', sample=1, stratify='width')
@@ -0,0 +1,117 @@
+# See LICENSE.incore for details
+"""Tests of uatg.instruction_generator."""
+
+from shutil import copyfile
+
+import pytest
+from ruamel.yaml import YAML
+
+from uatg import instruction_generator as generator_module
+from uatg.instruction_generator import instruction_generator, asm_template, \
+    isa_instruction_tables, isem_file, load_isem, field_range, freeze_field, \
+    random_field
+from uatg.utils import load_yaml
+
+
+@pytest.mark.parametrize('lo, hi, step, exclude', [
+    (-2048, 2048, 1, ()),
+    (-32, 32, 16, {0}),
+    (1, 64, 1, {1, 63, 100}),
+    (-512, 512, 16, {-512, 0, 496}),
+    (0, 1, 1, ()),
+])
+def test_field_range_matches_the_set(lo, hi, step, exclude):
+    field = field_range(lo, hi, step, exclude=exclude)
+    expected = [str(val) for val in range(lo, hi, step) if val not in exclude]
+    assert len(field) == len(expected)
+    assert list(field) == expected
+    assert [field[i] for i in range(len(field))] == expected
+    assert field[-1] == expected[-1]
+    with pytest.raises(IndexError):
+        field[len(field)]
+    for val in range(lo - step, hi + step):
+        assert (val in field) == (str(val) in expected)
+        assert (str(val) in field) == (str(val) in expected)
+    for val in exclude:
+        assert val not in field
+    assert 'x1' not in field and None not in field
+    for _ in range(100):
+        assert field.choice() in expected
+        assert random_field(field) in expected
+    assert set(random_field(field, len(field))) == set(expected)
+
+
+def test_default_immediates():
+    modifiers = instruction_generator('RV64IMAFDC').default_modifiers
+    assert set(modifiers['$imm12']) == {str(num)
+                                        for num in range(-2048, 2048)}
+    assert set(modifiers['$nzimm6']) == {'-32', '-16', '16'}
+    assert set(modifiers['$nzuimm8']) == {str(num)
+                                          for num in range(16, 256, 16)}
+    assert set(modifiers['shamt5']) == {str(num) for num in range(1, 32)}
+
+
+def test_user_modifiers_restrict_the_fields():
+    generator = instruction_generator('RV64IMAFDC')
+    modifiers = {'xrd': {'x5'}, 'xrs1': ['x6'], '$imm12': field_range(7, 8)}
+    for inst in generator.generate_i_inst(['addi'], modifiers=modifiers,
+                                          no_of_insts=20):
+        assert inst == 'addi x5, x6, 7'
+
+
+def test_freeze_field():
+    field = field_range(0, 4)
+    assert freeze_field(field) is field
+    assert freeze_field('x1') == ('x1',)
+    assert freeze_field(['x2', 'x1']) == ('x2', 'x1')
+    assert freeze_field({'x2', 'x1', 'x10'}) == ('x1', 'x10', 'x2')
+
+
+def test_asm_template_slots():
+    template = asm_template('addi $xrd, $xrs1, $imm12',
+                            lambda field, syntax: field)
+    assert template.head == 'addi '
+    assert template.slots == (('xrd', '$xrd', ', '), ('xrs1', '$xrs1', ', '),
+                              ('imm12', '$imm12', ''))
+    assert template.render({'xrd': ('x1',), 'xrs1': ('x2',),
+                            'imm12': ('-5',)}) == 'addi x1, x2, -5'
+    # slots without a modifier are left as placeholders
+    assert template.render({'xrd': ('x1',)}) == 'addi x1, $xrs1, $imm12'
+
+
+@pytest.mark.parametrize('extension', 'imafdc')
+def test_generated_instructions_fill_every_field(extension):
+    generator = instruction_generator('RV64IMAFDC')
+    instructions = getattr(generator, f'generate_all_{extension}_inst')()
+    assert instructions
+    assert not [inst for inst in instructions if '$' in inst]
+
+
+def test_isa_tables_follow_the_contents_of_isem(tmp_path, monkeypatch):
+    monkeypatch.setenv('UATG_CACHE_DIR', str(tmp_path / 'cache'))
+    tables = isa_instruction_tables('RV64IM', isem_file)
+
+    # the same contents at another path share the tables
+    copy = str(tmp_path / 'copy.yaml')
+    copyfile(isem_file, copy)
+    assert isa_instruction_tables('RV64IM', copy) is tables
+
+    # other contents get their own database and tables
+    isem = load_yaml(isem_file, typ='safe')
+    isem['m_extension'].pop('mul')
+    edited = str(tmp_path / 'edited.yaml')
+    with open(edited, 'w') as f:
+        YAML(typ='safe').dump(isem, f)
+    assert load_isem(edited) is not load_isem(isem_file)
+    assert 'mul' not in isa_instruction_tables('RV64IM', edited)['m']
+    assert 'mul' in tables['m']
+
+
+def test_isa_tables_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(generator_module, 'isa_tables_memo', {})
+    size = generator_module.isa_tables_memo_size
+    isas = [f'RV64I{extensions}' for extensions in
+            ('', 'M', 'MA', 'MAF', 'MAFD', 'MAFDC', 'C', 'MC', 'AC', 'MAC')]
+    for i in range(size + 1):
+        isa_instruction_tables(isas[i % len(isas)] + f'_Zx{i}')
+    assert len(generator_module.isa_tables_memo) == size
@@ -0,0 +1,301 @@
+# See LICENSE.incore for details
+"""Tests of uatg.log_scanner, against re.findall on the whole log."""
+
+import gzip
+import re
+from random import Random
+
+import pytest
+
+import uatg.log_scanner as ls
+import uatg.regex_formats as rf
+from uatg.log_scanner import find_log, multi_line_patterns, \
+    parse_bpu_log, query_log, scan_log, single_line_patterns
+
+ci_types = ['Branch', 'JAL', 'Call', 'Ret']
+
+
+def bpu_line(r):
+    """
+        :param r: Random generating the line
+        :return: list of the text of one or more BPU log lines, without the
+                 cycle
+    """
+    k = r.random()
+    if k < .15:
+        return [f"Received Request: PredictionRequest {{ pc: "
+                f"'h{r.getrandbits(40):016x}, fence: False, discard: False "
+                f"}} ghr: {r.getrandbits(8):08b}"]
+    if k < .25:
+        return [f'Match:{r.getrandbits(8):08b}']
+    if k < .35:
+        return [f"BTB Hit: BTBEntry {{ target: "
+                f"'h{r.getrandbits(40):016x}, ci: {r.choice(ci_types)}, "
+                f"instr16: False, hi: False }}"]
+    if k < .45:
+        return [f"Received Training: Training_data {{ pc: "
+                f"'h{r.getrandbits(40):016x}, target: "
+                f"'h{r.getrandbits(40):016x}, state: 'h{r.randint(0, 3)}, "
+                f"ci: {r.choice(ci_types)}, btbhit: "
+                f"{r.choice(['False', 'True'])}, instr16: False, history: "
+                f"'h{r.randint(0, 99):02d} }}"]
+    if k < .5:
+        return [f'Training existing Entry index:  {r.randint(0, 63)} '
+                f'ghr: {r.getrandbits(8):08b}']
+    if k < .55:
+        return [f'Allocating new index:  {r.randint(0, 63)} '
+                f'ghr: {r.getrandbits(8):08b}']
+    if k < .57:
+        return ['Conflict Detected']
+    if k < .61:
+        return [f'Pushing into RAS:{r.getrandbits(40):016x}']
+    if k < .64:
+        return [f'Choosing from top RAS:{r.getrandbits(40):016x}']
+    if k < .7:
+        return [f'New GHR: {r.getrandbits(8):08b}']
+    if k < .75:
+        return [f'BHTindex_:{r.randint(0, 511)} '
+                f'Target:{r.getrandbits(30):016d} Pred:{r.randint(0, 3)} '
+                f'ghr: {r.getrandbits(8):08b}']
+    if k < .8:
+        return [f'Misprediction fired. Restoring ghr: '
+                f'{r.getrandbits(8):08b}']
+    if k < .84:
+        # a fence, or a broken one which the fence pattern does not match
+        return ['Fenced, Valid Bits -> 0 ', 'Match:00000000 ',
+                r.choice(['rg_allocate -> 00', 'rg_allocate -> 0x']),
+                'current_ghr -> 00000000 ']
+    return None
+
+
+def log_text(seed, lines):
+    """
+        :return: text of a BPU log of about lines lines, with the lines of
+                 the other stages in between
+    """
+    r = Random(seed)
+    out = []
+    cycle = 100
+    for _ in range(lines):
+        cycle += r.randint(0, 20)
+        texts = bpu_line(r)
+        if texts is None:
+            out.append(f'[{cycle:10d}] [ 0]FETCH : pc '
+                       f'0x{r.getrandbits(32):08x}')
+        else:
+            out += [f'[{cycle:10d}] [ 0]BPU : {text}' for text in texts]
+    return '\n'.join(out) + '\n'
+
+
+@pytest.fixture(scope='module')
+def log_text_4000():
+    return log_text(0, 4000)
+
+
+@pytest.fixture(params=['log', 'log.gz'])
+def log_path(request, tmp_path, log_text_4000):
+    """
+        path of the log of log_text_4000, plain or compressed
+    """
+    path = str(tmp_path / request.param)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        f.write(log_text_4000)
+    return path
+
+
+def pattern_names():
+    return sorted(list(single_line_patterns()) + list(multi_line_patterns))
+
+
+def test_scan_log_matches_findall(log_path, log_text_4000):
+    matches = scan_log(log_path)
+    assert sorted(matches) == pattern_names()
+    for name in pattern_names():
+        assert matches[name] == re.findall(getattr(rf, name),
+                                           log_text_4000), name
+    # the log holds matches of every pattern
+    assert all(matches.values())
+
+
+def test_scan_log_counts_and_names(log_path, log_text_4000):
+    names = ['misprediction_pattern', 'fence_executed_pattern',
+             'btb_hit_pattern']
+    counts = scan_log(log_path, names, counts_only=True)
+    assert counts == {
+        name: len(re.findall(getattr(rf, name), log_text_4000))
+        for name in names
+    }
+    with pytest.raises(ValueError):
+        scan_log(log_path, ['no_such_pattern'])
+
+
+def test_multi_line_patterns():
+    assert multi_line_patterns['fence_executed_pattern'] is not None
+    assert 'fence_executed_pattern' not in single_line_patterns()
+
+
+def test_scan_log_of_a_fence_at_the_end(tmp_path):
+    path = tmp_path / 'log'
+    text = log_text(1, 20) + ''.join(
+        f'[       999] [ 0]BPU : {line}\n'
+        for line in ['Fenced, Valid Bits -> 0 ', 'Match:00000000 ',
+                     'rg_allocate -> 00', 'current_ghr -> 00000000 '])
+    path.write_text(text)
+    matches = scan_log(str(path), ['fence_executed_pattern'])
+    assert matches['fence_executed_pattern'] == \
+        re.findall(rf.fence_executed_pattern, text)
+    assert matches['fence_executed_pattern']
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+def test_query_log_finds_all_the_matches(monkeypatch, log_path,
+                                         log_text_4000, use_index):
+    # small blocks, so that the fences span the ends of the blocks
+    monkeypatch.setattr(ls, 'query_block_size', 4096)
+    names = ['fence_executed_pattern', 'misprediction_pattern',
+             'conflict_pattern']
+    found, matches = query_log(log_path, dict.fromkeys(names, 10 ** 6),
+                               use_index=use_index)
+    assert not found
+    for name in names:
+        assert matches[name] == re.findall(getattr(rf, name), log_text_4000)
+
+
+def cycles(text):
+    """
+        :return: list of the cycles and the lines of the text
+    """
+    return [(int(line[1:11]), line) for line in text.splitlines()]
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+@pytest.mark.parametrize('window', [(None, None), (5000, None),
+                                    (None, 20000), (12000, 30000)])
+def test_query_log_of_a_cycle_window(monkeypatch, log_path, log_text_4000,
+                                     use_index, window):
+    monkeypatch.setattr(ls, 'query_block_size', 4096)
+    first, last = window
+    text = ''.join(
+        line + '\n' for cycle, line in cycles(log_text_4000)
+        if (first is None or cycle >= first) and
+        (last is None or cycle <= last))
+    names = ['misprediction_pattern', 'btb_hit_pattern']
+    expected = {
+        name: re.findall(getattr(rf, name), text)[:3] for name in names
+    }
+    found, matches = query_log(log_path, dict.fromkeys(names, 3),
+                               first_cycle=first, last_cycle=last,
+                               use_index=use_index)
+    assert found
+    assert matches == expected
+
+
+@pytest.mark.parametrize('use_index', [True, False])
+def test_query_log_in_order(log_path, log_text_4000, use_index):
+    fences = [
+        match.start() for match in
+        re.finditer(rf.fence_executed_pattern, log_text_4000)
+    ]
+    after = re.findall(rf.misprediction_pattern,
+                       log_text_4000[fences[0]:])
+    found, matches = query_log(log_path, ['fence_executed_pattern',
+                                          'misprediction_pattern'],
+                               in_order=True, use_index=use_index)
+    assert found
+    assert matches['misprediction_pattern'] == after[:1]
+    # nothing follows the last line of the log
+    found, _ = query_log(log_path, ['misprediction_pattern',
+                                    'fence_executed_pattern'],
+                         first_cycle=cycles(log_text_4000)[-1][0] + 1,
+                         use_index=use_index)
+    assert not found
+
+
+def test_query_log_index(log_path, log_text_4000):
+    compressed = log_path.endswith('.gz')
+    query_log(log_path, ['conflict_pattern'])
+    index_path = log_path + ls.log_index_suffix
+    assert find_log(log_path) == log_path
+    if compressed:
+        # the compressed logs are not indexed
+        with pytest.raises(FileNotFoundError):
+            open(index_path)
+        return
+    with open(index_path) as f:
+        first = f.read()
+    found, matches = query_log(log_path, {'conflict_pattern': 2})
+    assert found
+    assert matches['conflict_pattern'] == \
+        re.findall(rf.conflict_pattern, log_text_4000)[:2]
+    with open(index_path) as f:
+        assert f.read() == first
+    # the index is written again for a changed log
+    with open(log_path, 'a') as f:
+        f.write('[  99999999] [ 0]BPU : Conflict Detected\n')
+    found, matches = query_log(log_path, {'conflict_pattern': 10 ** 6})
+    assert matches['conflict_pattern'][-1] == \
+        '[  99999999] [ 0]BPU : Conflict Detected'
+    with open(index_path) as f:
+        assert f.read() != first
+
+
+def test_find_log(tmp_path):
+    path = str(tmp_path / 'log')
+    with pytest.raises(FileNotFoundError):
+        find_log(path)
+    with gzip.open(path + '.gz', 'wt') as f:
+        f.write('')
+    assert find_log(path) == path + '.gz'
+
+
+def test_parse_bpu_log_counts(log_path, log_text_4000):
+    trace = parse_bpu_log(log_path)
+    kinds = {
+        'prediction_request': rf.pred_req_pattern,
+        'btb_hit': rf.btb_hit_pattern,
+        'training': rf.train_data_pattern,
+        'train_existing': rf.train_existing_pattern,
+        'allocate': rf.alloc_newind_pattern,
+        'conflict': rf.conflict_pattern,
+        'ras_push': rf.pushing_to_ras_pattern,
+        'ras_pop': rf.choosing_top_ras_pattern,
+        'new_ghr': rf.new_ghr_pattern,
+        'bht_index': rf.bht_ind_target_pattern,
+        'misprediction': rf.misprediction_pattern,
+    }
+    for kind, pattern in kinds.items():
+        assert trace.count(kind) == len(re.findall(pattern,
+                                                   log_text_4000)), kind
+    # the fences are counted by their first line
+    assert trace.count('fence') == log_text_4000.count('Fenced, Valid')
+    assert list(trace.cycle) == sorted(trace.cycle)
+    assert trace.btb_hit_rate() == \
+        trace.count('btb_hit') / trace.count('prediction_request')
+    assert trace.misprediction_rate() == \
+        trace.count('misprediction') / trace.count('training')
+
+
+def test_parse_bpu_log_fields(log_path, log_text_4000):
+    trace = parse_bpu_log(log_path)
+    rows = trace.rows('misprediction')
+    ghrs = re.findall(r'Misprediction fired\. Restoring ghr: (\d+)',
+                      log_text_4000)
+    assert [trace.ghr[row] for row in rows] == [int(g, 2) for g in ghrs]
+    rows = trace.rows('prediction_request')
+    pcs = re.findall(r"Received Request: PredictionRequest \{ pc: 'h(\w+)",
+                     log_text_4000)
+    assert [trace.pc[row] for row in rows] == [int(pc, 16) for pc in pcs]
+    rows = trace.rows('btb_hit')
+    cis = re.findall(r'BTB Hit: .*? ci: (\w+)', log_text_4000)
+    assert [trace.ci_names[trace.ci[row]] for row in rows] == cis
+    rows = trace.rows('allocate')
+    indices = re.findall(r'Allocating new index:  (\d+)', log_text_4000)
+    assert [trace.index[row] for row in rows] == [int(i) for i in indices]
+
+
+def test_ras_depth():
+    trace = ls.bpu_trace()
+    push, pop = (trace.kinds.index(kind) for kind in ('ras_push', 'ras_pop'))
+    trace.kind.extend([pop, push, push, push, pop, pop, pop, pop, push])
+    assert list(trace.ras_depth()) == [0, 1, 2, 3, 2, 1, 0, 0, 1]
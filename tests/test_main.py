@@ -0,0 +1,42 @@
+# See LICENSE.incore for details
+"""Tests of the uatg command line."""
+
+from logging import INFO
+
+from click.testing import CliRunner
+
+from uatg.log import logger
+from uatg.main import cli
+
+
+def test_from_config_warns_about_max_compile_failures(generate, modules_dir,
+                                                      tmp_path, caplog,
+                                                      monkeypatch):
+    work_dir = str(tmp_path / 'work')
+    generate(work_dir, toolchain='stub')
+    config_file = tmp_path / 'config.ini'
+    config_file.write_text(f'''[uatg]
+module_dir = {modules_dir}
+modules = demo
+work_dir = {work_dir}
+linker_dir = {work_dir}
+index_file = {modules_dir}/index.yaml
+paging_modes = sv39
+jobs = 1
+gen_test_list = False
+gen_test = False
+test_compile = True
+max_compile_failures = some
+gen_cvg = False
+val_test = False
+clean = False
+''')
+    # the command line adds a stream handler to the logger on every run
+    monkeypatch.setattr(logger, 'level', lambda lvl: None)
+    with caplog.at_level(INFO, logger='uatg'):
+        result = CliRunner().invoke(cli,
+                                    ['from-config', '-c', str(config_file)])
+    assert result.exit_code == 0, result.output
+    assert "max_compile_failures should be a non-negative integer, not " \
+           "'some'" in caplog.text
+    assert "6 passed, 0 failed, 0 skipped" in caplog.text
@@ -0,0 +1,82 @@
+# See LICENSE.incore for details
+"""Tests of uatg.toolchain."""
+
+from os import environ
+from os.path import dirname
+from shlex import split
+from subprocess import run, PIPE
+
+import pytest
+
+import uatg
+from uatg.toolchain import check_test, check_arguments, get_toolchain, \
+    stub_arguments
+from uatg.utils import get_isa_profile
+
+
+def write_test(tmp_path, code):
+    """
+        :return: path of an assembly test holding code
+    """
+    (tmp_path / 'defs.h').write_text('#define MY_MACRO(x) addi x, x, 1\n'
+                                     'helper_label:\n')
+    path = tmp_path / 'test.S'
+    path.write_text('#include "defs.h"\n' + code)
+    return str(path)
+
+
+def test_check_test_accepts_a_valid_test(tmp_path):
+    test = write_test(tmp_path, 'start:\n'
+                                '\taddi x1, x2, 3; c.addi x1, 1\n'
+                                '1:\tlr.w.aq x5, (x6)\n'
+                                '\tbne x1, x0, 1b\n'
+                                '\tj end /* comment */ # comment\n'
+                                '\tMY_MACRO(x3)\n'
+                                '\tCMD_MACRO\n'
+                                '\tjal helper_label\n'
+                                'end:\tnop\n')
+    assert check_test(test, macros=['CMD_MACRO']) == []
+
+
+@pytest.mark.parametrize('code, error', [
+    ('\tbogus x1, x2\n', "3: Error: unrecognized opcode `bogus x1, x2'"),
+    ('\tCMD_MACRO\n', "3: Error: unrecognized opcode `CMD_MACRO'"),
+    ('\tj missing\n', "3: undefined reference to `missing'"),
+    ('1:\n\tbeq x1, x2, 1f\n', "4: undefined reference to `1f'"),
+    ('#include "absent.h"\n', '3: fatal error: absent.h: No such file or '
+                              'directory'),
+])
+def test_check_test_reports_errors(tmp_path, code, error):
+    test = write_test(tmp_path, '\tnop\n' + code)
+    assert check_test(test) == [f'{test}:{error}']
+
+
+def test_stub_toolchain_command(tmp_path):
+    test = write_test(tmp_path, '\tMY_MACRO(x1)\n\tCMD_MACRO\n')
+    command = get_toolchain('stub').command(
+        profile=get_isa_profile('RV64IMAC'), link_path=str(tmp_path),
+        test_path=test, env_path=str(tmp_path), work_dir=str(tmp_path),
+        compile_macros=['XLEN=64', 'CMD_MACRO'])
+    args = stub_arguments(split(command))
+    assert args is not None
+    assert '-march=rv64imac' in args and '-mabi=lp64' in args
+    assert check_arguments(args) == []
+    assert stub_arguments(['riscv64-unknown-elf-gcc', test]) is None
+
+    # the makefile runs the command as a process
+    env = dict(environ, PYTHONPATH=dirname(dirname(uatg.__file__)))
+    assert run(split(command), stdout=PIPE, stderr=PIPE,
+               env=env).returncode == 0
+    out = run(split(command.replace(' -DCMD_MACRO', '')), stdout=PIPE,
+              stderr=PIPE, env=env)
+    assert out.returncode == 1
+    assert b"unrecognized opcode `CMD_MACRO'" in out.stderr
+
+
+def test_get_toolchain():
+    profile = get_isa_profile('RV32IMAC')
+    assert get_toolchain('gcc').command(profile, 'ld', 'a.S', 'env', 'work',
+                                        []).startswith(
+        'riscv32-unknown-elf-gcc -mcmodel=medany ')
+    assert get_toolchain('/opt/bin/gcc').compiler == '/opt/bin/gcc'
+    assert get_toolchain('gcc') is get_toolchain('gcc')
@@ -0,0 +1,106 @@
+# See LICENSE.incore for details
+"""Tests of uatg.utils."""
+
+from glob import glob
+from os import listdir
+from os.path import basename, dirname, join
+
+import pytest
+
+from uatg.utils import isa_profile, get_isa_profile, paging_modes, \
+    run_make, setup_pages, build_pages, default_pte_dict
+
+
+@pytest.mark.parametrize('isa, xlen, march, mabi', [
+    ('RV32IMAC', 32, 'rv32imac', 'ilp32'),
+    ('RV32IMACZicsr', 32, 'rv32imac_zicsr', 'ilp32'),
+    ('RV32EMC', 32, 'rv32emc', 'ilp32e'),
+    ('RV64IMAFDCSUZicsr_Zifencei', 64, 'rv64imafdc_zicsr_zifencei', 'lp64'),
+    ('rv64imac', 64, 'rv64imac', 'lp64'),
+    ('RV64GC', 64, 'rv64gc', 'lp64'),
+])
+def test_isa_profile(isa, xlen, march, mabi):
+    profile = isa_profile(isa)
+    assert profile.xlen == xlen
+    assert profile.march == march
+    assert profile.mabi == mabi
+    assert profile.prefix == f'riscv{xlen}-unknown-elf-'
+
+
+def test_isa_profile_expands_g():
+    assert isa_profile('RV64GC').extensions >= {
+        'I', 'M', 'A', 'F', 'D', 'C', 'Zicsr', 'Zifencei'
+    }
+
+
+def test_get_isa_profile_is_memoized():
+    assert get_isa_profile('RV64IMAC') is get_isa_profile('RV64IMAC')
+
+
+def test_paging_modes_follow_xlen():
+    modes = 'WARL field: [0,1,8,9]'
+    assert paging_modes(modes, 'RV64IMACSU') == ['sv39', 'sv48']
+    assert paging_modes(modes, 'rv64imacsu') == ['sv39', 'sv48']
+    assert paging_modes(modes, 'RV32IMACSU') == ['sv32']
+
+
+def test_run_make_skips_unchanged_tests(generate, tmp_path):
+    work_dir = str(tmp_path / 'work')
+    generate(work_dir, toolchain='stub')
+    summary = run_make(work_dir, jobs=2)['summary']
+    assert (summary['pass'], summary['cached']) == (6, 0)
+
+    summary = run_make(work_dir, jobs=2)['summary']
+    assert (summary['pass'], summary['cached']) == (6, 6)
+
+    test = glob(join(work_dir, 'demo', '*', '*.S'))[0]
+    with open(test, 'a') as f:
+        f.write('\tnop\n')
+    report = run_make(work_dir, jobs=2)
+    assert (report['summary']['pass'], report['summary']['cached']) == (6, 5)
+    assert [result['name'] for result in report['tests']
+            if not result['cached']] == [basename(dirname(test))]
+
+
+def test_run_make_stops_after_max_failures(generate, demo_plugin, tmp_path):
+    for i in range(3):
+        demo_plugin(f'demo_{i}', code='bogus x1')
+    work_dir = str(tmp_path / 'work')
+    generate(work_dir, toolchain='stub')
+
+    summary = run_make(work_dir, jobs=1, max_failures=2)['summary']
+    assert (summary['fail'], summary['skipped']) == (2, 4)
+
+    # failed tests are not cached
+    summary = run_make(work_dir, jobs=2)['summary']
+    assert (summary['fail'], summary['skipped'], summary['cached']) == \
+        (6, 0, 0)
+
+
+@pytest.mark.parametrize('mode, superpages', [
+    ('user', {}), ('supervisor', {}), ('user', {'megapage': True,
+                                                'user_superpage': True}),
+])
+def test_setup_pages_matches_build_pages(tmp_path, mode, superpages):
+    kwargs = dict(page_size=4096, paging_mode='sv39', valid_ll_pages=64,
+                  mode=mode, megapage=False, gigapage=False, terapage=False,
+                  petapage=False, user_superpage=False,
+                  user_supervisor_superpage=False, fault=False,
+                  mem_fault=False, misaligned_superpage=False)
+    kwargs.update(superpages)
+    expected = build_pages(dict(default_pte_dict), **kwargs)
+
+    code, data = setup_pages(None, **kwargs)
+    assert (code, data) == expected
+    # the callers get their own list
+    code.append('changed')
+    assert setup_pages(None, **kwargs) == expected
+
+    cache_dir = str(tmp_path / 'pages')
+    assert setup_pages(None, cache_dir=cache_dir, **kwargs) == expected
+    assert len(listdir(cache_dir)) == 1
+    assert setup_pages(None, cache_dir=cache_dir, **kwargs) == expected
+
+
+def test_setup_pages_machine_mode():
+    assert setup_pages(None, mode='machine') == (['', '', ''], '')
@@ -0,0 +1,138 @@
+# See LICENSE.incore for details
+"""Tests of uatg.test_generator.validate_tests."""
+
+import gzip
+from os import makedirs
+from os.path import exists, join
+
+import pytest
+
+from uatg.test_generator import validate_tests
+from uatg.utils import load_yaml
+
+check_template = '''from os.path import join
+
+from yapsy.IPlugin import IPlugin
+
+from uatg.log_scanner import scan_log
+
+
+class {name}(IPlugin):
+
+    compressed_logs = {compressed_logs}
+
+    def execute(self, core_yaml, isa_yaml):
+        return {valid}
+
+    def check_log(self, log_file_path, reports_dir):
+        with open(join(reports_dir, '{name}_path'), 'w') as f:
+            f.write(log_file_path)
+        if {raises}:
+            raise RuntimeError('check_log of {name} failed')
+        with open(join(reports_dir, '{name}_report.yaml'), 'w') as f:
+            f.write('{name}_report: {{}}\\n')
+        return len(scan_log(log_file_path, ['misprediction_pattern'])[
+            'misprediction_pattern']) > 0
+'''
+
+misprediction = '[       112] [ 0]BPU : Misprediction fired. Restoring ghr: ' \
+                '01101011\n'
+conflict = '[       113] [ 0]BPU : Conflict Detected\n'
+
+
+@pytest.fixture
+def validate(tmp_path):
+    """
+        function validating the logs of the branch_predictor check plugins
+        given as dicts of their name and the keyword arguments of
+        check_template, with the log of the plugin or None for no log
+    """
+    modules_dir = str(tmp_path / 'modules')
+    work_dir = str(tmp_path / 'work')
+    makedirs(join(modules_dir, 'branch_predictor'))
+
+    def validate(plugins):
+        for name, (log, kwargs) in plugins.items():
+            fields = dict(valid=True, raises=False, compressed_logs=False)
+            fields.update(kwargs)
+            with open(join(modules_dir, 'branch_predictor', name + '.py'),
+                      'w') as f:
+                f.write(check_template.format(name=name, **fields))
+            with open(join(modules_dir, 'branch_predictor',
+                           name + '.yapsy-plugin'), 'w') as f:
+                f.write(f'[Core]\nName = {name}\nModule = {name}\n')
+            if log is None:
+                continue
+            makedirs(join(work_dir, 'branch_predictor', name))
+            path = join(work_dir, 'branch_predictor', name, 'log')
+            if fields['compressed_logs'] or name.endswith('_gz'):
+                with gzip.open(path + '.gz', 'wt') as f:
+                    f.write(log)
+            else:
+                with open(path, 'w') as f:
+                    f.write(log)
+        config_dict = {'core_config': {}, 'isa_dict': {}}
+        summary = validate_tests(['branch_predictor'], config_dict, work_dir,
+                                 modules_dir, jobs=2)
+        statuses = {test['name']: test['status'] for test in summary['tests']}
+        return summary, statuses, work_dir
+    return validate
+
+
+def test_validate_tests_statuses(validate):
+    summary, statuses, work_dir = validate({
+        'check_pass': (misprediction, {}),
+        'check_fail': (conflict, {}),
+        'check_missing': (None, {}),
+        'check_error': (misprediction, {'raises': True}),
+        'check_skipped': (misprediction, {'valid': False}),
+    })
+    assert statuses == {
+        'check_pass': 'pass',
+        'check_fail': 'fail',
+        'check_missing': 'missing',
+        'check_error': 'error',
+        'check_skipped': 'skipped',
+    }
+    assert {status: summary[status] for status in statuses.values()} == \
+        dict.fromkeys(statuses.values(), 1)
+    assert summary['total'] == 3
+    tests = {test['name']: test for test in summary['tests']}
+    assert 'RuntimeError: check_log of check_error failed' in \
+        tests['check_error']['error']
+    assert tests['check_pass']['error'] is None
+    assert tests['check_pass']['log_size'] == len(misprediction)
+    assert tests['check_missing']['log_size'] is None
+    # the summary is written to the reports
+    written = load_yaml(join(work_dir, 'reports', 'validation_summary.yaml'))
+    assert written['pass'] == 1 and written['error'] == 1
+
+
+def test_validate_tests_of_compressed_logs(validate):
+    summary, statuses, work_dir = validate({
+        'check_gz': (misprediction, {}),
+        'check_fail_gz': (conflict, {}),
+        'check_reader': (misprediction, {'compressed_logs': True}),
+    })
+    assert statuses == {
+        'check_gz': 'pass',
+        'check_fail_gz': 'fail',
+        'check_reader': 'pass',
+    }
+
+    def check_log_path(name):
+        with open(join(work_dir, 'reports', 'branch_predictor',
+                       name + '_path')) as f:
+            return f.read()
+
+    # check_log gets a decompressed copy, removed afterwards, unless the
+    # plugin reads the compressed logs itself
+    log_dir = join(work_dir, 'branch_predictor')
+    assert check_log_path('check_gz').startswith(join(log_dir, 'check_gz'))
+    assert not check_log_path('check_gz').endswith('.gz')
+    assert not exists(check_log_path('check_gz'))
+    assert check_log_path('check_reader') == \
+        join(log_dir, 'check_reader', 'log.gz')
+    tests = {test['name']: test for test in summary['tests']}
+    assert tests['check_gz']['log_size'] == \
+        len(open(join(log_dir, 'check_gz', 'log.gz'), 'rb').read())
@@ -1,6 +1,8 @@
 # See LICENSE.incore for license details
-from itertools import combinations
-from typing import Dict
+from bisect import bisect_right
+from itertools import combinations, accumulate
+from random import Random
+from typing import Dict, Iterator, Tuple, Union
 
 base_reg_file = ['x' + str(reg_no) for reg_no in range(32)]
 float_reg_file = ['f' + str(reg_no) for reg_no in range(32)]
@@ -367,6 +369,9 @@ possible_superpage_privilege = {
         'supervisor' : ['supervisor_superpage'],
         'user' : ['supervisor_superpage', 'user_superpage', 'user_supervisor_superpage']
         }
+# blocks of the illegal instruction space of each ISA, see illegal_blocks
+illegal_blocks_memo = {}
+
 # Utility functions for data generation
 
 def twos(val, bits):
@@ -515,32 +520,17 @@ def alternate_zeros(size, signed=True):
         coverpoints.append(dataset)
     return coverpoints
 
-def illegal_generator(isa='RV32I') -> list:
+
+def encoding_fields(isa='RV32I') -> Dict[int, Dict]:
     """
         :param isa: RV[32|64]{IMAFD}
 
-        :return: list of illegal instructions for given ISA configuration
-
-        Provide the ISA string and obtain the list of illegal opcodes
-        as integers. It uses the riscv-opcodes repository's instruction encoding
-        data and are stored above as rv32_encodings and rv64_encodings variables.
-
-        This function parses the instructions and initially finds all illegal
-        opcodes. Then for the variable encoding fields in each instruction, it makes
-        one/more/all of them to contain illegal values and appends such combination
-        into a list and returns it.
-
-        :Usage:
-
-            .. code-block:: Python
-
-                from uatg.instruction_constant import illegal_generator
-
-                illegal_list = illegal_generator("RV32IMAF")
-
-        illegal list would contain decimal value of illegal instructions
-        user should convert it into hex and dump into memory using ``.word``
+        :return: dict of 7-bit opcode to a dict of the constant fields of the
+                 instructions using that opcode. The fields are keyed by their
+                 (lsb, msb) bit positions and hold the set of legal values.
 
+        Parses the riscv-opcodes encodings stored in rv32_encodings and
+        rv64_encodings for the extensions in the ISA string.
     """
 
     # Declaring the variable that will store all of the parsed data
@@ -552,7 +542,6 @@ def illegal_generator(isa='RV32I') -> list:
     # add each ISA extension's instructions to instructions_list
     for i in isa[4:]:
         instruction_list += encodings[i.lower()]
-    # print(instruction_list)
 
     # For each line in the file
     for inst in instruction_list:
@@ -591,98 +580,378 @@ def illegal_generator(isa='RV32I') -> list:
                 instructions[opcode][key].update(consts[key])
         except KeyError:
             instructions[opcode] = consts
-    # illegal_list variable contains all the illegal values for a particular isa
-    # extension. it's initialized to store all illegal opcodes in the 7bit range
-    illegal_list = [i for i in range(2**7) if i not in instructions.keys()]
 
-    # Choosing illegals that DO NOT get interpreted as Compressed instructions.
-    # i.e now the list has instructions with opcode[1:0] == 0b11
-    illegal_list = [i for i in illegal_list if i % 4 == 3]
+    return instructions
+
+
+def illegal_fixup(inst_32: int) -> int:
+    """
+        :param inst_32: illegal instruction as an integer
+
+        :return: the instruction with the special cases handled
+
+        Handles the special cases for an illegal instruction
+        1. Converting hint instructions to non-hint instructions
+        2. Modifying load/stores to work on valid addresses
+        3. Converting the illegal AMO widths 2, 3 to 0, 1
+    """
+    opcode = inst_32 % 128
+    rs, rd = 5, 6
+
+    if opcode in (55, 23, 19, 27, 51, 59):
+        # Avoiding hint instructions for
+        # 55-LUI,
+        # 23-AUIPC
+        # 19-addi, xori, ori, andi, slti, sltiu
+        # 27-addiw, slliw, srliw, sraiw
+        # 51-add, sub, sll, slt, sltu, xor, srl, sra, or, and
+        # 59-addw, subw, sllw, srlw, sraw
+        # 19-slli, srli, srai
+        if (inst_32 >> 7) % 32 == 0:
+            inst_32 += rd << 7  # rd != x0
+    # Making load/stores to use proper address values
+    # 3-lb, lh, lw, lbu, lhu, ld, lwu
+    # 35-sb, sh, sw, sd
+    if opcode == 3 and (inst_32 >> 15) % 32 == 0:
+        inst_32 += rs << 15  # rs != x0
+    if opcode == 35 and (inst_32 >> 15) % 32 == 0:
+        inst_32 += rs << 15  # rs1 != x0
+    if opcode == 47 and (inst_32 >> 12) % 8 in (2, 3):
+        # TODO: Temporary fix for AMO instructions
+        inst_32 -= 2 << 12  # converting illegal 2,3 to 0,1
+
+    return inst_32
+
+
+def iter_illegal(isa='RV32I') -> Iterator[int]:
+    """
+        :param isa: RV[32|64]{IMAFD}
 
-    for opcode in instructions:
-        # Variable to store the legal fields
-        legal_fields = []
-        # Alias variable containing the ranges and their legal values
-        legal_values = instructions[opcode]
+        :return: iterator over the illegal instructions for given ISA
+                 configuration
 
+        Streaming version of illegal_generator. The instructions are yielded in
+        the same order as illegal_generator lists them, and illegal_fixup is
+        applied exactly once to every instruction as it is yielded.
+
+        :Usage:
+
+            .. code-block:: Python
+
+                from uatg.instruction_constants import iter_illegal
+
+                for inst in iter_illegal("RV64IMAFD"):
+                    asm_code += f'.word {hex(inst)}\n'
+
+    """
+    instructions = encoding_fields(isa)
+
+    # all illegal opcodes in the 7bit range which DO NOT get interpreted as
+    # Compressed instructions. i.e opcode[1:0] == 0b11
+    for i in range(2**7):
+        if i not in instructions and i % 4 == 3:
+            yield illegal_fixup(i)
+
+    for opcode, legal_values in instructions.items():
         # Variable to store the illegal values for each range in legal values
         illegal_values = {
             (beg, end):
-            set(range(2**(end - beg + 1))) - instructions[opcode][(beg, end)]
-            for (beg, end) in instructions[opcode].keys()
+            set(range(2**(end - beg + 1))) - legal_values[(beg, end)]
+            for (beg, end) in legal_values
         }
+
         # Finding all permutations for illegal fields in an instruction
-        # combinations of one, two... all values of  illegal_values's ranges
-        illegal_fields = [
-            list(i)
-            for j in range(1,
-                           len(instructions[opcode]) + 1)
-            for i in combinations(instructions[opcode], j)
-        ]
-
-        # IMPORTANT: Populating the legal_fields variable based on the
-        # combinations of illegal_fields and making sure the keys are disjoint
-        for selection in illegal_fields:
-            temp = list(instructions[opcode])
-            for rng in selection:
-                temp.remove(rng)
-            legal_fields.append(temp)
-
-        for selection in zip(illegal_fields, legal_fields):
-            if not selection[0]:
-                # if illegal fields range is [] pass
-                pass
-            else:
-                for (beg_i, end_i) in selection[0]:
+        # combinations of one, two... all values of  illegal_values's ranges.
+        # The remaining ranges of each combination are kept legal.
+        for j in range(1, len(legal_values) + 1):
+            for selection in combinations(legal_values, j):
+                legal_fields = [
+                    rng for rng in legal_values if rng not in selection
+                ]
+                for (beg_i, end_i) in selection:
                     for ival in illegal_values[(beg_i, end_i)]:
-                        if not selection[1]:
+                        if not legal_fields:
                             # if legal fields range is []
-                            inst_32 = opcode
-                            inst_32 += (ival << beg_i)
-                            illegal_list.append(inst_32)
+                            yield illegal_fixup(opcode + (ival << beg_i))
                         else:
-                            for (beg_l, end_l) in selection[1]:
+                            for (beg_l, end_l) in legal_fields:
                                 for lval in legal_values[(beg_l, end_l)]:
-                                    inst_32 = opcode
-                                    inst_32 += (ival << beg_i) + (lval << beg_l)
-                                    illegal_list.append(inst_32)
-        # Handling special cases for instructions
-        # 1. Converting hint instructions to non-hint instructions
-        # 2. Modifying load/stores to work on valid addresses
-        for i in range(len(illegal_list)):
-            inst = illegal_list[i]
-            opcode = inst % 128
-            rs, rd = 5, 6
-
-            if opcode in (55, 23, 19, 27, 51, 59):
-                # Avoiding hint instructions for
-                # 55-LUI,
-                # 23-AUIPC
-                # 19-addi, xori, ori, andi, slti, sltiu
-                # 27-addiw, slliw, srliw, sraiw
-                # 51-add, sub, sll, slt, sltu, xor, srl, sra, or, and
-                # 59-addw, subw, sllw, srlw, sraw
-                # 19-slli, srli, srai
-                if (illegal_list[i] >> 7) % 32 == 0:
-                    illegal_list[i] += rd << 7  # rd != x0
-                    if opcode == 15 and (illegal_list[i] >> 12) % 8:
-                        # Fence pred/succ != 0x0
-                        inst += 1 << 20
-            # Making load/stores to use proper address values
-            # 3-lb, lh, lw, lbu, lhu, ld, lwu
-            # 35-sb, sh, sw, sd
-            if opcode == 3 and (illegal_list[i] >> 15) % 32 == 0:
-                # illegal_list[i] += rd << 7  # rd != x0
-                illegal_list[i] += rs << 15  # rs != x0
-            if opcode == 35 and (illegal_list[i] >> 15) % 32 == 0:
-                illegal_list[i] += rs << 15  # rs1 != x0
-            if opcode == 47 and (illegal_list[i] >> 12) % 8 in (2, 3):
-                # TODO: Temporary fix for AMO instructions
-                illegal_list[i] -= 2 << 12  # converting illegal 2,3 to 0,1
+                                    yield illegal_fixup(opcode +
+                                                        (ival << beg_i) +
+                                                        (lval << beg_l))
+
+
+def illegal_blocks(isa='RV32I') -> Tuple[Tuple]:
+    """
+        :param isa: RV[32|64]{IMAFD}
+
+        :return: tuple of (opcode, selection, column, row) blocks which
+                 describe the instructions of iter_illegal without
+                 enumerating them.
+
+        Block k holds the len(column) * len(row) instructions
+        ``column[i] + row[j]`` (before illegal_fixup), for i in the outer and j
+        in the inner loop, and the blocks are in the order of iter_illegal.
+        The column holds the opcode plus the illegal values of one field of
+        the selection and the row holds the legal values of the remaining
+        fields. The illegal opcodes form the first block, with the opcode and
+        selection None. The blocks are memoized per ISA string.
+    """
+    try:
+        return illegal_blocks_memo[isa]
+    except KeyError:
+        pass
+
+    instructions = encoding_fields(isa)
+    blocks = [(None, None,
+               tuple(i for i in range(2**7)
+                     if i not in instructions and i % 4 == 3), (0,))]
+    for opcode, legal_values in instructions.items():
+        legal = {(beg, end): tuple(val << beg for val in vals)
+                 for (beg, end), vals in legal_values.items()}
+        illegal = {
+            (beg, end): tuple(
+                opcode + (val << beg)
+                for val in set(range(2**(end - beg + 1))) - vals)
+            for (beg, end), vals in legal_values.items()
+        }
+        for j in range(1, len(legal_values) + 1):
+            for selection in combinations(legal_values, j):
+                row = tuple(val for rng in legal_values if rng not in selection
+                            for val in legal[rng]) or (0,)
+                for rng_i in selection:
+                    blocks.append((opcode, selection, illegal[rng_i], row))
+
+    illegal_blocks_memo[isa] = tuple(blocks)
+    return illegal_blocks_memo[isa]
+
+
+def illegal_sample(isa='RV32I',
+                   sample=1,
+                   seed=None,
+                   stratify: Union[None, str] = None) -> list:
+    """
+        :param isa: RV[32|64]{IMAFD}
+        :param sample: number of distinct illegal instructions to be drawn
+        :param seed: seed for the random draws, for reproducible samples
+        :param stratify: None to draw uniformly from the instructions listed by
+                         illegal_generator, 'opcode' to draw an equal share per
+                         opcode, 'fields' to draw an equal share per
+                         combination of illegal fields of each opcode
+
+        :return: list of at most sample distinct illegal instructions. Fewer
+                 are returned only when the illegal space is exhausted.
+
+        Draws illegal instructions without enumerating the illegal space. The
+        memory used is O(sample) on top of the encoding tables, and the time
+        taken is proportional to the sample size.
+
+        :Usage:
+
+            .. code-block:: Python
+
+                from uatg.instruction_constants import illegal_generator
+
+                illegal_list = illegal_generator("RV64IMAFD", sample=100,
+                                                 seed=7, stratify='opcode')
+
+    """
+    rng = Random(seed)
+    blocks = illegal_blocks(isa)
+
+    if stratify is None:
+        groups = {None: blocks}
+    elif stratify in ('opcode', 'fields'):
+        groups = {}
+        for block in blocks:
+            key = block[0] if stratify == 'opcode' else block[:2]
+            groups.setdefault(key, []).append(block)
+        groups = {k: v for k, v in groups.items() if v[0][2]}
+    else:
+        raise ValueError(f'Invalid stratify option: {stratify}')
+
+    # [blocks, cumulative sizes, queue of remaining words or None]
+    strata = [[group, list(accumulate(len(b[2]) * len(b[3]) for b in group)),
+               None] for group in groups.values()]
+    rng.shuffle(strata)
+
+    illegal_list, seen = [], set()
+
+    def draw(stratum):
+        group, sizes, queue = stratum
+        if queue is None:
+            for _ in range(64):
+                pos = rng.randrange(sizes[-1])
+                k = bisect_right(sizes, pos)
+                _, _, column, row = group[k]
+                pos -= sizes[k - 1] if k else 0
+                inst = illegal_fixup(column[pos // len(row)] +
+                                     row[pos % len(row)])
+                if inst not in seen:
+                    return inst
+            # the stratum is (almost) exhausted, list its remaining words
+            queue = list({
+                illegal_fixup(c + r)
+                for _, _, column, row in group
+                for c in column
+                for r in row
+            } - seen)
+            queue.sort()
+            rng.shuffle(queue)
+            stratum[2] = queue
+        while queue:
+            inst = queue.pop()
+            if inst not in seen:
+                return inst
+        return None
+
+    while len(illegal_list) < sample and strata:
+        # one word per stratum per round, to split the sample equally
+        for stratum in list(strata):
+            inst = draw(stratum)
+            if inst is None:
+                strata.remove(stratum)
+                continue
+            seen.add(inst)
+            illegal_list.append(inst)
+            if len(illegal_list) == sample:
+                break
 
     return illegal_list
 
 
+def illegal_generator(isa='RV32I', sample=None, seed=None,
+                      stratify=None) -> list:
+    """
+        :param isa: RV[32|64]{IMAFD}
+        :param sample: if not None, only sample distinct illegal instructions
+                       are drawn at random using illegal_sample
+        :param seed: seed of the random draws when sampling
+        :param stratify: None, 'opcode' or 'fields', see illegal_sample
+
+        :return: list of illegal instructions for given ISA configuration
+
+        Provide the ISA string and obtain the list of illegal opcodes
+        as integers. It uses the riscv-opcodes repository's instruction
+        encoding data and are stored above as rv32_encodings and
+        rv64_encodings variables.
+
+        This function parses the instructions and initially finds all illegal
+        opcodes. Then for the variable encoding fields in each instruction,
+        it makes one/more/all of them to contain illegal values and appends
+        such combination into a list and returns it. Use iter_illegal to
+        process the instructions without building the list.
+
+        :Usage:
+
+            .. code-block:: Python
+
+                from uatg.instruction_constant import illegal_generator
+
+                illegal_list = illegal_generator("RV32IMAF")
+
+        illegal list would contain decimal value of illegal instructions
+        user should convert it into hex and dump into memory using ``.word``
+
+    """
+    if sample is not None:
+        return illegal_sample(isa, sample=sample, seed=seed, stratify=stratify)
+    return list(iter_illegal(isa))
+
+
+def illegal_array(isa='RV32I', unique=True, path=None):
+    """
+        :param isa: RV[32|64]{IMAFD}
+        :param unique: remove the duplicate instructions. The instructions are
+                       returned in ascending order when True and in the order
+                       of illegal_generator otherwise.
+        :param path: optional path of a .npy file to save the instructions to.
+
+        :return: numpy.uint32 array of illegal instructions for given ISA
+                 configuration. When a path is given, the array is saved and a
+                 read-only memory-map of the .npy file is returned.
+
+        NumPy backend of illegal_generator. The field combinations of every
+        opcode are enumerated as arrays with shifts and additions, and
+        illegal_fixup is applied to all of them at once as vector masks. This
+        is meant for tests which dump thousands of ``.word`` entries.
+        Requires numpy, which is not a dependency of UATG.
+
+        :Usage:
+
+            .. code-block:: Python
+
+                from uatg.instruction_constants import illegal_array
+
+                illegal_words = illegal_array("RV64IMAFD")
+                asm_data = '\n'.join(f'.word {hex(i)}' for i in illegal_words)
+
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError('illegal_array needs numpy. Install it using '
+                          '"pip install numpy" or use illegal_generator') \
+            from None
+
+    instructions = encoding_fields(isa)
+
+    # values are summed in 64 bits and truncated to uint32 at the end
+    blocks = [
+        np.array([
+            i for i in range(2**7) if i not in instructions and i % 4 == 3
+        ],
+                 dtype=np.uint64)
+    ]
+    for opcode, legal_values in instructions.items():
+        # the sets are iterated in the same order as iter_illegal does
+        legal = {
+            (beg, end): np.fromiter(vals, dtype=np.uint64) << np.uint64(beg)
+            for (beg, end), vals in legal_values.items()
+        }
+        illegal = {
+            (beg, end): ((np.fromiter(set(range(2**(end - beg + 1))) - vals,
+                                      dtype=np.uint64) << np.uint64(beg)) +
+                         np.uint64(opcode))
+            for (beg, end), vals in legal_values.items()
+        }
+        for j in range(1, len(legal_values) + 1):
+            for selection in combinations(legal_values, j):
+                legal_fields = [
+                    rng for rng in legal_values if rng not in selection
+                ]
+                if not legal_fields:
+                    blocks.extend(illegal[rng_i] for rng_i in selection)
+                    continue
+                # every illegal value is combined with the legal values of
+                # each legal field in turn, as one row of the block
+                legal_row = np.concatenate(
+                    [legal[rng] for rng in legal_fields])
+                for rng_i in selection:
+                    blocks.append(
+                        (illegal[rng_i][:, None] + legal_row[None, :]).ravel())
+    words = np.concatenate(blocks)
+
+    # illegal_fixup as masks, in the same order of application
+    opcodes = words & np.uint64(127)
+    hint = np.isin(opcodes, (55, 23, 19, 27, 51, 59)) & \
+        ((words >> np.uint64(7)) & np.uint64(31) == 0)
+    words[hint] += np.uint64(6 << 7)
+    load_store = np.isin(opcodes, (3, 35)) & \
+        ((words >> np.uint64(15)) & np.uint64(31) == 0)
+    words[load_store] += np.uint64(5 << 15)
+    amo = (opcodes == 47) & \
+        np.isin((words >> np.uint64(12)) & np.uint64(7), (2, 3))
+    words[amo] -= np.uint64(2 << 12)
+
+    words = words.astype(np.uint32)
+    if unique:
+        words = np.unique(words)
+    if path is None:
+        return words
+    np.save(path, words)
+    return np.load(path, mmap_mode='r')
+
 
 ############################################################################
 # Function to return ASM-string of reg-reg dependent sequences #
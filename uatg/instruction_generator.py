@@ -1,14 +1,340 @@
-from os.path import join, dirname
-from re import search
+from collections.abc import Sequence
+from hashlib import sha256
+from os import environ, makedirs, replace, getpid
+from os.path import join, dirname, expanduser
+from pickle import dump, load, UnpicklingError, HIGHEST_PROTOCOL
+from re import search, compile
 from string import ascii_letters, digits
-from random import sample, choice, choices, seed, randint
-from typing import Union, List
+from random import sample, choice, choices, seed, randint, randrange, random
+from typing import Union, List, Iterable, Callable
 
 from uatg import __file__
+from uatg.log import logger
 from uatg.utils import load_yaml
 
 seed(101)
 
+isem_file = join(dirname(__file__), 'isem.yaml')
+
+# parsed isem.yaml databases and per-ISA instruction tables of this process,
+# keyed by the sha256 of the isem.yaml file. The oldest entries are dropped
+# beyond the sizes below.
+isem_memo = {}
+isem_memo_size = 4
+isa_tables_memo = {}
+isa_tables_memo_size = 32
+# instruction_generator instances shared within this process, per ISA
+generator_memo = {}
+
+# placeholders in the asm_syntax of isem.yaml, i.e. $xrd, $c.rs1, $imm12 ...
+field_pattern = compile(r'\$(c\.r(?:d|s1|s2)|[a-z]+\d*)')
+
+# instructions which are emitted with a label/address setup instead of their
+# asm_syntax, to avoid unpredictable control flow and memory accesses
+i_special_insts = frozenset({
+    'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu', 'jal', 'jalr', 'lb', 'lh',
+    'lw', 'ld', 'lbu', 'lhu', 'lwu', 'sb', 'sh', 'sw', 'sd'
+})
+c_special_insts = frozenset({
+    'c.beqz', 'c.bnez', 'c.j', 'c.jal', 'c.jalr', 'c.jr', 'c.ld', 'c.sd',
+    'c.lw', 'c.sw', 'c.fld', 'c.flw', 'c.fsd', 'c.fsw', 'c.fldsp', 'c.fsdsp',
+    'c.lwsp', 'c.ldsp', 'c.swsp', 'c.sdsp', 'c.lui', 'c.ebreak'
+})
+
+
+class field_range(Sequence):
+    """
+        Compact representation of the values a variable field (immediates,
+        shift amounts) can take. Behaves like range(lo, hi, step) minus the
+        values in exclude, and yields the values as decimal strings, the same
+        way the sets used as modifiers do. A value can be drawn uniformly in
+        constant time without ever materializing the whole set.
+
+        :Usage:
+
+        .. code-block:: Python
+
+            from uatg.instruction_generator import field_range
+
+            # non-zero multiples of 16 in [-32, 32)
+            nzimm6 = field_range(-32, 32, 16, exclude={0})
+            random_imm = nzimm6.choice()
+
+    """
+
+    __slots__ = ('lo', 'hi', 'step', 'exclude', '_range', '_excluded')
+
+    def __init__(self, lo: int, hi: int, step: int = 1,
+                 exclude: Iterable[int] = ()):
+        """
+            :param lo: lowest value of the field (inclusive)
+            :param hi: upper bound of the field (exclusive)
+            :param step: difference between consecutive values
+            :param exclude: values within the range which are not legal
+        """
+        self.lo, self.hi, self.step = lo, hi, step
+        self._range = range(lo, hi, step)
+        self.exclude = frozenset(int(val) for val in exclude)
+        # positions (within _range) of the excluded values, sorted so that
+        # an index can be mapped past them while drawing
+        self._excluded = sorted(
+            self._range.index(val)
+            for val in self.exclude
+            if val in self._range)
+
+    def __len__(self) -> int:
+        return len(self._range) - len(self._excluded)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('field_range index out of range')
+        for position in self._excluded:
+            if position > index:
+                break
+            index += 1
+        return str(self._range[index])
+
+    def __iter__(self):
+        for val in self._range:
+            if val not in self.exclude:
+                yield str(val)
+
+    def __contains__(self, value) -> bool:
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return False
+        return value in self._range and value not in self.exclude
+
+    def __repr__(self) -> str:
+        return f'field_range({self.lo}, {self.hi}, {self.step}, ' \
+               f'exclude={set(self.exclude) or "{}"})'
+
+    def choice(self) -> str:
+        """
+            :return: a uniformly drawn value of the field as a str
+        """
+        return self[randrange(len(self))]
+
+
+def freeze_field(values) -> Sequence:
+    """
+        Converts the values of a modifier into an immutable, indexable
+        sequence, so that a random value can be drawn from it in constant time.
+        field_range and tuple objects are returned as they are, lists are
+        converted to tuples and sets are sorted into tuples to keep the drawn
+        values reproducible for a given seed.
+
+        :param values: field_range, str or collection of values
+
+        :return: field_range or tuple of values
+    """
+    if isinstance(values, (field_range, tuple)):
+        return values
+    if isinstance(values, str):
+        return values,
+    if isinstance(values, list):
+        return tuple(values)
+    return tuple(sorted(values, key=str))
+
+
+def random_field(values, k: int = 1):
+    """
+        Draws k distinct random values for a variable field. The values can
+        either be a field_range or any set/list/tuple supplied as a modifier.
+
+        :param values: field_range or collection of values
+        :param k: number of distinct values to be drawn
+
+        :return: the value when k is 1, else a list of k values
+    """
+    if not isinstance(values, Sequence):
+        values = freeze_field(values)
+    if k == 1:
+        return choice(values)
+    return sample(values, k)
+
+
+class asm_template:
+    """
+        asm_syntax of an instruction compiled into literal chunks and typed
+        slots. The slots are resolved to their modifier keys at compile time,
+        so emitting an instruction only draws a value per slot and joins it
+        with the chunks.
+
+        'addi $xrd, $xrs1, $imm12' compiles to the head 'addi ' and the slots
+        ('xrd', '$xrd', ', '), ('xrs1', '$xrs1', ', '),
+        ('$imm12', '$imm12', '').
+    """
+
+    __slots__ = ('syntax', 'head', 'slots')
+
+    def __init__(self, syntax: str, field_key: Callable[[str, str], str]):
+        """
+            :param syntax: asm_syntax of the instruction from isem.yaml
+            :param field_key: function mapping a placeholder (without '$') and
+                              the syntax to the key of the modifiers dict
+        """
+        parts = field_pattern.split(syntax)
+        self.syntax = syntax
+        self.head = parts[0]
+        self.slots = tuple(
+            (field_key(field, syntax), f'${field}', chunk)
+            for field, chunk in zip(parts[1::2], parts[2::2]))
+
+    def __repr__(self) -> str:
+        return f'asm_template({self.syntax!r})'
+
+    def render(self, modifiers: dict) -> str:
+        """
+            :param modifiers: dict of frozen modifiers, see freeze_field
+
+            :return: the instruction with a random value drawn for each slot.
+                     Slots without a modifier are left as placeholders.
+        """
+        out = self.head
+        for key, placeholder, chunk in self.slots:
+            values = modifiers.get(key)
+            if values is None:
+                out += placeholder + chunk
+            else:
+                out += values[int(random() * len(values))] + chunk
+        return out
+
+
+def isem_cache_dir() -> str:
+    """
+        :return: directory in which the parsed isem.yaml databases are cached,
+                 $UATG_CACHE_DIR or $XDG_CACHE_HOME/uatg (~/.cache/uatg)
+    """
+    try:
+        return environ['UATG_CACHE_DIR']
+    except KeyError:
+        return join(
+            environ.get('XDG_CACHE_HOME', join(expanduser('~'), '.cache')),
+            'uatg')
+
+
+def memo_store(memo: dict, key, value, size: int):
+    """
+        Stores value in the memo, dropping its oldest entries so that it holds
+        at most size entries
+
+        :return: value
+    """
+    while len(memo) >= size:
+        del memo[next(iter(memo))]
+    memo[key] = value
+    return value
+
+
+def isem_digest(path: str = isem_file) -> str:
+    """
+        :param path: path to the isem.yaml file
+
+        :return: sha256 of the isem.yaml file, the key of the parsed database
+    """
+    with open(path, 'rb') as f:
+        return sha256(f.read()).hexdigest()
+
+
+def load_isem(path: str = isem_file) -> dict:
+    """
+        Loads the instruction semantics database (isem.yaml) as plain python
+        objects. The parsed database is pickled into isem_cache_dir(), keyed by
+        the sha256 of the yaml file, so that the yaml parser only runs the
+        first time a given isem.yaml is seen. Loaded databases are also
+        memoized within the process.
+
+        :param path: path to the isem.yaml file
+
+        :return: dict of extension name to the instructions in the extension
+    """
+    digest = isem_digest(path)
+    try:
+        return isem_memo[digest]
+    except KeyError:
+        pass
+
+    cache_file = join(isem_cache_dir(), f'isem-{digest[:16]}.pickle')
+    try:
+        with open(cache_file, 'rb') as f:
+            isem = load(f)
+        logger.debug(f'Loaded cached instruction database {cache_file}')
+    except (OSError, EOFError, UnpicklingError):
+        isem = load_yaml(path, typ='safe')
+        try:
+            makedirs(dirname(cache_file), exist_ok=True)
+            # write and rename, as several processes may populate the cache
+            temp_file = f'{cache_file}.{getpid()}'
+            with open(temp_file, 'wb') as f:
+                dump(isem, f, protocol=HIGHEST_PROTOCOL)
+            replace(temp_file, cache_file)
+        except OSError as e:
+            logger.debug(f'Could not cache the instruction database: {e}')
+
+    return memo_store(isem_memo, digest, isem, isem_memo_size)
+
+
+def isa_instruction_tables(isa: str, path: str = isem_file) -> dict:
+    """
+        Filters the instruction semantics database for an ISA string. The
+        tables are memoized per ISA string and contents of isem.yaml, the
+        caller is expected to copy a table before modifying it.
+
+        :param isa: ISA string, RV[32|64]I[MAFDCB]
+        :param path: path to the isem.yaml file
+
+        :return: dict with the keys 'i', 'm', 'a', 'f', 'd', 'b' and 'c'
+                 holding a dict of instruction name to asm_syntax each
+    """
+    key = (isem_digest(path), isa)
+    try:
+        return isa_tables_memo[key]
+    except KeyError:
+        pass
+
+    instructions = load_isem(path)
+
+    xlen = search(r'\d+', isa).group(0)
+
+    def table(extension):
+        return {
+            k: v['asm_syntax']
+            for k, v in instructions[extension].items()
+            if xlen in str(v['xlen'])
+        }
+
+    tables = dict.fromkeys(('m', 'a', 'f', 'd', 'b', 'c'), {})
+    tables['i'] = table('i_extension')
+    if search(r'RV\d+IM', isa) is not None:
+        tables['m'] = table('m_extension')
+    if search(r'RV\d+I\w+A', isa) is not None:
+        tables['a'] = table('a_extension')
+    if search(r'RV\d+I\w+F', isa) is not None:
+        tables['f'] = table('f_extension')
+    if search(r'RV\d+I\w+FD', isa) is not None:
+        tables['d'] = table('d_extension')
+    if search(r'RV\d+I\w+B', isa) is not None:
+        tables['b'] = table('b_extension')
+    if search(r'RV\d+I\w+C', isa) is not None:
+        tables['c'] = table('c_extension')
+        if search(r'RV\d+I\w+F', isa) is None:
+            tables['c'].pop('c.flw')
+            tables['c'].pop('c.fsw')
+            if '32' in isa:
+                tables['c'].pop('c.flwsp')
+                tables['c'].pop('c.fswsp')
+            if search(r'RV\d+I\w+FD', isa) is None:
+                tables['c'].pop('c.fld')
+                tables['c'].pop('c.fldsp')
+                tables['c'].pop('c.fsd')
+                tables['c'].pop('c.fsdsp')
+
+    return memo_store(isa_tables_memo, key, tables, isa_tables_memo_size)
+
 
 class instruction_generator:
     """
@@ -43,7 +369,7 @@ class instruction_generator:
                         be generated.
         """
         assert (search(r'RV\d+I', isa) is not None)
-        instruction_file = join(dirname(__file__), 'isem.yaml')
+        instruction_file = isem_file
         integer_reg_file = {'x' + str(num) for num in range(32)}
         float_reg_file = {'f' + str(num) for num in range(32)}
         compressed_reg_file = {'x' + str(num) for num in range(8, 15)}
@@ -51,172 +377,119 @@ class instruction_generator:
         self.isa = isa
         self.xlen = search(r'\d+', isa).group(0)
         self.imm_fields = {
-            '$imm11': {str(num) for num in range(-1024, 1024)},
-            '$imm12': {str(num) for num in range(-2048, 2048)},
-            '$uimm20': {str(num) for num in range(0, 2**20)},
-            '$imm6': {str(num) for num in range(-32, 32)},
-            '$imm8': {str(num) for num in range(-128, 128)},
-            '$nzimm6': {str(num) for num in range(-2**5, 2**5, 16) if num != 0},
-            '$nzuimm6': {str(num) for num in range(1, 2**6)},
-            '$uimm6': {str(num) for num in range(0, 2**6)},
-            '$uimm8': {str(num) for num in range(0, 256)},
-            '$nzuimm8': {str(num) for num in range(0, 2**8, 16) if num != 0},
+            '$imm11': field_range(-1024, 1024),
+            '$imm12': field_range(-2048, 2048),
+            '$uimm20': field_range(0, 2**20),
+            '$imm6': field_range(-32, 32),
+            '$imm8': field_range(-128, 128),
+            '$nzimm6': field_range(-2**5, 2**5, 16, exclude={0}),
+            '$nzuimm6': field_range(1, 2**6),
+            '$uimm6': field_range(0, 2**6),
+            '$uimm8': field_range(0, 256),
+            '$nzuimm8': field_range(0, 2**8, 16, exclude={0}),
             '$pred': {'r', 'rw', 'w'},
             '$succ': {'r', 'rw', 'w'},
         }
         self.prog_labels = []
+        self.__label_set = set()
         self.default_modifiers = dict.fromkeys(
             ['xrs1', 'xrs2', 'xrs3', 'xrd', 'rm'], integer_reg_file)
         self.default_modifiers.update({
-            'shamt5': {str(num) for num in range(1, 2**5)},
-            'shamt6': {str(num) for num in range(1, 2**6)}
+            'shamt5': field_range(1, 2**5),
+            'shamt6': field_range(1, 2**6)
         })
         self.default_modifiers.update(self.imm_fields)
 
-        self.instructions = load_yaml(instruction_file)
-        self.i_insts = {
-            k: self.instructions['i_extension'][k]['asm_syntax']
-            for k in self.instructions['i_extension'].keys()
-            if self.xlen in str(self.instructions['i_extension'][k]['xlen'])
-        }
+        self.instructions = load_isem(instruction_file)
+        tables = isa_instruction_tables(isa, instruction_file)
+        self.i_insts, self.m_insts = dict(tables['i']), dict(tables['m'])
+        self.a_insts, self.f_insts = dict(tables['a']), dict(tables['f'])
+        self.d_insts, self.b_insts = dict(tables['d']), dict(tables['b'])
+        self.c_insts = dict(tables['c'])
 
-        self.m_insts, self.a_insts, self.f_insts = {}, {}, {}
-        self.d_insts, self.b_insts, self.c_insts = {}, {}, {}
-
-        if search(r'RV\d+IM', isa) is not None:
-            self.m_insts = {
-                k: self.instructions['m_extension'][k]['asm_syntax']
-                for k in self.instructions['m_extension'].keys()
-                if self.xlen in str(self.instructions['m_extension'][k]['xlen'])
-            }
-        if search(r'RV\d+I\w+A', isa) is not None:
-            self.a_insts = {
-                k: self.instructions['a_extension'][k]['asm_syntax']
-                for k in self.instructions['a_extension'].keys()
-                if self.xlen in str(self.instructions['a_extension'][k]['xlen'])
-            }
         if search(r'RV\d+I\w+F', isa) is not None:
             self.default_modifiers.update(
-                dict.fromkeys(['frs1', 'frs2', 'frs3'], float_reg_file))
-            self.f_insts = {
-                k: self.instructions['f_extension'][k]['asm_syntax']
-                for k in self.instructions['f_extension'].keys()
-                if self.xlen in str(self.instructions['f_extension'][k]['xlen'])
-            }
-        if search(r'RV\d+I\w+FD', isa) is not None:
-            self.d_insts = {
-                k: self.instructions['f_extension'][k]['asm_syntax']
-                for k in self.instructions['f_extension'].keys()
-                if self.xlen in str(self.instructions['f_extension'][k]['xlen'])
-            }
-        if search(r'RV\d+I\w+B', isa) is not None:
-            self.b_insts = {
-                k: self.instructions['b_extension'][k]['asm_syntax']
-                for k in self.instructions['b_extension'].keys()
-                if self.xlen in str(self.instructions['b_extension'][k]['xlen'])
-            }
+                dict.fromkeys(['frd', 'frs1', 'frs2', 'frs3'], float_reg_file))
         if search(r'RV\d+I\w+C', isa) is not None:
             self.default_modifiers.update(
                 dict.fromkeys(['c.rs1', 'c.rs2', 'c.rd'], compressed_reg_file))
-            self.c_insts = {
-                k: self.instructions['c_extension'][k]['asm_syntax']
-                for k in self.instructions['c_extension'].keys()
-                if self.xlen in str(self.instructions['c_extension'][k]['xlen'])
-            }
-            if search(r'RV\d+I\w+F', isa) is None:
-                self.c_insts.pop('c.flw')
-                self.c_insts.pop('c.fsw')
-                if '32' in isa:
-                    self.c_insts.pop('c.flwsp')
-                    self.c_insts.pop('c.fswsp')
-                if search(r'RV\d+I\w+FD', isa) is None:
-                    self.c_insts.pop('c.fld')
-                    self.c_insts.pop('c.fldsp')
-                    self.c_insts.pop('c.fsd')
-                    self.c_insts.pop('c.fsdsp')
-
-    def __replace_fields(self, instruction: str, modifiers: dict) -> str:
-        """
-            Private function to replace the variable fields in a given
-            instruction
 
+        # the defaults are frozen once, user modifiers once per generate call
+        self.default_modifiers = {
+            key: freeze_field(val)
+            for key, val in self.default_modifiers.items()
+        }
+
+        # asm_syntax of every loaded instruction compiled into a template
+        self.__templates = {
+            syntax: asm_template(syntax, self.__field_key)
+            for table in (self.i_insts, self.m_insts, self.a_insts,
+                          self.f_insts, self.d_insts, self.b_insts,
+                          self.c_insts)
+            for syntax in table.values()
+        }
+
+    def reseed(self, rng_seed) -> None:
+        """
+            Reseeds the random number generator used for the instructions and
+            forgets the labels generated so far. Used to make the instructions
+            generated for a test independent of the tests generated before it
+            by a shared generator.
+
+            :param rng_seed: seed as accepted by random.seed
+        """
+        seed(rng_seed)
+        self.prog_labels.clear()
+        self.__label_set.clear()
+
+    def __field_key(self, field: str, instruction: str) -> str:
+        """
+            Private function to find the modifier key of a placeholder in the
+            asm-syntax of an instruction
+
+            :param field: name of the placeholder without the leading '$'
             :param instruction: str containing the asm-syntax of an instruction
 
-            :return: str with the variable fields are replaced with random
-                     choice of registers/values
-
-        """
-        r_inst = instruction
-        if '$c.r' in r_inst:
-            # modifiers for compressed instruction registers
-            r_inst = r_inst.replace('$c.rd', sample(modifiers['c.rd'], 1)[0]) \
-                if '$c.rd' in r_inst else r_inst
-            r_inst = r_inst.replace('$c.rs1',
-                                    sample(modifiers['c.rs1'], 1)[0]) \
-                if '$c.rs1' in r_inst else r_inst
-            r_inst = r_inst.replace('$c.rs2',
-                                    sample(modifiers['c.rs2'], 1)[0]) \
-                if '$c.rs2' in r_inst else r_inst
-
-        if '$xr' in r_inst:
-            # modifiers for integer file registers
-            r_inst = r_inst.replace('$xrd',
-                                    sample(modifiers['xrd'], 1)[0]) \
-                if '$xrd' in r_inst else r_inst
-            r_inst = r_inst.replace('$xrs1',
-                                    sample(modifiers['xrs1'], 1)[0]) \
-                if '$xrs1' in r_inst else r_inst
-            r_inst = r_inst.replace('$xrs2',
-                                    sample(modifiers['xrs2'], 1)[0]) \
-                if '$xrs2' in r_inst else r_inst
-
-        if '$fr' in r_inst:
-            # modifiers for floating registers
-            r_inst = r_inst.replace('$frd',
-                                    sample(modifiers['frd'], 1)[0]) \
-                if '$frd' in r_inst else r_inst
-            r_inst = r_inst.replace('$frs1',
-                                    sample(modifiers['frs1'], 1)[0]) \
-                if '$frs1' in r_inst else r_inst
-            r_inst = r_inst.replace('$frs2',
-                                    sample(modifiers['frs2'], 1)[0]) \
-                if '$frs2' in r_inst else r_inst
-
-        if '$pred' in instruction or '$succ' in instruction:
-            r_inst = r_inst.replace('$pred',
-                                    sample(modifiers['$pred'], 1)[0]) \
-                if '$pred' in r_inst else r_inst
-            r_inst = r_inst.replace('$succ',
-                                    sample(modifiers['$succ'], 1)[0]) \
-                if '$succ' in r_inst else r_inst
-
-        r_inst = r_inst.replace('$rm',
-                                sample(modifiers['rm'], 1)[0]) \
-            if '$rm' in r_inst else r_inst
-        shamt = None
-        if '$shamt' in r_inst:
-            for i in ('slli', 'srli', 'srai'):
-                if i in r_inst and '32' in self.isa:
-                    shamt = modifiers['shamt5']
-                elif i in r_inst and '64' in self.isa:
-                    shamt = modifiers['shamt6']
-            for i in ('slliw', 'srliw', 'sraiw'):
-                if i in r_inst and '64' in self.isa:
-                    shamt = modifiers['shamt5']
-            for i in ('c.slli', 'c.srli', 'c.srai'):
-                if i in r_inst and '64' in self.isa:
-                    shamt = modifiers['shamt6']
-
-            r_inst = r_inst.replace('$shamt', sample(shamt, 1)[0])
-
-        if 'imm' in r_inst:
-            # modifiers for immediate fields
-            for imm in self.imm_fields.keys():
-                r_inst = r_inst.replace(
-                    imm,
-                    sample(modifiers[imm], 1)[0]) if imm in r_inst else r_inst
-
-        return r_inst
+            :return: key of the modifiers dict to draw the value from
+        """
+        if field == 'shamt':
+            # word variants and RV32 shift by 5 bits, the rest by 6 bits
+            mnemonic = instruction.split(' ', 1)[0]
+            if self.xlen == '32' or mnemonic.endswith('w'):
+                return 'shamt5'
+            return 'shamt6'
+        if f'${field}' in self.default_modifiers:
+            return f'${field}'
+        return field
+
+    def __emit(self, table: dict, insts: List[str], modifiers: dict,
+               special: frozenset = frozenset()) -> List[str]:
+        """
+            Private function to emit the asm for a stream of instructions
+
+            :param table: dict of instruction name to asm_syntax
+            :param insts: names of the instructions to be emitted in order
+            :param modifiers: modifiers normalized by __modifier_update
+            :param special: instructions to be handled by __handle_special
+
+            :return: a list containing generated asm instructions
+        """
+        templates = self.__templates
+        ret_list = []
+        append = ret_list.append
+        for inst in insts:
+            if inst in special:
+                append(self.__handle_special(inst))
+            else:
+                append(templates[table[inst]].render(modifiers))
+        return ret_list
+
+    def __handle_special(self, inst: str) -> str:
+        if inst == 'c.lui':
+            return f'{inst} x8, {randint(1, 32)}'
+        if inst == 'c.ebreak':
+            return 'c.nop'
+        return self.__handle_branch_load_store(inst)
 
     def __modifier_update(self, modifiers: Union[dict, None]) -> dict:
         """
@@ -226,26 +499,26 @@ class instruction_generator:
             :param modifiers: input modifiers from generate_x_inst function
 
             :return: sanitized modifiers containing default entries for
-                     unmentioned fields
+                     unmentioned fields. The values are frozen into
+                     indexable sequences and the input dict is not modified.
         """
         if modifiers is None:
             return self.default_modifiers
         else:
-            for key, val in self.default_modifiers.items():
-                if key not in modifiers:
-                    modifiers[key] = val
-            return modifiers
+            updated = dict(self.default_modifiers)
+            updated.update({
+                key: freeze_field(val) for key, val in modifiers.items()
+            })
+            return updated
 
     def __generate_labels(self, prefix='', no_of_chars=15):
         label = f'label_{prefix}_' + ''.join(
             choices(ascii_letters, k=no_of_chars))
-        if label not in self.prog_labels:
-            self.prog_labels.append(label)
-        else:
-            while label in self.prog_labels:
-                label = 'label_' + ''.join(
-                    choices(ascii_letters + digits, k=no_of_chars))
-            self.prog_labels.append(label)
+        while label in self.__label_set:
+            label = 'label_' + ''.join(
+                choices(ascii_letters + digits, k=no_of_chars))
+        self.__label_set.add(label)
+        self.prog_labels.append(label)
         return label
 
     def __handle_branch_load_store(self, inst):
@@ -361,37 +634,17 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.i_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                if key in ('beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu', 'jal',
-                           'jalr', 'lb', 'lh', 'lw', 'ld', 'lbu', 'lhu', 'lwu',
-                           'sb', 'sh', 'sw', 'sd'):
-                    ret_list.append(self.__handle_branch_load_store(key))
-                else:
-                    asm_syntax = self.i_insts[key]
-                    r_inst = self.__replace_fields(asm_syntax, modifiers)
-                    ret_list.append(r_inst)
+            insts = choices(list(self.i_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
             for i in instructions:
                 assert (i in self.i_insts.keys())
-
-            for _ in range(no_of_insts):
-                if len(instructions) <= 0:
-                    ret_list.append('nop')
-                else:
-                    inst = choice(instructions)
-                    if inst in ('beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu',
-                                'jal', 'jalr', 'lb', 'lh', 'lw', 'ld', 'lbu',
-                                'lhu', 'lwu', 'sb', 'sh', 'sw', 'sd'):
-                        ret_list.append(self.__handle_branch_load_store(inst))
-                    else:
-                        asm_syntax = self.i_insts[inst]
-                        r_inst = self.__replace_fields(asm_syntax,
-                                                       modifiers=modifiers)
-                        ret_list.append(r_inst)
-        return ret_list
+            if len(instructions) <= 0:
+                return ['nop'] * no_of_insts
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.i_insts, insts, modifiers, i_special_insts)
 
     def generate_all_i_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
@@ -422,20 +675,13 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.m_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                asm_syntax = self.m_insts[key]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
+            insts = choices(list(self.m_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
-            for _ in range(no_of_insts):
-                inst = choice(instructions)
-                asm_syntax = self.m_insts[inst]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
-        return ret_list
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.m_insts, insts, modifiers)
 
     def generate_all_m_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
@@ -479,20 +725,21 @@ class instruction_generator:
             _lab = self.__generate_labels(prefix=inst)
             _nop = '\tnop\n\tnop' if _align == 3 else '\tnop'
             _s_nop = 0x1300000013 if self.xlen == 64 else 0x13
-            ([xrs1,
-              temp], xrs2, xrd) = (sample(modifiers['xrs1'],
-                                          2), sample(modifiers['xrs2'], 1)[0],
-                                   sample(modifiers['xrd'], 1)[0])
+            ([xrs1, temp], xrs2, xrd) = (random_field(modifiers['xrs1'], 2),
+                                         random_field(modifiers['xrs2']),
+                                         random_field(modifiers['xrd']))
             _ = 0
             while len({xrs1, temp, xrs2, xrd}) != 4 \
                     or xrs2 == 'x0' or xrs1 == 'x0':
                 # making sure that register dependencies are met
-                ([xrs1, temp], xrs2, xrd) = (sample(modifiers['xrs1'], 2),
-                                             sample(modifiers['xrs2'], 1)[0],
-                                             sample(modifiers['xrd'], 1)[0])
+                ([xrs1, temp], xrs2, xrd) = (
+                    random_field(modifiers['xrs1'], 2),
+                    random_field(modifiers['xrs2']),
+                    random_field(modifiers['xrd']))
                 _ += 1
                 if _ == 100:
-                    raise Exception('Cant Solve Register Dependency Constraint')
+                    raise Exception(
+                        'Cant Solve Register Dependency Constraint')
 
             asm_syntax = asm_syntax.replace('$xrd', xrd)
             asm_syntax = asm_syntax.replace('$xrs1', xrs1)
@@ -557,26 +804,19 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.f_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                asm_syntax = self.f_insts[key]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
+            insts = choices(list(self.f_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
-            for _ in range(no_of_insts):
-                inst = choice(instructions)
-                asm_syntax = self.f_insts[inst]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
-        return ret_list
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.f_insts, insts, modifiers)
 
     def generate_all_f_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
         for f_inst in self.f_insts.keys():
             ret_list.append(
-                self.generate_i_inst([f_inst],
+                self.generate_f_inst([f_inst],
                                      modifiers=modifiers,
                                      no_of_insts=1)[0])
         return ret_list
@@ -602,26 +842,19 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.d_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                asm_syntax = self.d_insts[key]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
+            insts = choices(list(self.d_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
-            for _ in range(no_of_insts):
-                inst = choice(instructions)
-                asm_syntax = self.d_insts[inst]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
-        return ret_list
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.d_insts, insts, modifiers)
 
     def generate_all_d_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
         for d_inst in self.d_insts.keys():
             ret_list.append(
-                self.generate_i_inst([d_inst],
+                self.generate_d_inst([d_inst],
                                      modifiers=modifiers,
                                      no_of_insts=1)[0])
         return ret_list
@@ -646,82 +879,15 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.c_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                if key in (
-                        'c.beqz',
-                        'c.bnez',
-                        'c.j',
-                        'c.jal',
-                        'c.jalr',
-                        'c.jr',
-                        'c.ld',
-                        'c.sd',
-                        'c.lw',
-                        'c.sw'
-                        'c.fld',
-                        'c.flw',
-                        'c.fsd',
-                        'c.fsw',
-                        'c.fldsp',
-                        'c.fsdsp',
-                        'c.lwsp',
-                        'c.ldsp',
-                        'c.swsp',
-                        'c.sdsp',
-                ):
-                    ret_list.append(self.__handle_branch_load_store(key))
-                elif key == 'c.lui':
-                    r = randint(1, 32)
-                    ret_list.append(f'{key} x8, {r}')
-                elif key == 'c.ebreak':
-                    ret_list.append('c.nop')
-                else:
-                    asm_syntax = self.c_insts[key]
-                    r_inst = self.__replace_fields(asm_syntax, modifiers)
-                    ret_list.append(r_inst)
+            insts = choices(list(self.c_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
-            for _ in range(no_of_insts):
-                if len(instructions) <= 0:
-                    ret_list.append('nop')
-                else:
-                    inst = choice(instructions)
-                    if inst in (
-                            'c.beqz',
-                            'c.bnez',
-                            'c.j',
-                            'c.jal',
-                            'c.jalr',
-                            'c.jr',
-                            'c.ld',
-                            'c.sd',
-                            'c.lw',
-                            'c.sw',
-                            'c.fld',
-                            'c.flw',
-                            'c.fsd',
-                            'c.fsw',
-                            'c.fldsp',
-                            'c.fsdsp',
-                            'c.lwsp',
-                            'c.ldsp',
-                            'c.swsp',
-                            'c.sdsp',
-                    ):
-                        ret_list.append(self.__handle_branch_load_store(inst))
-                    elif inst == 'c.lui':
-                        r = randint(1, 32)
-                        ret_list.append(f'{inst} x8, {r}')
-                    elif inst == 'c.ebreak':
-                        ret_list.append('c.nop')
-                    else:
-                        asm_syntax = self.c_insts[inst]
-                        r_inst = self.__replace_fields(asm_syntax,
-                                                       modifiers=modifiers)
-                        ret_list.append(r_inst)
-        return ret_list
+            if len(instructions) <= 0:
+                return ['nop'] * no_of_insts
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.c_insts, insts, modifiers, c_special_insts)
 
     def generate_all_c_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
@@ -752,26 +918,54 @@ class instruction_generator:
         """
         modifiers = self.__modifier_update(modifiers)
 
-        ret_list = []
         if instructions == 'random':
-            random_insts = choices(list(self.b_insts.keys()), k=no_of_insts)
-            for key in random_insts:
-                asm_syntax = self.b_insts[key]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
+            insts = choices(list(self.b_insts.keys()), k=no_of_insts)
         elif type(instructions) == list:
-            for _ in range(no_of_insts):
-                inst = choice(instructions)
-                asm_syntax = self.b_insts[inst]
-                r_inst = self.__replace_fields(asm_syntax, modifiers=modifiers)
-                ret_list.append(r_inst)
-        return ret_list
+            insts = choices(instructions, k=no_of_insts)
+        else:
+            return []
+        return self.__emit(self.b_insts, insts, modifiers)
 
     def generate_all_b_inst(self, modifiers: Union[None, dict] = None):
         ret_list = []
-        for m_inst in self.m_insts.keys():
+        for b_inst in self.b_insts.keys():
             ret_list.append(
-                self.generate_i_inst([m_inst],
+                self.generate_b_inst([b_inst],
                                      modifiers=modifiers,
                                      no_of_insts=1)[0])
         return ret_list
+
+
+def get_instruction_generator(isa: str = 'RV64I',
+                              rng_seed=None) -> instruction_generator:
+    """
+        Process level factory for instruction_generator. The generator for an
+        ISA string is created once per process and shared by every plugin
+        running in that process. UATG creates it while initializing each worker
+        of the generation pool, and reseeds it with the test class name before
+        running a plugin, so the generated tests do not depend on which worker
+        ran the plugin.
+
+        :param isa: string containing the ISA for which instructions should
+                    be generated.
+        :param rng_seed: if not None, the generator is reseeded with this value
+
+        :return: the instruction_generator shared within the process
+
+        :Usage:
+
+        .. code-block:: Python
+
+            from uatg.instruction_generator import get_instruction_generator
+
+            generator = get_instruction_generator('RV64IMAFDC')
+            random_m_instructions = generator.generate_m_inst(no_of_insts=10)
+    """
+    try:
+        generator = generator_memo[isa]
+    except KeyError:
+        generator = instruction_generator(isa)
+        generator_memo[isa] = generator
+    if rng_seed is not None:
+        generator.reseed(rng_seed)
+    return generator
@@ -0,0 +1,1070 @@
+# See LICENSE.incore for license details
+"""
+Single pass matching of the regex_formats patterns over the logs of the DUT.
+
+The check_log methods of the plugins usually run one re.findall per pattern
+over the whole log. scan_log matches all the patterns they need in one pass
+instead, reading the log in blocks:
+
+    from uatg.log_scanner import scan_log
+
+    matches = scan_log(log_file_path, ['alloc_newind_pattern',
+                                       'misprediction_pattern'])
+    alloc_newind_pattern_result = matches['alloc_newind_pattern']
+
+query_log stops reading the log once the matches a check needs are found, and
+reads only the lines of a window of cycles:
+
+    from uatg.log_scanner import query_log
+
+    found, matches = query_log(log_file_path, ['fence_executed_pattern',
+                                               'misprediction_pattern'],
+                               in_order=True)
+
+The first query of a log writes a log_index next to it, with which the later
+queries skip the parts of the log where the patterns they need do not match.
+
+All of them read the logs compressed with one of log_compressions as well,
+found by find_log when the plain log does not exist. decompressed_log gives
+the readers of plain logs a decompressed copy.
+
+parse_bpu_log turns the BPU events of a log into columns, for statistics over
+the whole log:
+
+    from uatg.log_scanner import parse_bpu_log
+
+    trace = parse_bpu_log(log_file_path)
+    trace.btb_hit_rate(), trace.misprediction_rate(),
+    max(trace.ras_depth(), default=0)
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from errno import ENOENT
+from functools import lru_cache
+from hashlib import blake2b
+from importlib import import_module
+from json import dump as json_dump, load as json_load
+from os import cpu_count, fstat, remove, replace
+from os.path import dirname, isfile, splitext
+from shutil import copyfileobj, which
+from subprocess import Popen, PIPE
+from tempfile import mkstemp
+
+import uatg.regex_formats as rf
+from uatg.log import logger
+
+# prefix shared by the patterns of the BPU log lines. It is matched once for
+# all the patterns starting with it.
+bpu_prefix = r"\[\s*[0-9]*\]\s\[\s*[0-9]*\]BPU\s\:\s"
+
+# size of the blocks in which the logs are read
+log_block_size = 1 << 22
+
+# size of the blocks in which query_log reads the logs. It is smaller than
+# log_block_size, as a query stops at the block in which it is satisfied.
+query_block_size = 1 << 16
+
+# suffix of the side-car index written next to a log by query_log, and the
+# version of its format
+log_index_suffix = '.index.json'
+log_index_version = 1
+
+# suffixes of the compressed logs, with the commands decompressing them to
+# their output, fastest first, and the python module used without any of the
+# commands. xz decompresses the blocks of the logs compressed with -T in
+# parallel, pigz reads, decompresses and writes in separate threads.
+log_compressions = {
+    '.gz': ((('pigz', '-dc'), ('gzip', '-dc')), 'gzip'),
+    '.xz': ((('xz', '-T0', '-dc'),), 'lzma'),
+    '.zst': ((('zstd', '-dc'),), 'zstandard'),
+}
+
+# cycle at the start of the lines of the logs
+cycle_line = re.compile(rb'^\[\s*([0-9]+)\]', re.MULTILINE)
+
+
+def single_line_patterns():
+    """
+        :return: dict of the names and patterns of regex_formats which match
+                 within a line, and can be used by scan_log
+    """
+    return {
+        name: pattern
+        for name, pattern in vars(rf).items()
+        if name.endswith('_pattern') and isinstance(pattern, str) and
+        '\n' not in pattern and '\\n' not in pattern and
+        re.compile(pattern).groups == 0
+    }
+
+
+def log_blocks(log_file, block_size=log_block_size):
+    """
+        :param log_file: log opened in binary mode
+        :param block_size: number of bytes read at a time
+        :return: generator of the blocks of the log, from the current position
+                 of the file, each ending at the end of a line
+    """
+    tail = b''
+    while True:
+        block = log_file.read(block_size)
+        if not block:
+            if tail:
+                yield tail
+            return
+        block = tail + block
+        end = block.rfind(b'\n') + 1
+        if end:
+            tail = block[end:]
+            yield block[:end]
+        else:
+            tail = block
+
+
+def log_compression(log_file_path):
+    """
+        :param log_file_path: path of a log
+        :return: the suffix of the compression of the log in
+                 log_compressions, None if the log is not compressed
+    """
+    suffix = splitext(log_file_path)[1]
+    return suffix if suffix in log_compressions else None
+
+
+def find_log(log_file_path):
+    """
+        :param log_file_path: path of a log
+        :return: the path of the log, or the path of the log compressed with
+                 one of log_compressions if the log itself does not exist
+    """
+    for suffix in ('',) + tuple(log_compressions):
+        if isfile(log_file_path + suffix):
+            return log_file_path + suffix
+    raise FileNotFoundError(ENOENT, 'No log, compressed or not', log_file_path)
+
+
+@contextmanager
+def open_log(log_file_path):
+    """
+        opens a log for reading in binary mode. Compressed logs are
+        decompressed while they are read. With several cpus, the first
+        command of log_compressions found on the system decompresses them in
+        parallel with the reader. Otherwise the python module of the
+        compression decompresses them.
+
+        :param log_file_path: path of the log
+        :return: context manager of the log, as a binary file object
+    """
+    compression = log_compression(log_file_path)
+    if compression is None:
+        with open(log_file_path, 'rb') as log_file:
+            yield log_file
+        return
+
+    commands, module = log_compressions[compression]
+    # with a single cpu, a command only adds the copies through the pipe
+    command = next((command for command in commands if which(command[0])),
+                   None) if (cpu_count() or 1) > 1 else None
+    if command is not None:
+        with Popen(command + (log_file_path,),
+                   stdout=PIPE,
+                   stderr=PIPE,
+                   bufsize=query_block_size) as process:
+            try:
+                yield process.stdout
+            finally:
+                # a reader stopping early kills the command with SIGPIPE
+                process.stdout.close()
+                errors = process.stderr.read().decode(errors='replace')
+                if process.wait() > 0:
+                    raise OSError(f'{command[0]} could not decompress '
+                                  f'{log_file_path}: {errors.strip()}')
+        return
+
+    if module == 'zstandard':
+        try:
+            from zstandard import ZstdDecompressor
+        except ImportError:
+            raise ImportError(f'Reading {log_file_path} needs the zstd '
+                              f'command or zstandard. Install it using "pip '
+                              f'install zstandard"') from None
+        with open(log_file_path, 'rb') as compressed, \
+                ZstdDecompressor().stream_reader(compressed) as log_file:
+            yield log_file
+    else:
+        with import_module(module).open(log_file_path, 'rb') as log_file:
+            yield log_file
+
+
+@contextmanager
+def decompressed_log(log_file_path):
+    """
+        decompresses a compressed log into a temporary file next to it, for
+        the readers which only read plain logs. The file is removed on exit.
+
+        :param log_file_path: path of the log
+        :return: context manager of the path of the decompressed log, the
+                 path of the log itself if it is not compressed
+    """
+    if log_compression(log_file_path) is None:
+        yield log_file_path
+        return
+    descriptor, plain_file_path = mkstemp(prefix='.log-',
+                                          dir=dirname(log_file_path))
+    try:
+        with open(descriptor, 'wb') as plain_file, \
+                open_log(log_file_path) as log_file:
+            copyfileobj(log_file, plain_file, log_block_size)
+        yield plain_file_path
+    finally:
+        remove(plain_file_path)
+
+
+class line_pattern:
+    """
+        A pattern spanning consecutive lines, matched by a state machine which
+        looks at one line at a time. It replaces a regular expression of the
+        form (A)(.*\n){k}(B\n)(C), which would backtrack over the whole log.
+
+        The first step is searched within a line, the middle steps have to
+        match their whole line, None matching any line, and the last step is
+        matched at the start of its line. A match is the tuple of the text of
+        every step, the middle steps with their newline, as re.findall returns
+        for the regular expression. Matches do not overlap.
+    """
+
+    def __init__(self, steps):
+        """
+            :param steps: patterns of the consecutive lines
+        """
+        self.first = re.compile(steps[0].encode())
+        self.middle = [
+            None if step is None else re.compile(step.encode())
+            for step in steps[1:-1]
+        ]
+        self.last = re.compile(steps[-1].encode())
+
+    def match_lines(self, block, start):
+        """
+            runs the state machine from a match of the first step.
+
+            :param block: block of the log
+            :param start: match of the first step in the block
+            :return: (texts, end) of the match, None if it does not match,
+                     or ... if the block ends before the match is decided
+        """
+        texts = [start.group()]
+        position = block.find(b'\n', start.end()) + 1
+        if not position:
+            return ...
+        for step in self.middle:
+            end = block.find(b'\n', position)
+            if end < 0:
+                return ...
+            line = block[position:end]
+            if step is not None and not step.fullmatch(line):
+                return None
+            texts.append(line + b'\n')
+            position = end + 1
+        if position == len(block):
+            return ...
+        match = self.last.match(block, position)
+        if match is None:
+            # the line may only be partly in the block
+            return ... if block.find(b'\n', position) < 0 else None
+        texts.append(match.group())
+        return texts, match.end()
+
+    def scan(self, block, final):
+        """
+            :param block: block of the log, ending at the end of a line
+            :param final: True for the last block of the log
+            :return: (matches, carry) where matches is the list of the
+                     positions of the matches in the block and the matches,
+                     and carry is the part of the block which has to be
+                     scanned again with the next block
+        """
+        matches = []
+        resume = 0
+        for start in self.first.finditer(block):
+            if start.start() < resume:
+                continue
+            result = self.match_lines(block, start)
+            if result is ...:
+                if final:
+                    continue
+                return matches, block[block.rfind(b'\n', 0, start.start()) +
+                                      1:]
+            if result is not None:
+                texts, resume = result
+                matches.append(
+                    (start.start(),
+                     tuple(text.decode(errors='replace') for text in texts)))
+        return matches, b''
+
+
+def line_steps(pattern):
+    """
+        :param pattern: pattern of regex_formats spanning several lines
+        :return: the patterns of the consecutive lines of the pattern for
+                 line_pattern, None if the pattern is not of the form
+                 (A)(.*\n){k}(B\n)(C)
+    """
+    match = re.fullmatch(r'\((.*)\)\(\.\*\n\)\{([0-9]+)\}\((.*)\n\)\((.*)\)',
+                         pattern, re.DOTALL)
+    if match is None or int(match.group(2)) < 1:
+        return None
+    first, lines, middle, last = match.groups()
+    # the first of the k lines is the end of the line of A
+    return (first,) + (None,) * (int(lines) - 1) + (middle, last)
+
+
+# patterns of regex_formats which span several lines, as the patterns of their
+# consecutive lines for line_pattern
+multi_line_patterns = {
+    name: line_steps(pattern)
+    for name, pattern in vars(rf).items()
+    if name.endswith('_pattern') and isinstance(pattern, str) and
+    '\n' in pattern and line_steps(pattern) is not None
+}
+
+
+class log_scanner:
+    """
+        Matches a set of patterns in one pass over a log. The patterns within
+        a line are combined into a single regular expression, with a named
+        group for each pattern. The patterns spanning several lines are
+        line_patterns, run on the same blocks of the log.
+
+        The matches are the same as those of re.findall on the whole log.
+    """
+
+    def __init__(self, patterns, line_patterns=None):
+        """
+            :param patterns: dict of the names and the patterns within a line
+            :param line_patterns: dict of the names and the steps of the
+                                  patterns spanning several lines
+        """
+        self.line_patterns = {
+            name: line_pattern(steps)
+            for name, steps in (line_patterns or {}).items()
+        }
+        self.names = tuple(patterns) + tuple(self.line_patterns)
+        prefixed, others = [], []
+        for name, pattern in patterns.items():
+            if pattern.startswith(bpu_prefix):
+                prefixed.append(f'(?P<{name}>{pattern[len(bpu_prefix):]})')
+            else:
+                others.append(f'(?P<{name}>{pattern})')
+        alternatives = others
+        if prefixed:
+            alternatives.append(f'{bpu_prefix}(?:{"|".join(prefixed)})')
+        self.regex = re.compile('|'.join(alternatives).encode()) \
+            if alternatives else None
+
+    def line_matches(self, blocks, offset=0):
+        """
+            runs the line_patterns over the blocks of a log.
+
+            :param blocks: blocks of the log, each ending at the end of a line
+            :param offset: position of the first block in the log
+            :return: generator of (offset, block, found, horizon) for each
+                     block, where offset is the position of the block in the
+                     log, found is the list of the positions in the log,
+                     names and matches of the line_patterns decided with the
+                     block, and horizon is the position in the log from which
+                     matches may still be found with the next blocks
+        """
+        carry = dict.fromkeys(self.line_patterns, b'')
+        block = next(blocks, b'')
+        while block:
+            next_block = next(blocks, b'')
+            found = []
+            end = offset + len(block)
+            horizon = end
+            for name, pattern in self.line_patterns.items():
+                start = offset - len(carry[name])
+                matches, carry[name] = pattern.scan(carry[name] + block,
+                                                    not next_block)
+                found += [(start + position, name, match)
+                          for position, match in matches]
+                horizon = min(horizon, end - len(carry[name]))
+            yield offset, block, found, horizon
+            offset = end
+            block = next_block
+
+    def blocks(self, log_file, matches):
+        """
+            :param log_file: log opened in binary mode
+            :param matches: dict in which the matches of the line_patterns
+                            are collected
+            :return: generator of the blocks of the log for the patterns
+                     within a line
+        """
+        for _, block, found, _ in self.line_matches(log_blocks(log_file)):
+            for _, name, match in found:
+                matches[name].append(match)
+            yield block
+
+    def scan(self, log_file_path, counts_only=False):
+        """
+            :param log_file_path: path of the log
+            :param counts_only: count the matches instead of collecting them
+            :return: dict of the pattern names and their list of matches, or
+                     their number of matches if counts_only
+        """
+        matches = {name: [] for name in self.names}
+        if counts_only:
+            counts = dict.fromkeys(self.names, 0)
+            with open_log(log_file_path) as log_file:
+                for block in self.blocks(log_file, matches):
+                    for match in self.regex.finditer(block) \
+                            if self.regex else ():
+                        counts[match.lastgroup] += 1
+            for name in self.line_patterns:
+                counts[name] = len(matches[name])
+            return counts
+
+        with open_log(log_file_path) as log_file:
+            for block in self.blocks(log_file, matches):
+                for match in self.regex.finditer(block) if self.regex else ():
+                    matches[match.lastgroup].append(
+                        match.group().decode(errors='replace'))
+        return matches
+
+
+@lru_cache(maxsize=None)
+def get_log_scanner(names=None):
+    """
+        :param names: tuple of the regex_formats patterns to be matched, None
+                      for all of them
+        :return: the log_scanner of the patterns, compiled once per process
+    """
+    patterns = single_line_patterns()
+    if names is None:
+        return log_scanner(patterns, multi_line_patterns)
+    unknown = [
+        name for name in names
+        if name not in patterns and name not in multi_line_patterns
+    ]
+    if unknown:
+        raise ValueError(f'{", ".join(unknown)} cannot be matched by the log '
+                         f'scanner')
+    return log_scanner(
+        {name: patterns[name] for name in names if name in patterns},
+        {name: multi_line_patterns[name] for name in names
+         if name in multi_line_patterns})
+
+
+def scan_log(log_file_path, names=None, counts_only=False):
+    """
+        matches the patterns of regex_formats in one pass over the log.
+
+        :param log_file_path: path of the log
+        :param names: names of the regex_formats patterns to be matched, None
+                      for all of them
+        :param counts_only: count the matches instead of collecting them
+        :return: dict of the pattern names and their list of matches, or
+                 their number of matches if counts_only
+    """
+    if names is not None:
+        names = tuple(names)
+    return get_log_scanner(names).scan(log_file_path, counts_only)
+
+
+def cycle_after(log_file, offset):
+    """
+        :param log_file: log opened in binary mode
+        :param offset: position in the log
+        :return: (cycle, start) of the first line starting at or after the
+                 offset with a cycle, (None, size of the log) if there is none
+    """
+    start = max(offset - 1, 0)
+    log_file.seek(start)
+    data = b''
+    while True:
+        chunk = log_file.read(query_block_size)
+        data += chunk
+        # the line in which the offset falls is skipped, unless it starts at
+        # the offset
+        begin = data.find(b'\n') + 1 if offset else 0
+        match = cycle_line.search(data, begin) if begin or not offset \
+            else None
+        if match:
+            return int(match.group(1)), start + match.start()
+        if not chunk:
+            return None, start + len(data)
+
+
+def seek_cycle(log_file, cycle, low=0, high=None):
+    """
+        finds the first line of the log from a cycle, by a binary search over
+        the log. The cycles of the lines of the log never decrease.
+
+        :param log_file: log opened in binary mode
+        :param cycle: first cycle to be read
+        :param low: position in the log from which the line is searched
+        :param high: position in the log up to which the line is searched,
+                     None for the end of the log
+        :return: position of the first line of the log with a cycle not less
+                 than the cycle
+    """
+    if high is None:
+        high = log_file.seek(0, 2)
+    while low < high:
+        middle = (low + high) // 2
+        line_cycle, _ = cycle_after(log_file, middle)
+        if line_cycle is None or line_cycle >= cycle:
+            high = middle
+        else:
+            low = middle + 1
+    return cycle_after(log_file, low)[1]
+
+
+def window_blocks(blocks, last_cycle, first_cycle=None):
+    """
+        :param blocks: blocks of a log, each ending at the end of a line
+        :param last_cycle: last cycle to be read, None for the end of the log
+        :param first_cycle: first cycle to be read, None if the blocks start
+                            from it. The logs which cannot be searched for
+                            the first cycle are read up to it.
+        :return: generator of the blocks, from the first line of the log with
+                 a cycle not less than first_cycle, ending at the last line
+                 of the log with a cycle not greater than last_cycle
+    """
+    for block in blocks:
+        if first_cycle is not None or last_cycle is not None:
+            last = cycle_line.search(block,
+                                     block.rfind(b'\n', 0, len(block) - 1) +
+                                     1)
+            last = None if last is None else int(last.group(1))
+        if first_cycle is not None:
+            if last is not None and last < first_cycle:
+                continue
+            for line in cycle_line.finditer(block):
+                if int(line.group(1)) >= first_cycle:
+                    block = block[line.start():]
+                    first_cycle = None
+                    break
+            else:
+                continue
+        if last_cycle is not None and (last is None or last > last_cycle):
+            for line in cycle_line.finditer(block):
+                if int(line.group(1)) > last_cycle:
+                    if line.start():
+                        yield block[:line.start()]
+                    return
+        yield block
+
+
+def log_fingerprint(log_file):
+    """
+        :param log_file: log opened in binary mode
+        :return: dict of the size, the modification time and the hash of the
+                 first and the last blocks of the log, which tell whether the
+                 log changed since its index was written
+    """
+    status = fstat(log_file.fileno())
+    digest = blake2b(digest_size=16)
+    log_file.seek(0)
+    digest.update(log_file.read(query_block_size))
+    log_file.seek(max(status.st_size - query_block_size, 0))
+    digest.update(log_file.read(query_block_size))
+    return {
+        'size': status.st_size,
+        'mtime_ns': status.st_mtime_ns,
+        'hash': digest.hexdigest()
+    }
+
+
+class log_index:
+    """
+        Side-car index of a log, in the file log_file_path + log_index_suffix.
+        The log is split into buckets, the blocks in which query_log reads
+        it, each starting at a line.
+
+        offsets - list of the positions of the buckets in the log,
+        cycles - list of the first cycle of each bucket, the cycle of the
+                 bucket before it if none of its lines has a cycle,
+        tags - dict of the regex_formats pattern names and the sorted list of
+               the buckets in which their matches start,
+        fingerprint - log_fingerprint of the indexed log
+    """
+
+    def __init__(self, offsets, cycles, tags, fingerprint):
+        self.offsets = offsets
+        self.cycles = cycles
+        self.tags = tags
+        self.fingerprint = fingerprint
+
+    def bucket(self, offset):
+        """
+            :param offset: position in the log
+            :return: the bucket holding the position
+        """
+        return max(bisect_right(self.offsets, offset) - 1, 0)
+
+    def cycle_range(self, cycle):
+        """
+            :param cycle: cycle of the log
+            :return: (low, high) positions in the log between which the first
+                     line with a cycle not less than the cycle starts, high
+                     being None for the end of the log
+        """
+        bucket = max(bisect_left(self.cycles, cycle) - 1, 0)
+        high = self.offsets[bucket + 1] \
+            if bucket + 1 < len(self.offsets) else None
+        return self.offsets[bucket], high
+
+    def next_offset(self, names, offset):
+        """
+            :param names: regex_formats pattern names
+            :param offset: position in the log
+            :return: the position, or the position of the first bucket after
+                     it in which a match of the patterns starts if there is
+                     none in its bucket, None if there is no match of the
+                     patterns after the bucket of the position
+        """
+        bucket = self.bucket(offset)
+        buckets = [
+            self.tags[name][bisect_left(self.tags[name], bucket)]
+            for name in names
+            if self.tags[name] and self.tags[name][-1] >= bucket
+        ]
+        if not buckets:
+            return None
+        return max(offset, self.offsets[min(buckets)])
+
+    def dump(self, index_file_path):
+        """
+            writes the index into a file.
+
+            :param index_file_path: path of the index
+        """
+        with open(index_file_path + '.tmp', 'w') as index_file:
+            json_dump(
+                {
+                    'version': log_index_version,
+                    'fingerprint': self.fingerprint,
+                    'offsets': self.offsets,
+                    'cycles': self.cycles,
+                    'tags': self.tags
+                },
+                index_file,
+                separators=(',', ':'))
+        replace(index_file_path + '.tmp', index_file_path)
+
+
+def build_log_index(log_file_path):
+    """
+        indexes a log, in one pass over it matching all the patterns of
+        regex_formats.
+
+        :param log_file_path: path of the log
+        :return: log_index of the log
+    """
+    scanner = get_log_scanner(None)
+    offsets, cycles = [], []
+    tags = {name: [] for name in scanner.names}
+    cycle = 0
+    with open(log_file_path, 'rb') as log_file:
+        fingerprint = log_fingerprint(log_file)
+        log_file.seek(0)
+        for offset, block, found, _ in scanner.line_matches(
+                log_blocks(log_file, query_block_size)):
+            bucket = len(offsets)
+            offsets.append(offset)
+            first = cycle_line.search(block)
+            if first:
+                cycle = int(first.group(1))
+            cycles.append(cycle)
+            if scanner.regex:
+                for name in set(
+                        match.lastgroup
+                        for match in scanner.regex.finditer(block)):
+                    tags[name].append(bucket)
+            # the matches of the line_patterns may start in the buckets
+            # before the block
+            for position, name, _ in found:
+                start = bisect_right(offsets, position) - 1
+                if not tags[name] or tags[name][-1] < start:
+                    tags[name].append(start)
+                elif start not in tags[name]:
+                    insort(tags[name], start)
+    return log_index(offsets, cycles, tags, fingerprint)
+
+
+def get_log_index(log_file_path, log_file=None):
+    """
+        loads the index of a log, indexing the log first if it has no index
+        or the log changed since its index was written.
+
+        :param log_file_path: path of the log
+        :param log_file: the log opened in binary mode, if it is open
+        :return: log_index of the log, None if the index cannot be written
+                 next to the log
+    """
+    index_file_path = log_file_path + log_index_suffix
+    if log_file is None:
+        with open(log_file_path, 'rb') as log_file:
+            fingerprint = log_fingerprint(log_file)
+    else:
+        fingerprint = log_fingerprint(log_file)
+    try:
+        with open(index_file_path) as index_file:
+            index = json_load(index_file)
+        if index['version'] == log_index_version and \
+                index['fingerprint'] == fingerprint:
+            return log_index(index['offsets'], index['cycles'],
+                             index['tags'], index['fingerprint'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    index = build_log_index(log_file_path)
+    try:
+        index.dump(index_file_path)
+    except OSError as error:
+        logger.warning(f'Could not write the index of {log_file_path}: '
+                       f'{error}')
+        return None
+    return index
+
+
+def query_log(log_file_path,
+              require,
+              first_cycle=None,
+              last_cycle=None,
+              in_order=False,
+              use_index=True):
+    """
+        looks for the matches of regex_formats patterns required by a check,
+        reading the log only until all of them are found. For example, a
+        misprediction after a fence, between the cycles 10000 and 20000:
+
+            found, matches = query_log(log_file_path,
+                                       ['fence_executed_pattern',
+                                        'misprediction_pattern'],
+                                       first_cycle=10000, last_cycle=20000,
+                                       in_order=True)
+
+        The cycle window is found by a binary search over the cycles at the
+        start of the lines, so the lines before it are not read. The
+        compressed logs are decompressed from their start instead.
+
+        With use_index, the first query of a log writes its log_index next
+        to it, reading the whole log once. The later queries of the log only
+        read the buckets of the log in which the patterns they look for
+        match. The index is written again whenever the log changes. The
+        compressed logs are not indexed.
+
+        :param log_file_path: path of the log
+        :param require: dict of the names of the regex_formats patterns and
+                        the number of matches required, or a list of the
+                        names requiring one match each
+        :param first_cycle: first cycle to be read, None for the start of the
+                            log
+        :param last_cycle: last cycle to be read, None for the end of the log
+        :param in_order: the matches of each pattern have to follow those of
+                         the patterns before it in require
+        :param use_index: use the log_index of the log
+        :return: (found, matches) where found is True if all the required
+                 matches are found, and matches is the dict of the pattern
+                 names and their list of matches, with at most the required
+                 number of matches
+    """
+    if not isinstance(require, dict):
+        require = dict.fromkeys(require, 1)
+    scanner = get_log_scanner(tuple(require))
+    stages = [(name,) for name in require] if in_order else [tuple(require)]
+    matches = {name: [] for name in require}
+
+    def stage_done(names):
+        return all(len(matches[name]) >= require[name] for name in names)
+
+    stage = 0
+    while stage < len(stages) and stage_done(stages[stage]):
+        stage += 1
+
+    # the compressed logs are read from their start, without an index
+    compressed = log_compression(log_file_path) is not None
+    with open_log(log_file_path) as log_file:
+        index = get_log_index(log_file_path, log_file) \
+            if use_index and not compressed and stage < len(stages) else None
+        offset = 0
+        if first_cycle is not None and not compressed:
+            low, high = index.cycle_range(first_cycle) if index else (0, None)
+            offset = seek_cycle(log_file, first_cycle, low, high)
+        blocks = None
+        # matches after the carry of a line_pattern, kept until the matches
+        # of the line_pattern before them are known
+        pending = []
+        horizon = offset
+        while stage < len(stages):
+            if index and not pending and horizon == offset:
+                # nothing is left undecided before the offset, the buckets
+                # without matches of the stage are skipped
+                next_offset = index.next_offset([
+                    name for name in stages[stage]
+                    if len(matches[name]) < require[name]
+                ], offset)
+                if next_offset is None:
+                    break
+                if next_offset != offset:
+                    offset = horizon = next_offset
+                    blocks = None
+            if blocks is None:
+                if not compressed:
+                    log_file.seek(offset)
+                blocks = scanner.line_matches(
+                    window_blocks(log_blocks(log_file, query_block_size),
+                                  last_cycle,
+                                  first_cycle if compressed else None),
+                    offset)
+            offset, block, events, horizon = next(blocks, (offset, b'',
+                                                           None, offset))
+            if not block:
+                break
+            events += pending
+            if scanner.regex:
+                events += [(offset + match.start(), match.lastgroup,
+                            match.group().decode(errors='replace'))
+                           for match in scanner.regex.finditer(block)]
+            events.sort(key=lambda event: event[0])
+            pending = [event for event in events if event[0] >= horizon]
+            for _, name, match in events[:len(events) - len(pending)]:
+                if name not in stages[stage] or \
+                        len(matches[name]) >= require[name]:
+                    continue
+                matches[name].append(match)
+                while stage < len(stages) and stage_done(stages[stage]):
+                    stage += 1
+                if stage == len(stages):
+                    break
+            offset += len(block)
+    return stage == len(stages), matches
+
+
+# events of the BPU log lines parsed by parse_bpu_log, in the order of their
+# codes in the kind column, with the regex_formats pattern of each event and
+# the fields it carries. A field is the part of the pattern following its
+# anchor, as (anchor, part), which bpu_event_patterns turns into a group.
+bpu_events = (
+    ('prediction_request', 'pred_req_pattern',
+     {'pc': (r"pc\:\s'h", r"[0-9a-z]+"), 'ghr': (r"ghr\:\s", r"\d+")}),
+    ('match', 'bpu_match_pattern', {}),
+    ('btb_hit', 'btb_hit_pattern',
+     {'target': (r"target\:\s'h", r"[0-9a-z]+"), 'ci': (r"ci:\s", r"\w*")}),
+    ('training', 'train_data_pattern',
+     {'pc': (r"pc\:\s'h", r"[0-9a-z]+"),
+      'target': (r"target\:\s'h", r"[0-9a-z]+"),
+      'ci': (r"ci\:\s", r"\w+")}),
+    ('train_existing', 'train_existing_pattern',
+     {'index': (r"index\:\s+", r"\d+"), 'ghr': (r"ghr\:\s", r"\d+")}),
+    ('allocate', 'alloc_newind_pattern',
+     {'index': (r"index\:\s+", r"[0-9]+"), 'ghr': (r"ghr\:\s", r"\d+")}),
+    ('conflict', 'conflict_pattern', {}),
+    ('ras_push', 'pushing_to_ras_pattern',
+     {'target': (r"RAS\:", r"[0-9a-z]+")}),
+    ('ras_pop', 'choosing_top_ras_pattern',
+     {'target': (r"RAS\:", r"[0-9a-z]+")}),
+    ('new_ghr', 'new_ghr_pattern', {'ghr': (r"GHR\:\s", r"\d+")}),
+    ('bht_index', 'bht_ind_target_pattern',
+     {'index': (r"BHTindex_\:", r"\d+"),
+      'target': (r"Target\:\s*", r"\d+"),
+      'ghr': (r"ghr\:\s", r"\d+")}),
+    ('misprediction', 'misprediction_pattern',
+     {'ghr': (r"ghr\:\s", r"\d+")}),
+    # the first line of the fence_executed_pattern
+    ('fence', 'fence_executed_pattern', {}),
+)
+
+# prefix of the BPU log lines, with the cycle
+bpu_event_prefix = r"\[\s*(?P<cycle>[0-9]*)\]\s\[\s*[0-9]*\]BPU\s\:\s"
+
+
+@lru_cache(maxsize=None)
+def bpu_event_patterns():
+    """
+        :return: tuple of the kind and the pattern of each of the bpu_events,
+                 built from its regex_formats pattern without the bpu_prefix,
+                 with a named group for each field
+    """
+    patterns = []
+    for kind, name, fields in bpu_events:
+        pattern = getattr(rf, name)
+        if name in multi_line_patterns:
+            pattern = multi_line_patterns[name][0]
+        if not pattern.startswith(bpu_prefix):
+            raise ValueError(f'{name} of regex_formats does not start with '
+                             f'the prefix of the BPU log lines')
+        pattern = pattern[len(bpu_prefix):]
+        for field, (anchor, part) in fields.items():
+            if pattern.count(anchor + part) != 1:
+                raise ValueError(f'The {field} of {name} of regex_formats '
+                                 f'cannot be found as {anchor + part}')
+            pattern = pattern.replace(anchor + part,
+                                      f'{anchor}(?P<{field}>{part})')
+        patterns.append((kind, pattern))
+    return tuple(patterns)
+
+
+class bpu_trace:
+    """
+        The events of a BPU log, stored as columns. Row i of the columns is
+        the i-th event of the log.
+
+        cycle - array('Q') of the cycles,
+        kind - array('B') of the indices of the events in bpu_events,
+        pc - array('Q') of the pcs, 0 if the event has none,
+        target - array('Q') of the targets (the address for the RAS), 0 if
+                 the event has none,
+        ghr - array('Q') of the ghr values, 0 if the event has none,
+        index - array('l') of the BTB/BHT indices, -1 if the event has none,
+        ci - array('B') of the indices of the control instruction types in
+             ci_names, 0 if the event has none
+    """
+
+    kinds = tuple(kind for kind, *_ in bpu_events)
+
+    def __init__(self):
+        self.cycle = array('Q')
+        self.kind = array('B')
+        self.pc = array('Q')
+        self.target = array('Q')
+        self.ghr = array('Q')
+        self.index = array('l')
+        self.ci = array('B')
+        self.ci_names = ['']
+
+    def __len__(self):
+        return len(self.kind)
+
+    def count(self, kind):
+        """
+            :param kind: name of the event in bpu_events
+            :return: number of events of the kind
+        """
+        return self.kind.tobytes().count(bytes((self.kinds.index(kind),)))
+
+    def rows(self, kind):
+        """
+            :param kind: name of the event in bpu_events
+            :return: list of the rows of the events of the kind
+        """
+        code = self.kinds.index(kind)
+        return [row for row, value in enumerate(self.kind) if value == code]
+
+    def btb_hit_rate(self):
+        """
+            :return: BTB hits per prediction request, None without requests
+        """
+        requests = self.count('prediction_request')
+        return self.count('btb_hit') / requests if requests else None
+
+    def misprediction_rate(self):
+        """
+            :return: mispredictions per training event, None without training
+        """
+        trainings = self.count('training')
+        return self.count('misprediction') / trainings if trainings else None
+
+    def ras_depth(self):
+        """
+            :return: array('l') of the depth of the RAS after each push and
+                     pop, in the order of the log. A pop of the empty RAS
+                     leaves it empty.
+        """
+        push = self.kinds.index('ras_push')
+        pop = self.kinds.index('ras_pop')
+        depth, depths = 0, array('l')
+        for value in self.kind:
+            if value == push:
+                depth += 1
+                depths.append(depth)
+            elif value == pop:
+                depth = max(depth - 1, 0)
+                depths.append(depth)
+        return depths
+
+    def to_numpy(self):
+        """
+            :return: the events as a numpy structured array, with a field for
+                     each column. Requires numpy, which is not a dependency of
+                     UATG.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            raise ImportError('to_numpy needs numpy. Install it using '
+                              '"pip install numpy" or use the columns') \
+                from None
+
+        events = np.empty(len(self),
+                          dtype=[('cycle', np.uint64), ('kind', np.uint8),
+                                 ('pc', np.uint64), ('target', np.uint64),
+                                 ('ghr', np.uint64), ('index', np.int64),
+                                 ('ci', np.uint8)])
+        for field in events.dtype.names:
+            events[field] = np.frombuffer(getattr(self, field),
+                                          dtype=getattr(self, field).typecode)
+        return events
+
+
+@lru_cache(maxsize=None)
+def bpu_event_regex():
+    """
+        :return: the regular expression matching all the bpu_events. The
+                 groups of the fields of each event are named
+                 <kind>__<field>.
+    """
+    alternatives = [
+        f'(?P<{kind}>' +
+        re.sub(r'\(\?P<(\w+)>', rf'(?P<{kind}__\1>', pattern) + ')'
+        for kind, pattern in bpu_event_patterns()
+    ]
+    return re.compile(
+        f'{bpu_event_prefix}(?:{"|".join(alternatives)})'.encode())
+
+
+def parse_bpu_log(log_file_path):
+    """
+        parses the BPU events of a log into columns, in one pass over the log.
+
+        :param log_file_path: path of the log
+        :return: bpu_trace of the events
+    """
+    regex = bpu_event_regex()
+    trace = bpu_trace()
+    codes = {kind: code for code, kind in enumerate(bpu_trace.kinds)}
+    ci_codes = {'': 0}
+    # names of the groups of the fields of each event, in the order of the
+    # columns pc, target, ghr, index, ci
+    fields = {
+        kind: [f'{kind}__{field}' if field in kind_fields else None
+               for field in ('pc', 'target', 'ghr', 'index', 'ci')]
+        for kind, _, kind_fields in bpu_events
+    }
+
+    with open_log(log_file_path) as log_file:
+        for block in log_blocks(log_file):
+            for match in regex.finditer(block):
+                kind = match.lastgroup
+                pc, target, ghr, index, ci = (
+                    match.group(group) if group else None
+                    for group in fields[kind])
+                trace.cycle.append(int(match.group('cycle') or 0))
+                trace.kind.append(codes[kind])
+                trace.pc.append(int(pc, 16) if pc else 0)
+                trace.target.append(int(target, 16) if target else 0)
+                trace.ghr.append(int(ghr, 2) if ghr else 0)
+                trace.index.append(int(index) if index else -1)
+                if ci is None:
+                    trace.ci.append(0)
+                else:
+                    ci = ci.decode()
+                    if ci not in ci_codes:
+                        ci_codes[ci] = len(trace.ci_names)
+                        trace.ci_names.append(ci)
+                    trace.ci.append(ci_codes[ci])
+    return trace
@@ -155,11 +155,30 @@ def clean(module_dir, work_dir, verbose):
               default=None,
               help='Select the paging modes for whihc the tests need to be '
                     'generated')
+@click.option('--incremental',
+              '-inc',
+              is_flag=True,
+              required=False,
+              help='Set this flag to regenerate only the tests of the plugins '
+              'which changed since the previous run in the work_dir')
+@click.option('--deterministic',
+              '-dt',
+              is_flag=True,
+              required=False,
+              help='Set this flag to generate tests without the user and time '
+              'in their headers, and to rewrite only the files which changed')
+@click.option('--toolchain',
+              '-tch',
+              multiple=False,
+              required=False,
+              default='gcc',
+              help='Toolchain compiling the tests: gcc, stub (checks the '
+              'tests without a cross compiler) or the path of a GNU compiler')
 
 @cli.command()
 def generate(alias_file, configuration, linker_dir, module_dir, gen_cvg,
              gen_test_list, work_dir, modules, verbose, index_file, jobs, 
-             paging_modes):
+             paging_modes, incremental, deterministic, toolchain):
     """
     Generates tests, cover-groups for a list of modules corresponding to the DUT
     parameters specified in the configuration yamls, inside the work_dir.
@@ -168,7 +187,8 @@ def generate(alias_file, configuration, linker_dir, module_dir, gen_cvg,
     Requires: -cfg, --configuration, -md, --module_dir; -wd, --work_dir\n
     Depends : (-gc, --gen_cvg -> -af, --alias_file)\n
     Optional: -gc, --gen_cvg; -t, --gen_test_list; -ld, --linker_dir;\n
-              -m, --modules; -v, --verbose
+              -m, --modules; -v, --verbose; -inc, --incremental;\n
+              -dt, --deterministic; -tch, --toolchain
     """
     logger.level(verbose)
     info(__version__)
@@ -192,7 +212,10 @@ def generate(alias_file, configuration, linker_dir, module_dir, gen_cvg,
                    test_list=str(gen_test_list),
                    index_path=index_file,
                    paging_modes=paging_modes,
-                   jobs=jobs)
+                   jobs=jobs,
+                   incremental=incremental,
+                   deterministic=deterministic,
+                   toolchain=toolchain)
     if gen_cvg:
         if alias_file is not None:
             alias_dict = load_yaml(alias_file)
@@ -280,6 +303,10 @@ def from_config(config_file, verbose):
     config_test_list_flag = config['uatg']['gen_test_list']
     index_yaml_path = config['uatg']['index_file']
     required_paging_modes = config['uatg']['paging_modes']
+    incremental = config['uatg'].get('incremental', 'False').lower() == 'true'
+    deterministic = config['uatg'].get('deterministic',
+                                       'False').lower() == 'true'
+    toolchain = config['uatg'].get('toolchain', 'gcc')
     # Uncomment to overwrite verbosity from config file.
     # verbose = config['uatg']['verbose']
 
@@ -311,13 +338,27 @@ def from_config(config_file, verbose):
                        test_list=config_test_list_flag,
                        index_path=index_yaml_path,
                        paging_modes=required_paging_modes,
-                       jobs=jobs)
+                       jobs=jobs,
+                       incremental=incremental,
+                       deterministic=deterministic,
+                       toolchain=toolchain)
 
     if config['uatg']['test_compile'].lower() == 'true':
         logger.info(f'Empty Compilation is enabled')
         logger.info(f'UATG will use RISCV-GCC to check if the generated '
                     f'assembly tests are syntatically correct')
-        run_make(work_dir=config_work_dir, jobs=jobs)
+        max_failures = config['uatg'].get('max_compile_failures', '0')
+        try:
+            max_failures = int(max_failures)
+            if max_failures < 0:
+                raise ValueError
+        except ValueError:
+            logger.warning('max_compile_failures should be a non-negative '
+                           f'integer, not {max_failures!r}. All the tests '
+                           'will be compiled')
+            max_failures = 0
+        run_make(work_dir=config_work_dir, jobs=jobs,
+                 max_failures=max_failures)
 
     if config['uatg']['gen_cvg'].lower() == 'true':
         alias_dict = load_yaml(config['uatg']['alias_file'])
@@ -332,7 +373,8 @@ def from_config(config_file, verbose):
         validate_tests(modules=module,
                        work_dir=config_work_dir,
                        config_dict=dut_dict,
-                       modules_dir=module_dir)
+                       modules_dir=module_dir,
+                       jobs=jobs)
 
     if config['uatg']['clean'].lower() == 'true':
         logger.debug('Invoking clean_dirs')
@@ -508,8 +550,13 @@ def setup(config_path, jobs, modules, module_dir, work_dir, linker_dir,
               help='Set verbose level for debugging',
               type=click.Choice(['info', 'error', 'debug'],
                                 case_sensitive=False))
+@click.option('--jobs',
+              '-j',
+              default=1,
+              help='Number of Jobs for UATG to spawn',
+              type=click.INT)
 @cli.command()
-def validate(configuration, module_dir, work_dir, modules, verbose):
+def validate(configuration, module_dir, work_dir, modules, verbose, jobs):
     """
         Parses the log generated upon test execution using regular expressions
         and provides a minimal coverage report.\n
@@ -519,6 +566,7 @@ def validate(configuration, module_dir, work_dir, modules, verbose):
                   -md, --module_dir\n
         Optional: -m, --modules (default - all)\n
                   -v, --verbose\n
+                  -j, --jobs\n
     """
     logger.level(verbose)
     info(__version__)
@@ -537,6 +585,7 @@ def validate(configuration, module_dir, work_dir, modules, verbose):
     validate_tests(modules=module,
                    work_dir=work_dir,
                    config_dict=dut_dict,
-                   modules_dir=module_dir)
+                   modules_dir=module_dir,
+                   jobs=jobs)
 
     uatg_exit()
@@ -1,50 +1,158 @@
 # See LICENSE.incore for license details
 
+from collections.abc import Mapping
 from datetime import datetime
 from getpass import getuser
 from glob import glob
-from multiprocessing import Pool, Manager
-from os import mkdir, makedirs, remove
+from hashlib import sha256
+from io import StringIO
+from multiprocessing import Pool
+from os import mkdir, makedirs, remove, replace, listdir, stat
 from os.path import join, dirname, abspath, exists, isdir, isfile
-from shutil import rmtree, copyfile
+from shutil import rmtree
+from pickle import dump as pickle_dump, load as pickle_load, \
+    UnpicklingError, HIGHEST_PROTOCOL
 from sys import exit
+from time import perf_counter
+from traceback import format_exc
 
-from ruamel.yaml import dump
+from ruamel.yaml import YAML, dump
 from yapsy.PluginManager import PluginManager, PluginInfo
 
-from uatg import __file__
+from uatg import __file__, __version__
+from uatg.instruction_generator import get_instruction_generator
 from uatg.log import logger
-from uatg.utils import create_plugins, generate_test_list, create_linker, \
+from uatg.log_scanner import find_log, decompressed_log
+from uatg.utils import create_plugins, create_linker, \
     create_model_test_h, join_yaml_reports, generate_sv_components, \
     list_of_modules, rvtest_data, dump_makefile, setup_pages, \
-    select_paging_modes, macros_parser
+    select_paging_modes, arch_test_macros, load_yaml, test_list_entry, \
+    write_if_changed, copy_if_changed, get_isa_profile
 
-# create a manager for shared resources
-process_manager = Manager()
+# file within the work_dir recording the time taken by each plugin, used to
+# schedule the expensive plugins first in the next run
+generation_costs_file = '.generation_costs.yaml'
+
+# file within the work_dir recording the fingerprint and the result of each
+# plugin, used to skip the unchanged plugins in incremental runs
+generation_manifest_file = '.generation_manifest.pickle'
+
+
+def canonical_repr(value):
+    """
+        :return: a representation of value which does not depend on the order
+                 of the keys of the mappings within it
+    """
+    if isinstance(value, Mapping):
+        return '{' + ', '.join(
+            sorted(f'{canonical_repr(k)}: {canonical_repr(v)}'
+                   for k, v in value.items())) + '}'
+    if isinstance(value, (list, tuple)):
+        return '[' + ', '.join(canonical_repr(v) for v in value) + ']'
+    if isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(canonical_repr(v) for v in value)) + '}'
+    return repr(value)
+
+
+def uatg_fingerprint():
+    """
+        :return: hash of the version of uatg and of the files the generated
+                 tests depend on - the sources of uatg, isem.yaml and the env
+                 headers
+    """
+    uarch_dir = dirname(__file__)
+    fingerprint = sha256(__version__.encode())
+    for path in sorted(glob(join(uarch_dir, '*.py')) +
+                       glob(join(uarch_dir, '*.yaml')) +
+                       glob(join(uarch_dir, 'env', '*'))):
+        if isfile(path):
+            with open(path, 'rb') as f:
+                fingerprint.update(f.read())
+    return fingerprint.hexdigest()
+
+
+def plugin_fingerprint(plugin_path, run_fingerprint):
+    """
+        :param plugin_path: path of the yapsy plugin, without the extension
+        :param run_fingerprint: fingerprint of the arguments of the run
+        :return: fingerprint of the plugin, which changes when the source of
+                 the plugin or the arguments of the run change
+    """
+    fingerprint = sha256(run_fingerprint.encode())
+    source = plugin_path + '.py'
+    if not isfile(source):
+        # plugins can also be packages
+        source = join(plugin_path, '__init__.py')
+    with open(source, 'rb') as f:
+        fingerprint.update(f.read())
+    return fingerprint.hexdigest()
+
+
+def generation_worker_init(isa):
+    """
+        Initializer of the processes generating the tests. Creates the
+        instruction generator for the DUT's ISA once per process, so that the
+        plugins of every module share it.
+    """
+    get_instruction_generator(isa)
 
 
 def asm_generation_process(args):
     """
         for every plugin, a process shall be spawned.
         The new process shall create an Assembly test file.
+
+        :return: result record of the plugin, a dict with the keys
+                 name - name of the plugin,
+                 module - module of the plugin,
+                 tests - list of (test_name, make command) tuples,
+                 compile_macros - compile macros of each test,
+                 self_checking - self checking flag of each test,
+                 count - number of tests generated, None if the plugin is not
+                 valid for the DUT,
+                 duration - time taken by the plugin, in seconds,
+                 path - path of the plugin,
+                 unchanged - number of test files which were already up to date
     """
-    # unpacking the args tuple
-    plugin, config_dict, isa, test_format_string, work_tests_dir, \
-    make_file, module, linker_dir, uarch_dir, work_dir, \
-    compile_macros_dict, self_checking_dict, module_test_count_dict, page_modes = args
+    start_time = perf_counter()
 
-    # actual generation process
-    check = plugin.plugin_object.execute(config_dict)
+    # unpacking the args tuple
+    (plugin, config_dict, isa, test_format_string, work_tests_dir, module,
+     linker_dir, uarch_dir, work_dir, page_modes, available_macros,
+     keep_unchanged, toolchain) = args
 
     name = (str(plugin.plugin_object).split(".", 1))
     t_name = ((name[1].split(" ", 1))[0])
 
+    # the results are collected locally and merged by the parent process
+    result = {
+        'name': t_name,
+        'module': module,
+        'tests': [],
+        'compile_macros': {},
+        'self_checking': {},
+        'count': None,
+        'duration': 0.0,
+        'path': plugin.path,
+        'unchanged': 0
+    }
+    compile_macros_dict = result['compile_macros']
+    self_checking_dict = result['self_checking']
+
+    # reseed the shared generator (and the random module) with the test name,
+    # so that the test does not depend on the plugins run before it
+    get_instruction_generator(isa, rng_seed=t_name)
+
+    # actual generation process
+    check = plugin.plugin_object.execute(config_dict)
+
     # data section for paging pages
     priv_asm_code = ['', '', '']
     priv_asm_data = ""
 
     if check:
         test_gen = plugin.plugin_object.generate_asm()
+        xlen = get_isa_profile(isa).xlen
 
         seq = '001'
         for ret_list_of_dicts in test_gen:
@@ -77,10 +185,7 @@ def asm_generation_process(args):
                 asm_sig = '\n'
 
             # create an entry in the compile_macros dict
-            if 'rv64' in isa.lower():
-                compile_macros_dict[test_name] = ['XLEN=64']
-            else:
-                compile_macros_dict[test_name] = ['XLEN=32']
+            compile_macros_dict[test_name] = [f'XLEN={xlen}']
             
             # if self_checking is included in returned dictionary, set the value accordingly
             # else, default it to False
@@ -89,11 +194,7 @@ def asm_generation_process(args):
             except KeyError:
                 self_checking_dict[test_name] = False
 
-            list_of_env_paths = [join(dirname(__file__), 'env/arch_test_unpriv.h'),
-                                 join(dirname(__file__), 'env/arch_test_priv.h')]
-            
             try:
-                available_macros = macros_parser(list_of_env_paths)
                 for i in ret_list_of_dicts['compile_macros']:
                     if i not in available_macros:
                         logger.error(f'{i}: Macro undefined in arch_test.h ')
@@ -243,20 +344,22 @@ def asm_generation_process(args):
             asm += test_format_string[7] + asm_sig + \
                    test_format_string[8]
 
-            mkdir(join(work_tests_dir, test_name))
-            with open(join(work_tests_dir, test_name, test_name + '.S'),
-                      'w') as f:
-                f.write(asm)
+            if keep_unchanged:
+                # the test directory of the previous run is kept, and the test
+                # is written only if it changed
+                makedirs(join(work_tests_dir, test_name), exist_ok=True)
+                test_path = join(work_tests_dir, test_name, test_name + '.S')
+                if not write_if_changed(test_path, asm):
+                    result['unchanged'] += 1
+            else:
+                mkdir(join(work_tests_dir, test_name))
+                with open(join(work_tests_dir, test_name, test_name + '.S'),
+                          'w') as f:
+                    f.write(asm)
             seq = '%03d' % (int(seq, 10) + 1)
             logger.debug(f'Generating test for {test_name}')
 
-            try:
-                make_file[module].append(test_name)
-
-            except KeyError:
-                make_file[module] = process_manager.list([test_name])
-
-            make_file['tests'].append(
+            result['tests'].append(
                 (test_name,
                  dump_makefile(isa=isa,
                                link_path=linker_dir,
@@ -265,9 +368,10 @@ def asm_generation_process(args):
                                test_name=test_name,
                                compile_macros=compile_macros_dict[test_name],
                                env_path=join(uarch_dir, 'env'),
-                               work_dir=work_dir)))
+                               work_dir=work_dir,
+                               toolchain=toolchain)))
 
-        module_test_count_dict[f'{t_name}'] = (int(seq)) - 1
+        result['count'] = (int(seq)) - 1
 
     else:
         logger.warning(f'{t_name} is not valid for the current core '
@@ -275,19 +379,22 @@ def asm_generation_process(args):
 
     logger.debug(f'Finished Generating Assembly Files for {t_name}')
 
-    return True
+    result['duration'] = perf_counter() - start_time
+    return result
 
 
 def sv_generation_process(args):
     """
         for every plugin, a process shall be spawned.
         The process shall generate System Verilog coverpoints
+
+        :return: the covergroups of the plugin, None if none were generated
     """
     # unpack the args
     plugin = args[0]
     config_dict = args[1]
     alias_dict = args[3]
-    cover_list = args[4]
+    _sv = None
 
     _check = plugin.plugin_object.execute(config_dict)
     _name = (str(plugin.plugin_object).split(".", 1))
@@ -295,7 +402,6 @@ def sv_generation_process(args):
     if _check:
         try:
             _sv = plugin.plugin_object.generate_covergroups(alias_dict)
-            cover_list.append(_sv)
             logger.debug(f'Generating coverpoints SV file for {_test_name}')
 
         except AttributeError:
@@ -307,11 +413,208 @@ def sv_generation_process(args):
         logger.critical(f'Skipped {_test_name} as this test is not '
                         f'created for the current DUT configuration ')
 
-    return True
+    return _sv
+
+
+class generation_progress:
+    """
+        Reports the progress of the test generation, with an estimate of the
+        time remaining. Every finished plugin is logged at debug level, and a
+        summary is logged at info level every 10% of the plugins or every
+        interval seconds, whichever comes first.
+    """
+
+    def __init__(self, total, interval=10):
+        """
+            :param total: number of plugins to be run
+            :param interval: maximum time between two summaries, in seconds
+        """
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.tests = 0
+        self.start_time = perf_counter()
+        self.reported_time = self.start_time
+        self.reported_step = 0
+
+    def update(self, result):
+        """
+            :param result: result record of a finished plugin
+        """
+        self.done += 1
+        self.tests += len(result['tests'])
+        now = perf_counter()
+        elapsed = now - self.start_time
+        eta = elapsed * (self.total - self.done) / self.done
+        logger.debug(f'[{self.done}/{self.total}] {result["name"]} finished '
+                     f'in {result["duration"]:.2f}s')
+
+        step = 10 * self.done // self.total
+        if self.done == self.total or step > self.reported_step or \
+                now - self.reported_time >= self.interval:
+            self.reported_step = step
+            self.reported_time = now
+            logger.info(f'Generated {self.done}/{self.total} plugins '
+                        f'({100 * self.done // self.total}%), {self.tests} '
+                        f'tests, elapsed {elapsed:.1f}s, ETA {eta:.1f}s')
+
+
+class generation_writer:
+    """
+        Writes the makefile, and the test list when enabled, while the tests
+        are being generated. The rules and test list entries of each plugin
+        are appended to the files as soon as the plugin finishes. Once all the
+        plugins are done, close rewrites both files in the order of the
+        plugins and adds the module targets to the makefile.
+
+        The results are streamed into makefile.partial and
+        test_list.yaml.partial, so that the makefile and the test list of the
+        previous run are only replaced by close. Used as a context manager,
+        the writer is closed when the generation succeeds, and aborted,
+        removing the partial files, when it fails. With keep_unchanged, close
+        writes the final files only if they changed.
+    """
+
+    def __init__(self, work_dir, modules, module_dirs, uarch_dir, isa,
+                 test_list, keep_unchanged=False):
+        """
+            :param work_dir: the work directory
+            :param modules: list of the modules being generated
+            :param module_dirs: (module_dir, work_tests_dir) of each module
+            :param uarch_dir: directory of uatg
+            :param isa: ISA string of the DUT
+            :param test_list: write the test_list.yaml file, if True
+            :param keep_unchanged: keep the files which did not change
+        """
+        self.modules = modules
+        self.module_dirs = module_dirs
+        self.uarch_dir = uarch_dir
+        self.isa = isa
+        self.keep_unchanged = keep_unchanged
+        self.makefile_path = join(work_dir, 'makefile')
+        self.test_list_path = join(work_dir, 'test_list.yaml') \
+            if test_list else None
+        # rendered makefile rules and test list entries of each plugin
+        self.results = {}
+        self.make_rules = {}
+        self.test_entries = {}
+
+        # the all target is written first, so that it stays the default goal
+        self.makefile = open(self.makefile_path + '.partial', 'w')
+        self.makefile.write(self.all_target())
+        self.makefile.flush()
+        self.test_list = open(self.test_list_path + '.partial', 'w') \
+            if self.test_list_path else None
+        # the safe dumper uses the C emitter, with the layout of ruamel's dump
+        self.yaml = YAML(typ='safe')
+        self.yaml.default_flow_style = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def all_target(self):
+        """
+            :return: the all target of the makefile
+        """
+        return 'all' + ': ' + ' \\\n\t'.join(self.modules) + '\n'
+
+    def add(self, index, result):
+        """
+            :param index: index of the plugin, the files are ordered by it
+            :param result: result record of the plugin
+        """
+        self.results[index] = result
+        # the rendered text is kept in the result, so that it can be reused
+        # when the result is reused by an incremental run
+        if result.get('make_rules') is None:
+            result['make_rules'] = ''.join(
+                f'{test_name}: \n\t{command}\n'
+                for test_name, command in result['tests'])
+        self.make_rules[index] = result['make_rules']
+        self.makefile.write(self.make_rules[index])
+        self.makefile.flush()
+
+        if self.test_list and result['tests']:
+            if result.get('test_list_entries') is None:
+                module_dir, work_tests_dir = \
+                    self.module_dirs[result['module']]
+                entries = StringIO()
+                self.yaml.dump({
+                    test_name: test_list_entry(
+                        test_name, work_tests_dir, self.uarch_dir, module_dir,
+                        self.isa, result['compile_macros'][test_name],
+                        result['self_checking'][test_name])
+                    for test_name, _ in result['tests']
+                }, entries)
+                result['test_list_entries'] = entries.getvalue()
+            self.test_entries[index] = result['test_list_entries']
+            self.test_list.write(self.test_entries[index])
+            self.test_list.flush()
+
+    def close(self):
+        """
+            rewrites the makefile and the test list in the order of the plugins
+        """
+        self.makefile.close()
+        if self.test_list:
+            self.test_list.close()
+
+        order = sorted(self.results)
+        makefile = [self.all_target()]
+        for module in self.modules:
+            tests = [
+                test_name for i in order
+                if self.results[i]['module'] == module
+                for test_name, _ in self.results[i]['tests']
+            ]
+            if not tests:
+                logger.critical(f"\"{module}\" is a part of the module list. "
+                                f"\nBut, No tests were generated by UATG for "
+                                f"module \"{module}\"")
+                logger.critical("If this was uninteded, "
+                                "Please enable the required test(s) in the "
+                                "index.yaml file")
+            makefile.append(module + ': ' + ' \\\n\t'.join(tests) + '\n')
+        makefile.append('\n')
+        makefile.extend(self.make_rules[i] for i in order)
+
+        files = [(self.makefile_path, ''.join(makefile))]
+        if self.test_list_path:
+            files.append((self.test_list_path,
+                          ''.join(self.test_entries[i] for i in order
+                                  if i in self.test_entries)))
+
+        for path, text in files:
+            remove(path + '.partial')
+            if self.keep_unchanged:
+                write_if_changed(path, text)
+            else:
+                with open(path + '.tmp', 'w') as f:
+                    f.write(text)
+                replace(path + '.tmp', path)
+
+    def abort(self):
+        """
+            closes the partial files and removes them, leaving the makefile
+            and the test list of the previous run in place
+        """
+        self.makefile.close()
+        if self.test_list:
+            self.test_list.close()
+        for path in (self.makefile_path, self.test_list_path):
+            if path and exists(path + '.partial'):
+                remove(path + '.partial')
 
 
 def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
-                   modules_dir, index_path, paging_modes, jobs):
+                   modules_dir, index_path, paging_modes, jobs,
+                   incremental=False, deterministic=False, toolchain='gcc'):
     """
     The function generates ASM files for all the test classes specified within
     the module_dir. The user can also select the modules for which he would want
@@ -323,6 +626,18 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
     generator also creates a linker file as well as the header files for running
     the ASM files on the DUT, when required. Finally, the test generator only
     generates the tests whose targets are implemented in the DUT.
+
+    In the incremental mode, the tests of the plugins whose source and
+    arguments did not change since the previous run in the work directory are
+    kept, and only the other plugins are run again.
+
+    In the deterministic mode, the header of the tests does not contain the
+    user and the time of the generation, so the same inputs generate the same
+    files. The files are then written only if they changed, so that their
+    modification times stay valid for make and the compile caches.
+
+    The compile commands of the makefile are built by the toolchain, see
+    uatg.toolchain.get_toolchain.
     """
     uarch_dir = dirname(__file__)
 
@@ -333,6 +648,20 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
 
     makedirs(work_dir, exist_ok=True)
 
+    # fingerprint and result of each plugin in the previous runs. The
+    # manifest is removed until this run completes, so that an interrupted
+    # run is not reused.
+    manifest_file = join(work_dir, generation_manifest_file)
+    manifest = {}
+    if isfile(manifest_file):
+        try:
+            with open(manifest_file, 'rb') as f:
+                manifest = pickle_load(f)
+        except (OSError, EOFError, UnpicklingError, ValueError):
+            logger.warning('Could not read the generation manifest, '
+                           'regenerating all the tests')
+        remove(manifest_file)
+
     logger.info(f'uatg dir is {uarch_dir}')
     logger.info(f'work_dir is {work_dir}')
     isa = 'RV64I'
@@ -347,41 +676,29 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
 
     logger.info('The modules are {0}'.format((', '.join(modules))))
 
-    # creating a shared dictionary which can be accessed by all processes
-    # stores the makefile commands
-
-    make_file = process_manager.dict({
-        'all': modules,
-        'tests': (process_manager.list())
-    })
-
-    # creating a shared dict to store test_list info
-    # test_list_dict = process_manager.dict()
-    test_list_dict = {}
+    logger.info('****** Generating Tests ******')
 
-    # creating a shared compile_macros dict
-    # this dictionary will contain all the compile macros for each test
-    compile_macros_dict = process_manager.dict()
+    total_test_count_dict = {}
 
-    # Create a shared self_checking flag dict
-    # this dictionary will store the status of self_check flag for each test
-    self_checking_dict = process_manager.dict()
+    # arguments of the plugins of all the modules, generated by one pool
+    arg_list = []
 
-    if exists(join(work_dir, 'makefile')):
-        remove(join(work_dir, 'makefile'))
+    # compile macros the tests can enable, parsed once for all the tests
+    available_macros = arch_test_macros()
+    module_dirs = {}
 
-    logger.info('****** Generating Tests ******')
-
-    total_test_count_dict = {}
+    # results of the plugins, reused from the manifest or generated below
+    results = []
+    fingerprints = []
+    run_fingerprint = canonical_repr((config_dict, isa, paging_modes,
+                                      linker_dir, work_dir, deterministic,
+                                      toolchain, uatg_fingerprint()))
 
     for module in modules:
 
-        # creating a shared list to display the number of tests generated
-        # per module
-        module_test_count_dict = process_manager.dict()
-
         module_dir = join(modules_dir, module)
         work_tests_dir = join(work_dir, module)
+        module_dirs[module] = (module_dir, work_tests_dir)
 
         # initializing make commands for individual modules
 
@@ -391,11 +708,15 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
                        index_yaml=index_path,
                        module=module)
         logger.info(f'Created plugins for {module}')
-        username = getuser()
-        time = ((str(datetime.now())).split("."))[0]
-        license_str = f'# Licensing information can be found at ' \
-                      f'LICENSE.incore\n# Test generated by user - {username}' \
-                      f' at {time}\n\n'
+        if deterministic:
+            license_str = '# Licensing information can be found at ' \
+                          'LICENSE.incore\n# Test generated by UATG\n\n'
+        else:
+            username = getuser()
+            time = ((str(datetime.now())).split("."))[0]
+            license_str = f'# Licensing information can be found at ' \
+                          f'LICENSE.incore\n# Test generated by user - ' \
+                          f'{username} at {time}\n\n'
         includes = f'#include \"model_test.h\" \n#include \"arch_test_unpriv.h\"\n'
         test_entry = f'RVTEST_ISA(\"{isa}\")\n\n.section .text.init\n.globl' \
                      f' rvtest_entry_point\nrvtest_entry_point:'
@@ -429,14 +750,48 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
                 logger.error(str(i[0]) + ' : ' + str(i[1]))
             exit('Python Errors at one/multiple files')
 
-        # check if prior test files are present and remove them. create new dir.
-        if (isdir(work_tests_dir)) and \
-                exists(work_tests_dir):
-            rmtree(work_tests_dir)
-
-        mkdir(work_tests_dir)
+        # results of the plugins which did not change since the previous run
+        plugins = manager.getAllPlugins()
+        if deterministic:
+            plugins = sorted(plugins, key=lambda plugin: plugin.path)
+        module_results = []
+        for plugin in plugins:
+            fingerprint = plugin_fingerprint(plugin.path,
+                                             f'{run_fingerprint} {module}')
+            entry = manifest.get(plugin.path)
+            if incremental and entry and \
+                    entry['fingerprint'] == fingerprint and \
+                    all(isfile(join(work_tests_dir, test_name,
+                                    test_name + '.S'))
+                        for test_name, _ in entry['result']['tests']):
+                module_results.append(entry['result'])
+            else:
+                module_results.append(None)
+            fingerprints.append(fingerprint)
+        results.extend(module_results)
+
+        # check if prior test files are present and remove them. create new
+        # dir. The tests of the reused results are kept. In the
+        # deterministic mode, all the tests are kept until the generation
+        # completes.
+        kept_tests = {
+            test_name for result in module_results if result is not None
+            for test_name, _ in result['tests']
+        }
+        if deterministic:
+            makedirs(work_tests_dir, exist_ok=True)
+        elif any(result is not None for result in module_results):
+            for test_name in listdir(work_tests_dir):
+                if test_name not in kept_tests:
+                    rmtree(join(work_tests_dir, test_name))
+            logger.info(f'Reusing {len(kept_tests)} tests of unchanged '
+                        f'plugins for {module}')
+        else:
+            if (isdir(work_tests_dir)) and \
+                    exists(work_tests_dir):
+                rmtree(work_tests_dir)
 
-        logger.info(f'Generating assembly tests for {module}')
+            mkdir(work_tests_dir)
 
         # test format strings
         test_format_string = [
@@ -447,20 +802,93 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
 
         # Loop around and find the plugins and writes the contents from the
         # plugins into an asm file
-        arg_list = []
-        for plugin in manager.getAllPlugins():
+        for plugin in plugins:
             arg_list.append(
                 (plugin, config_dict, isa, test_format_string,
-                 work_tests_dir, make_file, module, linker_dir, uarch_dir,
-                 work_dir, compile_macros_dict, self_checking_dict, module_test_count_dict,
-                 paging_modes))
+                 work_tests_dir, module, linker_dir, uarch_dir, work_dir,
+                 paging_modes, available_macros, deterministic, toolchain))
+
+    # the most expensive plugins of the previous run are started first, so
+    # that the run does not end waiting on a single long plugin. Plugins
+    # without a recorded cost are assumed to be expensive.
+    costs_file = join(work_dir, generation_costs_file)
+    costs = {}
+    if isfile(costs_file):
+        costs = load_yaml(costs_file, typ='safe') or {}
+    order = sorted((i for i in range(len(arg_list)) if results[i] is None),
+                   key=lambda i: -costs.get(arg_list[i][0].path, float('inf')))
+
+    # one process pool for the plugins of all the modules. The pool is
+    # created after all the plugins are loaded, so that the forked processes
+    # can unpickle them. The results are handled as soon as each plugin
+    # finishes, in the order in which they finish.
+    index = {arg_list[i][0].path: i for i in order}
+    with generation_writer(work_dir, modules, module_dirs, uarch_dir, isa,
+                           test_list, keep_unchanged=deterministic) as writer:
+        for i, result in enumerate(results):
+            if result is not None:
+                writer.add(i, result)
+        if incremental:
+            logger.info(f'{len(arg_list) - len(order)} of {len(arg_list)} '
+                        f'plugins are unchanged since the previous run')
+
+        if order:
+            logger.info(f'Generating assembly tests for {", ".join(modules)}')
+            logger.info(f"Spawning {jobs} processes")
+            progress = generation_progress(len(order))
+            with Pool(min(jobs, len(order)),
+                      initializer=generation_worker_init,
+                      initargs=(isa,)) as process_pool:
+                for result in process_pool.imap_unordered(
+                        asm_generation_process,
+                        [arg_list[i] for i in order]):
+                    i = index[result['path']]
+                    results[i] = result
+                    costs[result['path']] = round(result['duration'], 4)
+                    progress.update(result)
+                    writer.add(i, result)
+                process_pool.close()
+                process_pool.join()
 
-        # multi processing process pool
-        logger.info(f"Spawning {jobs} processes")
-        process_pool = Pool(jobs)
-        # creating a map of processes
-        process_pool.map(asm_generation_process, arg_list)
-        process_pool.close()
+        logger.info('Dumping makefile')
+
+    if deterministic:
+        # removing the tests which were not generated by this run
+        tests = {test_name for result in results
+                 for test_name, _ in result['tests']}
+        for module in modules:
+            work_tests_dir = module_dirs[module][1]
+            for test_name in listdir(work_tests_dir):
+                if test_name not in tests:
+                    rmtree(join(work_tests_dir, test_name))
+        unchanged = sum(result['unchanged'] for result in results
+                        if result['path'] in index)
+        logger.info(f'{unchanged} of the generated tests were unchanged '
+                    'and were not rewritten')
+
+    with open(costs_file, 'w') as outfile:
+        dump(costs, outfile)
+
+    # the manifest keeps the plugins of the other modules of the work_dir
+    manifest = {
+        path: entry for path, entry in manifest.items()
+        if entry['result']['module'] not in modules
+    }
+    for (plugin, *_), fingerprint, result in zip(arg_list, fingerprints,
+                                                 results):
+        manifest[plugin.path] = {'fingerprint': fingerprint, 'result': result}
+    with open(manifest_file + '.tmp', 'wb') as f:
+        pickle_dump(manifest, f, HIGHEST_PROTOCOL)
+    replace(manifest_file + '.tmp', manifest_file)
+
+    for module in modules:
+
+        # number of tests generated per plugin of the module
+        module_test_count_dict = {}
+
+        for result in results:
+            if result['module'] == module and result['count'] is not None:
+                module_test_count_dict[result['name']] = result['count']
 
         logger.info('\n****** Count of assembly tests generated (per plugin) '
                     f'for {module} ******')
@@ -478,40 +906,12 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
 
         logger.info(f'Finished Generating Assembly Tests for {module}')
 
-        if test_list:
-            logger.info(f'Creating test_list for the {module}')
-            test_list_dict.update(
-                generate_test_list(work_tests_dir, uarch_dir, module_dir, isa,
-                                   test_list_dict, compile_macros_dict, self_checking_dict))
-
     logger.info('Assembly generation for all modules completed')
 
-    with open(join(work_dir, 'makefile'), 'w') as f:
-        logger.info('Dumping makefile')
-        f.write('all' + ': ')
-        f.write(' \\\n\t'.join(make_file['all']))
-        f.write('\n')
-        for i in modules:
-            f.write(i + ': ')
-            try:
-                f.write(' \\\n\t'.join(make_file[i]))
-            except KeyError:
-                logger.critical(f"\"{i}\" is a part of the module list. \n"
-                                f"But, No tests were generated by UATG for "
-                                f"module \"{i}\"")
-                logger.critical("If this was uninteded, "
-                                "Please enable the required test(s) in the "
-                                "index.yaml file")
-            f.write('\n')
-        f.write('\n')
-        for i in make_file['tests']:
-            f.write(i[0] + ': \n\t')
-            f.write(i[1] + '\n')
-
     if linker_dir and isfile(join(linker_dir, 'link.ld')):
         logger.info('Using user specified linker: ' +
                     join(linker_dir, 'link.ld'))
-        copyfile(join(linker_dir, 'link.ld'), work_dir + '/link.ld')
+        copy_if_changed(join(linker_dir, 'link.ld'), work_dir + '/link.ld')
     else:
         create_linker(target_dir=work_dir)
         logger.info(f'Creating a linker file at {work_dir}')
@@ -519,15 +919,14 @@ def generate_tests(work_dir, linker_dir, modules, config_dict, test_list,
     if linker_dir and isfile(join(linker_dir, 'model_test.h')):
         logger.info('Using user specified model_test file: ' +
                     join(linker_dir, 'model_test.h'))
-        copyfile(join(linker_dir, 'model_test.h'), work_dir + '/model_test.h')
+        copy_if_changed(join(linker_dir, 'model_test.h'),
+                        work_dir + '/model_test.h')
     else:
         create_model_test_h(target_dir=work_dir)
         logger.info(f'Creating Model_test.h file at {work_dir}')
     if test_list:
         logger.info('Test List was generated by UATG. You can find it in '
                     f'the work dir{work_dir}')
-        with open(join(work_dir, 'test_list.yaml'), 'w') as outfile:
-            dump(test_list_dict, outfile)
     else:
         logger.info('Test list will not be generated by uatg')
 
@@ -581,8 +980,10 @@ def generate_sv(work_dir, config_dict, modules, modules_dir, alias_dict, jobs):
         logger.debug("Removing Existing coverpoints SV file")
         remove(sv_file)
 
-    # create a shared list for storing the coverpoints
-    cover_list = process_manager.list()
+    # list for storing the coverpoints
+    cover_list = []
+
+    arg_list = []
 
     for module in modules:
         logger.debug(f'Generating CoverPoints for {module}')
@@ -605,19 +1006,21 @@ def generate_sv(work_dir, config_dict, modules, modules_dir, alias_dict, jobs):
 
         # Loop around and find the plugins and writes the contents from the
         # plugins into an asm file
-        arg_list = []
         for plugin in manager.getAllPlugins():
             arg_list.append(
-                (plugin, core_yaml, isa_yaml, alias_dict, cover_list))
+                (plugin, core_yaml, isa_yaml, alias_dict))
 
-        # multi processing process pool
-        logger.debug(f"Spawning {jobs} processes")
-        process_pool = Pool(jobs)
+    # one process pool for the plugins of all the modules
+    logger.debug(f"Spawning {jobs} processes")
+    with Pool(max(1, min(jobs, len(arg_list)))) as process_pool:
         # creating a map of processes
-        process_pool.map(sv_generation_process, arg_list)
+        cover_list.extend(
+            _sv for _sv in process_pool.map(sv_generation_process, arg_list)
+            if _sv is not None)
         process_pool.close()
+        process_pool.join()
 
-        logger.debug(f'Finished Generating Coverpoints for {module}')
+    logger.debug('Finished Generating Coverpoints')
 
     with open(sv_file, 'w') as f:
         logger.info('Dumping the covergroups into SV file')
@@ -626,7 +1029,67 @@ def generate_sv(work_dir, config_dict, modules, modules_dir, alias_dict, jobs):
     logger.info('****** Finished Generating Covergroups ******')
 
 
-def validate_tests(modules, config_dict, work_dir, modules_dir):
+def log_validation_process(args):
+    """
+        checks the log of a test with the check_log method of its plugin.
+
+        :return: result record of the test, a dict with the keys
+                 name - name of the test,
+                 module - module of the test,
+                 status - pass, fail, missing (no log), error (check_log
+                 raised an exception) or skipped (the plugin is not valid for
+                 the DUT),
+                 duration - time taken to check the log, in seconds,
+                 log_size - size of the log in bytes, None if it is missing.
+                 The log is compressed if it is found as log.gz, log.xz or
+                 log.zst instead of log,
+                 error - traceback of the exception raised by check_log,
+                 None if it raised none
+
+        check_log gets the path of a decompressed copy of a compressed log,
+        unless the plugin sets compressed_logs to True, reading the logs with
+        the functions of uatg.log_scanner.
+    """
+    plugin, core_yaml, isa_yaml, work_tests_dir, reports_dir, module = args
+
+    _name = (str(plugin.plugin_object).split(".", 1))
+    _test_name = ((_name[1].split(" ", 1))[0])
+    _log_file_path = join(work_tests_dir, _test_name, 'log')
+    result = {
+        'name': _test_name,
+        'module': module,
+        'status': 'skipped',
+        'duration': 0.0,
+        'log_size': None,
+        'error': None
+    }
+
+    start_time = perf_counter()
+    if plugin.plugin_object.execute(core_yaml, isa_yaml):
+        try:
+            _log_file_path = find_log(_log_file_path)
+        except FileNotFoundError:
+            result['status'] = 'missing'
+        else:
+            result['log_size'] = stat(_log_file_path).st_size
+            # an exception in check_log fails the test, not the validation
+            try:
+                if getattr(plugin.plugin_object, 'compressed_logs', False):
+                    _result = plugin.plugin_object.check_log(
+                        _log_file_path, reports_dir)
+                else:
+                    with decompressed_log(_log_file_path) as _plain_path:
+                        _result = plugin.plugin_object.check_log(
+                            _plain_path, reports_dir)
+                result['status'] = 'pass' if _result else 'fail'
+            except Exception:
+                result['status'] = 'error'
+                result['error'] = format_exc()
+    result['duration'] = round(perf_counter() - start_time, 4)
+    return result
+
+
+def validate_tests(modules, config_dict, work_dir, modules_dir, jobs=1):
     """
        Parses the log returned from the DUT for finding if the tests
        were successful.
@@ -634,6 +1097,16 @@ def validate_tests(modules, config_dict, work_dir, modules_dir):
        expecting to be seen in the log generated by the DUT.
        In addition to just the checking, it can also be set up to provide a
        report for every test for which the user tries to validate.
+
+       The logs of all the modules are checked by a pool of jobs processes.
+       The log of a test may be compressed, as log.gz, log.xz or log.zst.
+       check_log then gets a decompressed copy of the log, or the path of the
+       compressed log if its plugin sets compressed_logs to True. A test whose
+       check_log raises an exception is reported with the error status.
+       The result of every test is written to reports/validation_summary.yaml
+       in the work_dir.
+
+       :return: the summary of the validation
     """
 
     uarch_dir = dirname(__file__)
@@ -650,20 +1123,18 @@ def validate_tests(modules, config_dict, work_dir, modules_dir):
     else:
         work_dir = abspath((join(uarch_dir, '../work/')))
 
-    _pass_ct = 0
-    _fail_ct = 0
-    _tot_ct = 1
+    # YAML with ISA paramters
+    core_yaml = config_dict['core_config']
+    # isa yaml with ISA paramters
+    isa_yaml = config_dict['isa_dict']
 
+    arg_list = []
     for module in modules:
         module_dir = join(modules_dir, module)
         # module_tests_dir = join(module_dir, 'tests')
         work_tests_dir = join(work_dir, module)
         reports_dir = join(work_dir, 'reports', module)
         makedirs(reports_dir, exist_ok=True)
-        # YAML with ISA paramters
-        core_yaml = config_dict['core_config']
-        # isa yaml with ISA paramters
-        isa_yaml = config_dict['isa_dict']
         manager = PluginManager()
         manager.setPluginPlaces([module_dir])
         manager.locatePlugins()
@@ -675,50 +1146,86 @@ def validate_tests(modules, config_dict, work_dir, modules_dir):
                 logger.error(str(i[0]) + ' : ' + str(i[1]))
             exit('Python Errors at one/multiple files')
 
-        logger.debug(f'Minimal Log Checking for {module}')
-
         for plugin in manager.getAllPlugins():
-            _name = (str(plugin.plugin_object).split(".", 1))
-            _test_name = ((_name[1].split(" ", 1))[0])
-            _check = plugin.plugin_object.execute(core_yaml, isa_yaml)
-            _log_file_path = join(work_tests_dir, _test_name, 'log')
-            if _check:
-                try:
-                    _result = plugin.plugin_object.check_log(
-                        _log_file_path, reports_dir)
-                    if _result:
-                        logger.info(f'{_tot_ct}. Minimal test: {_test_name} '
-                                    f'has passed.')
-                        _pass_ct += 1
-                        _tot_ct += 1
-                    else:
-                        logger.critical(f"{_tot_ct}. Minimal test: "
-                                        f"{_test_name} has failed.")
-                        _fail_ct += 1
-                        _tot_ct += 1
-                except FileNotFoundError:
+            arg_list.append((plugin, core_yaml, isa_yaml, work_tests_dir,
+                             reports_dir, module))
+
+    # one process pool for the logs of all the modules, created after all the
+    # plugins are loaded so that the forked processes can unpickle them. The
+    # results are reported in the order of the plugins.
+    results = []
+    _tot_ct = 0
+    start_time = perf_counter()
+    if arg_list:
+        logger.debug(f'Minimal Log Checking for {", ".join(modules)} with '
+                     f'{jobs} processes')
+        with Pool(max(1, min(jobs, len(arg_list)))) as process_pool:
+            for result in process_pool.imap(log_validation_process, arg_list):
+                results.append(result)
+                _test_name = result['name']
+                if result['status'] in ('pass', 'fail', 'error'):
+                    _tot_ct += 1
+                if result['status'] == 'pass':
+                    logger.info(f'{_tot_ct}. Minimal test: {_test_name} '
+                                f'has passed.')
+                elif result['status'] == 'fail':
+                    logger.critical(f"{_tot_ct}. Minimal test: "
+                                    f"{_test_name} has failed.")
+                elif result['status'] == 'error':
+                    logger.critical(f"{_tot_ct}. Minimal test: "
+                                    f"{_test_name} raised an error while "
+                                    f"checking its log\n{result['error']}")
+                elif result['status'] == 'missing':
                     logger.error(f'Log for {_test_name} not found. Run the '
                                  f'test on DUT and generate log or check '
                                  f'the path.')
-            else:
-                logger.warn(f'No asm generated for {_test_name}. Skipping')
-        logger.debug(f'Minimal log Checking for {module} complete')
+                else:
+                    logger.warning(f'No asm generated for {_test_name}. '
+                                   f'Skipping')
+            process_pool.close()
+            process_pool.join()
+        logger.debug(f'Minimal log Checking for {", ".join(modules)} complete')
+
+    summary = {
+        status: sum(result['status'] == status for result in results)
+        for status in ('pass', 'fail', 'error', 'missing', 'skipped')
+    }
+    # the percentages are of the tests whose logs were checked
+    summary['total'] = summary['pass'] + summary['fail'] + summary['error']
+    summary['duration'] = round(perf_counter() - start_time, 4)
+    summary['log_duration'] = round(
+        sum(result['duration'] for result in results), 4)
+    summary['tests'] = results
 
     logger.info("Minimal Verification Results")
     logger.info("=" * 28)
-    logger.info(f"Total Tests : {_tot_ct - 1}")
-
-    if _tot_ct - 1:
-        logger.info(f"Tests Passed : {_pass_ct} - "
-                    f"[{_pass_ct // (_tot_ct - 1)} %]")
-        logger.warn(f"Tests Failed : {_fail_ct} - "
-                    f"[{100 * _fail_ct // (_tot_ct - 1)} %]")
+    logger.info(f"Total Tests : {summary['total']}")
+
+    if summary['total']:
+        logger.info(f"Tests Passed : {summary['pass']} - "
+                    f"[{100 * summary['pass'] / summary['total']:.2f} %]")
+        logger.warning(f"Tests Failed : {summary['fail']} - "
+                       f"[{100 * summary['fail'] / summary['total']:.2f} %]")
+        if summary['error']:
+            logger.warning(
+                f"Tests Errored : {summary['error']} - "
+                f"[{100 * summary['error'] / summary['total']:.2f} %]")
     else:
-        logger.warn("No tests were created")
+        logger.warning("No tests were created")
+    if summary['missing']:
+        logger.warning(f"Logs Missing : {summary['missing']}")
+    logger.info(f"Checked the logs in {summary['duration']}s "
+                f"({summary['log_duration']}s of log checking)")
+
+    makedirs(join(work_dir, 'reports'), exist_ok=True)
+    with open(join(work_dir, 'reports', 'validation_summary.yaml'),
+              'w') as outfile:
+        dump(summary, outfile)
 
     logger.info('****** Finished Validating Test results ******')
     join_yaml_reports(work_dir)
     logger.info('Joined Yaml reports')
+    return summary
 
 
 def clean_dirs(work_dir, modules_dir):
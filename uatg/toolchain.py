@@ -0,0 +1,382 @@
+# See LICENSE.incore for license details
+"""
+Toolchains used to compile the generated tests.
+
+The compile command of every test is built by a toolchain. gcc_toolchain
+builds the commands of the RISC-V GNU toolchain. stub_toolchain builds
+commands which run this module instead, which checks the tests structurally
+(includes, labels, mnemonics and macros) without a cross compiler:
+
+    python -m uatg.toolchain -T link.ld test.S -I env -I work_dir -D MACRO
+"""
+import re
+from functools import lru_cache
+from os.path import join, dirname, isfile
+from shlex import quote, split
+from sys import argv, executable, exit, stderr
+
+# mnemonics accepted in addition to the instructions of isem.yaml. The
+# privileged and Zicsr instructions, and the pseudo instructions of the
+# assembler
+extra_mnemonics = frozenset((
+    'ecall', 'ebreak', 'mret', 'sret', 'uret', 'dret', 'wfi', 'sfence.vma',
+    'fence.tso', 'pause', 'csrrw', 'csrrs', 'csrrc', 'csrrwi', 'csrrsi',
+    'csrrci', 'csrr', 'csrw', 'csrs', 'csrc', 'csrwi', 'csrsi', 'csrci',
+    'frcsr', 'fscsr', 'frrm', 'fsrm', 'fsrmi', 'frflags', 'fsflags',
+    'fsflagsi', 'rdcycle', 'rdcycleh', 'rdtime', 'rdtimeh', 'rdinstret',
+    'rdinstreth', 'nop', 'li', 'la', 'lla', 'lga', 'mv', 'not', 'neg', 'negw',
+    'sext.w', 'zext.b', 'zext.h', 'zext.w', 'seqz', 'snez', 'sltz', 'sgtz',
+    'sgt', 'sgtu', 'beqz', 'bnez', 'blez', 'bgez', 'bltz', 'bgtz', 'bgt',
+    'ble', 'bgtu', 'bleu', 'j', 'jr', 'ret', 'call', 'tail', 'fmv.s', 'fabs.s',
+    'fneg.s', 'fmv.d', 'fabs.d', 'fneg.d', 'fmv.x.s', 'fmv.s.x', 'flt.s',
+    'fgt.s', 'fge.s', 'fgt.d', 'fge.d', 'c.unimp', 'unimp', 'rev8', 'orc.b',
+    'zip', 'unzip', 'brev8'))
+
+# mnemonics whose last operand may be a label
+label_mnemonics = frozenset((
+    'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu', 'beqz', 'bnez', 'blez', 'bgez',
+    'bltz', 'bgtz', 'bgt', 'ble', 'bgtu', 'bleu', 'j', 'jal', 'call', 'tail',
+    'la', 'lla', 'lga', 'c.j', 'c.jal', 'c.beqz', 'c.bnez'))
+
+# ordering suffixes of the atomic instructions
+atomic_suffixes = ('.aqrl', '.aq', '.rl')
+
+registers = frozenset(
+    [f'x{i}' for i in range(32)] + [f'f{i}' for i in range(32)] +
+    [f't{i}' for i in range(7)] + [f's{i}' for i in range(12)] +
+    [f'a{i}' for i in range(8)] + [f'ft{i}' for i in range(12)] +
+    [f'fs{i}' for i in range(12)] + [f'fa{i}' for i in range(8)] +
+    ['zero', 'ra', 'sp', 'gp', 'tp', 'fp'])
+
+symbol = r'[A-Za-z_.$][\w.$]*'
+label_pattern = re.compile(rf'\s*({symbol}|\d+):(?!:)')
+symbol_pattern = re.compile(symbol)
+local_ref_pattern = re.compile(r'(\d+)([fb])$')
+define_pattern = re.compile(r'#\s*define\s+(\w+)')
+macro_pattern = re.compile(r'\s*\.macro\s+(\w+)')
+include_pattern = re.compile(r'#\s*include\s*["<]([^">]+)[">]')
+block_comment_pattern = re.compile(r'/\*.*?\*/', re.S)
+line_comment_pattern = re.compile(r'//.*|#.*')
+
+
+class gcc_toolchain:
+    """
+        Builds the compile commands of the RISC-V GNU toolchain.
+    """
+
+    flags = '-static -std=gnu99 -O2 -fno-common -fno-builtin-printf ' \
+            '-fvisibility=hidden -static -nostdlib -nostartfiles -lm -lgcc'
+
+    def __init__(self, compiler=None, mcmodel='medany'):
+        """
+            :param compiler: the compiler executable, None for the gcc of the
+                             toolchain prefix of the ISA
+            :param mcmodel: code model of the tests
+        """
+        self.compiler = compiler
+        self.mcmodel = mcmodel
+
+    def march(self, profile):
+        """
+            :param profile: uatg.utils.isa_profile of the DUT
+            :return: the -march argument for the ISA
+        """
+        return profile.march
+
+    def mabi(self, profile):
+        """
+            :param profile: uatg.utils.isa_profile of the DUT
+            :return: the -mabi argument for the ISA
+        """
+        return profile.mabi
+
+    def command(self, profile, link_path, test_path, env_path, work_dir,
+                compile_macros):
+        """
+            :param profile: uatg.utils.isa_profile of the DUT
+            :param link_path: directory of the linker script
+            :param test_path: path of the assembly test
+            :param env_path: directory of the arch_test headers
+            :param work_dir: directory of model_test.h
+            :param compile_macros: macros to be defined for the test
+            :return: command to compile the test
+        """
+        macros = ''
+        if compile_macros:
+            macros = '-D' + ' -D'.join(compile_macros)
+
+        compiler = self.compiler or f'{profile.prefix}gcc'
+        return f'{compiler} -mcmodel={self.mcmodel} {self.flags} ' \
+               f'-march={self.march(profile)} -mabi={self.mabi(profile)}' \
+               f' -lm -lgcc -T {join(link_path, "link.ld")} {test_path}' \
+               f' -I {env_path}' \
+               f' -I {work_dir} {macros}' \
+               f' -o /dev/null'
+
+
+class stub_toolchain(gcc_toolchain):
+    """
+        Stand-in for the GNU toolchain, for machines without the cross
+        compiler. The tests are checked by check_test instead of being
+        compiled.
+    """
+
+    def __init__(self):
+        super().__init__(compiler=f'{quote(executable)} -m uatg.toolchain')
+
+
+# toolchains which can be selected by name, any other name is taken as the
+# path of a GNU compiler
+toolchains = {'gcc': gcc_toolchain, 'stub': stub_toolchain}
+
+
+@lru_cache(maxsize=None)
+def get_toolchain(name='gcc'):
+    """
+        :param name: name of a toolchain in toolchains, or the path of a GNU
+                     compiler
+        :return: the toolchain instance
+    """
+    if not name:
+        name = 'gcc'
+    if name in toolchains:
+        return toolchains[name]()
+    return gcc_toolchain(compiler=name)
+
+
+@lru_cache(maxsize=None)
+def known_mnemonics():
+    """
+        :return: frozenset of the mnemonics accepted by check_test
+    """
+    # imported here, as instruction_generator depends on utils which builds
+    # the commands with this module
+    from uatg.instruction_generator import load_isem
+    return frozenset(name for extension in load_isem().values()
+                     for name in extension) | extra_mnemonics
+
+
+def logical_lines(text):
+    """
+        :param text: source of an assembly file or header
+        :return: lines of the source, without comments and with the
+                 continued lines joined
+    """
+    text = block_comment_pattern.sub(
+        lambda comment: '\n' * comment.group(0).count('\n'),
+        text.replace('\\\n', ' '))
+    return text.split('\n')
+
+
+def find_include(name, source_dir, include_dirs):
+    """
+        :return: path of the included file, None if it is not found
+    """
+    for path in (source_dir,) + include_dirs:
+        if isfile(join(path, name)):
+            return join(path, name)
+    return None
+
+
+@lru_cache(maxsize=None)
+def header_symbols(path, include_dirs):
+    """
+        :param path: path of the header
+        :param include_dirs: directories searched for the included headers
+        :return: (macros, labels, errors) of the header and of the headers it
+                 includes. The macros are the preprocessor and assembler
+                 macros, the labels are the ones defined in its macros.
+    """
+    macros, labels, errors = set(), set(), []
+    with open(path) as f:
+        lines = logical_lines(f.read())
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if line.startswith('#'):
+            include = include_pattern.match(line)
+            if include:
+                header = find_include(include.group(1), dirname(path),
+                                      include_dirs)
+                if header is None:
+                    errors.append(f'{path}:{line_no}: fatal error: '
+                                  f'{include.group(1)}: No such file or '
+                                  f'directory')
+                    continue
+                h_macros, h_labels, h_errors = header_symbols(
+                    header, include_dirs)
+                macros |= h_macros
+                labels |= h_labels
+                errors += h_errors
+            define = define_pattern.match(line)
+            if define:
+                macros.add(define.group(1))
+                labels.update(
+                    re.findall(rf'({symbol}):(?!:)', line[define.end():]))
+        elif macro_pattern.match(line):
+            macros.add(macro_pattern.match(line).group(1))
+        elif label_pattern.match(line):
+            labels.add(label_pattern.match(line).group(1))
+    return frozenset(macros), frozenset(labels), tuple(errors)
+
+
+def check_test(test_path, include_dirs=(), macros=()):
+    """
+        checks an assembly test structurally, the way the assembler and linker
+        would reject it: missing includes, unknown mnemonics or macros, and
+        references to undefined labels.
+
+        :param test_path: path of the assembly test
+        :param include_dirs: directories searched for the included headers
+        :param macros: macros defined on the command line
+        :return: list of errors, in the format of gcc
+    """
+    include_dirs = tuple(include_dirs)
+    mnemonics = known_mnemonics()
+    macros = set(macros)
+    labels = set()
+    local_labels = {}
+    references = []
+    errors = []
+
+    with open(test_path) as f:
+        lines = logical_lines(f.read())
+
+    position = 0
+    for line_no, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            include = include_pattern.match(stripped)
+            define = define_pattern.match(stripped)
+            if include:
+                header = find_include(include.group(1), dirname(test_path),
+                                      include_dirs)
+                if header is None:
+                    errors.append(f'{test_path}:{line_no}: fatal error: '
+                                  f'{include.group(1)}: No such file or '
+                                  f'directory')
+                    continue
+                h_macros, h_labels, h_errors = header_symbols(
+                    header, include_dirs)
+                macros |= h_macros
+                labels |= h_labels
+                errors += h_errors
+            elif define:
+                macros.add(define.group(1))
+            # the other preprocessor directives and the comments are ignored
+            continue
+
+        for statement in line_comment_pattern.sub('', line).split(';'):
+            position += 1
+            label = label_pattern.match(statement)
+            while label:
+                name = label.group(1)
+                if name.isdigit():
+                    local_labels.setdefault(name, []).append(position)
+                else:
+                    labels.add(name)
+                statement = statement[label.end():]
+                label = label_pattern.match(statement)
+
+            fields = statement.split(None, 1)
+            if not fields:
+                continue
+            name = fields[0].split('(', 1)[0]
+            if name == '.macro' and len(fields) > 1:
+                macros.add(fields[1].split(None, 1)[0].rstrip(','))
+            if name.startswith('.') or name in macros:
+                continue
+            mnemonic = name.lower()
+            for suffix in atomic_suffixes:
+                if mnemonic.endswith(suffix) and mnemonic[:-len(suffix)] \
+                        in mnemonics:
+                    mnemonic = mnemonic[:-len(suffix)]
+                    break
+            if mnemonic not in mnemonics:
+                errors.append(f'{test_path}:{line_no}: Error: unrecognized '
+                              f'opcode `{statement.strip()}\'')
+                continue
+
+            if mnemonic in label_mnemonics and len(fields) > 1:
+                operand = fields[1].split(',')[-1].strip()
+                local = local_ref_pattern.match(operand)
+                if local:
+                    references.append((line_no, local.groups(), position))
+                elif symbol_pattern.match(operand):
+                    target = symbol_pattern.match(operand).group(0)
+                    if target.lower() not in registers:
+                        references.append((line_no, target, position))
+
+    for line_no, target, position in references:
+        if isinstance(target, tuple):
+            number, direction = target
+            positions = local_labels.get(number, [])
+            if direction == 'f' and any(p > position for p in positions) or \
+                    direction == 'b' and any(p <= position for p in positions):
+                continue
+            target = number + direction
+        elif target in labels or target in macros:
+            continue
+        errors.append(f'{test_path}:{line_no}: undefined reference to '
+                      f'`{target}\'')
+    return errors
+
+
+def stub_arguments(args):
+    """
+        :param args: split compile command
+        :return: arguments of the command after the stub_toolchain compiler,
+                 None if the command does not use stub_toolchain
+    """
+    prefix = split(get_toolchain('stub').compiler)
+    if args[:len(prefix)] == prefix:
+        return args[len(prefix):]
+    return None
+
+
+def check_arguments(args):
+    """
+        checks the assembly tests in a compile command line of the GNU
+        toolchain, with stub_toolchain.
+
+        :param args: arguments of the compile command
+        :return: list of errors of the tests
+    """
+    include_dirs, macros, tests = [], [], []
+    args = iter(args)
+    for arg in args:
+        if arg in ('-I', '-D', '-T', '-o'):
+            value = next(args, '')
+            if arg == '-I':
+                include_dirs.append(value)
+            elif arg == '-D':
+                macros.append(value.split('=', 1)[0])
+        elif arg.startswith('-I'):
+            include_dirs.append(arg[2:])
+        elif arg.startswith('-D'):
+            macros.append(arg[2:].split('=', 1)[0])
+        elif arg.endswith('.S') or arg.endswith('.s'):
+            tests.append(arg)
+
+    errors = []
+    for test in tests:
+        try:
+            errors += check_test(test, include_dirs, macros)
+        except OSError as e:
+            errors.append(f'fatal error: {e}')
+    return errors
+
+
+def main(args):
+    """
+        :param args: arguments of the compile command
+        :return: exit status, 1 if a test has errors
+    """
+    errors = check_arguments(args)
+    if errors:
+        stderr.write('\n'.join(errors) + '\n')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main(argv[1:]))
@@ -1,16 +1,52 @@
 # See LICENSE.incore for license details
 import re
+from functools import lru_cache
 from glob import glob
-from os import remove, listdir, getcwd, chdir
-from os.path import join, abspath, exists, basename, dirname
+from hashlib import sha256
+from json import dump as json_dump, load as json_load
+from multiprocessing.pool import ThreadPool
+from os import remove, listdir, stat, makedirs, replace, getpid
+from os.path import join, abspath, exists, basename, dirname, isdir
+from pickle import dump as pickle_dump, load as pickle_load, UnpicklingError, \
+    HIGHEST_PROTOCOL
 from random import randint
 from re import findall, M
 from shlex import split
-from subprocess import run, PIPE, CalledProcessError
+from subprocess import run, PIPE
+from threading import Lock
+from time import perf_counter
 
 from ruamel.yaml import YAML
 
 from uatg.log import logger
+from uatg.toolchain import get_toolchain, stub_arguments, check_arguments
+
+# arch_test headers providing the compile macros of the tests
+arch_test_headers = (join(dirname(__file__), 'env/arch_test_unpriv.h'),
+                     join(dirname(__file__), 'env/arch_test_priv.h'))
+
+# macros of the headers, keyed by the path, mtime and size of each header
+macros_memo = {}
+
+# pte bits used by setup_pages when the test does not specify them
+default_pte_dict = {
+    'valid': True,
+    'read': True,
+    'write': True,
+    'execute': True,
+    'user': True,
+    'globl': True,
+    'access': True,
+    'dirty': True
+}
+
+# number of page table configurations kept in memory by setup_pages
+page_tables_cache_size = 256
+
+# files within the work_dir recording the tests which compiled cleanly, and
+# the result of the last empty compilation
+compile_cache_file = '.compile_cache.json'
+compile_report_file = 'compile_report.json'
 
 
 class sv_components:
@@ -219,15 +255,18 @@ def uatg_exit():
     logger.info(f'Good day! Stay Hydrated.')
 
 
-def load_yaml(file):
+def load_yaml(file, typ='rt'):
     """
         Common function to load YAML Files.
         The function checks if the file is of YAML format else exits.
         If the file is in YAML, it reads the file and returns the data from the
         file as a dictionary.
+
+        :param typ: ruamel loader type. 'safe' is faster and returns plain
+                    dicts/lists, for files which are only read.
     """
     if exists(file) and (file.endswith('.yaml') or file.endswith('.yml')):
-        yaml = YAML(typ="rt")
+        yaml = YAML(typ=typ)
         yaml.default_flow_style = False
         yaml.allow_unicode = True
         try:
@@ -333,8 +372,7 @@ SECTIONS
 } 
 '''
 
-    with open(join(target_dir, "link.ld"), 'w') as outfile:
-        outfile.write(out)
+    write_if_changed(join(target_dir, 'link.ld'), out)
 
 
 def create_model_test_h(target_dir):
@@ -405,8 +443,7 @@ shakti_end:                                                             \
 #define RVMODEL_CLEAR_MEXT_INT
 #endif // _COMPLIANCE_MODEL_H'''
 
-    with open(join(target_dir, 'model_test.h'), 'w') as outfile:
-        outfile.write(out)
+    write_if_changed(join(target_dir, 'model_test.h'), out)
 
 
 def create_plugins(plugins_path, index_yaml, module):
@@ -515,11 +552,23 @@ def create_config_file(config_path, jobs, modules, module_dir, work_dir,
           'run individual tests in river_core, set the flag to True\n' \
           'gen_test_list = True\n# [True, False] If the gen_test flag is True' \
           ', assembly files are generated/overwritten\ngen_test = True\n# ' \
+          '[True, False] If the incremental flag is True, only the tests of ' \
+          'the plugins which changed since the previous run are ' \
+          'regenerated\nincremental = False\n# [True, False] If the ' \
+          'deterministic flag is True, the tests do not contain the user ' \
+          'and time of generation, and only the changed files are ' \
+          'rewritten\n' \
+          'deterministic = False\n# ' \
           '[True, False] If the val_test flag is True, Log from DUT are ' \
           'parsed and the modules are validated\nval_test = False\n# [True' \
           ', False] If the gen_cvg flag is True, System Verilog cover-groups ' \
           f'are generated\ngen_cvg = False\n\ntest_compile = {test_compile}' \
-          '\n\n# Path to the yaml files containing DUT Configuration.\n' \
+          '\n# Toolchain compiling the tests: gcc, stub (checks the tests ' \
+          'without a cross compiler) or the path of a GNU compiler\n' \
+          'toolchain = gcc' \
+          '\n# Stop the empty compilation after these many failures, 0 to ' \
+          'compile all the tests\nmax_compile_failures = 0\n\n' \
+          '# Path to the yaml files containing DUT Configuration.\n' \
           '# If you are using the CHROMITE core, uncomment the following line' \
           ' by removing the \'#\'.\n# By doing this, UATG will use the ' \
           'checked YAMLs of Chromite\n' \
@@ -764,6 +813,138 @@ def split_isa_string(isa_string):
     return extension_list
 
 
+class isa_profile:
+    """
+        The compiler settings derived from the ISA string of the DUT. Use
+        get_isa_profile, which parses each ISA string once, so that the per
+        test code paths only look the profile up.
+
+        xlen - XLEN of the ISA,
+        extensions - frozenset of the extensions, G expanded to IMAFD and
+                     Zicsr_Zifencei,
+        march - -march argument of the compiler. It lists the extensions of
+                the ISA string only, i.e. rv32imac for RV32IMAC and
+                rv32imac_zicsr for RV32IMACZicsr,
+        mabi - -mabi argument of the compiler,
+        prefix - prefix of the GNU toolchain for the XLEN
+    """
+
+    # extensions of the ISA string which are not passed in -march
+    privilege_extensions = frozenset('SUHN')
+
+    def __init__(self, isa):
+        """
+            :param isa: ISA string of the DUT, i.e. RV64IMAFDCSUZicsr_Zifencei
+        """
+        self.isa = isa
+        xlen = re.match(r'RV(\d+)', isa, re.I)
+        self.xlen = int(xlen.group(1)) if xlen else 64
+
+        # split_isa_string expects the Z extensions in upper case
+        letters, z_extensions = [], []
+        for extension in split_isa_string(isa.upper()):
+            if len(extension) == 1:
+                letters.append(extension)
+            else:
+                z_extensions.append(extension.capitalize())
+        extensions = set(letters + z_extensions)
+        if 'G' in extensions:
+            extensions |= {'I', 'M', 'A', 'F', 'D', 'Zicsr', 'Zifencei'}
+        self.extensions = frozenset(extensions)
+
+        self.march = f'rv{self.xlen}' + ''.join(
+            letter for letter in letters
+            if letter not in self.privilege_extensions).lower() + ''.join(
+                f'_{extension.lower()}' for extension in z_extensions)
+        if self.xlen == 32:
+            self.mabi = 'ilp32e' if 'E' in extensions else 'ilp32'
+        else:
+            self.mabi = 'lp64'
+        self.prefix = f'riscv{self.xlen}-unknown-elf-'
+
+
+@lru_cache(maxsize=None)
+def get_isa_profile(isa):
+    """
+        :param isa: ISA string of the DUT
+        :return: the isa_profile of the ISA string
+    """
+    return isa_profile(isa)
+
+
+def write_if_changed(path, text):
+    """
+        writes the text into the file at path, unless the file already holds
+        the same text. Unchanged files keep their modification time, so that
+        the tools depending on it (make, ccache) do not rebuild them.
+
+        :param path: path of the file
+        :param text: content of the file, as str or bytes
+        :return: True if the file was written
+    """
+    data = text if isinstance(text, bytes) else text.encode()
+    try:
+        if stat(path).st_size == len(data):
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    return False
+    except FileNotFoundError:
+        pass
+    with open(path, 'wb') as f:
+        f.write(data)
+    return True
+
+
+def copy_if_changed(src, dst):
+    """
+        copies the file at src to dst, unless dst already holds the same
+        bytes.
+
+        :param src: path of the source file
+        :param dst: path of the destination file
+        :return: True if the file was written
+    """
+    with open(src, 'rb') as f:
+        return write_if_changed(dst, f.read())
+
+
+def test_list_entry(test_name, asm_dir, uarch_dir, module_dir, isa,
+                    compile_macros, self_checking):
+    """
+      returns the test_list.yaml entry of a test generated by test_generator.
+
+      :param test_name: name of the test
+      :param asm_dir: directory of the module within the work directory
+      :param uarch_dir: directory of uatg
+      :param module_dir: directory of the module containing the test plugins
+      :param isa: ISA string of the DUT
+      :param compile_macros: list of compile macros of the test
+      :param self_checking: self checking flag of the test
+    """
+    env_dir = join(uarch_dir, 'env/')
+    target_dir = abspath(asm_dir + '/../')
+    profile = get_isa_profile(isa)
+
+    entry = {}
+    entry['generator'] = 'uatg'
+    entry['work_dir'] = abspath(asm_dir + '/' + test_name)
+    entry['isa'] = isa
+    entry['march'] = profile.march
+    entry['mabi'] = profile.mabi
+    entry['cc'] = f'{profile.prefix}gcc'
+    entry['cc_args'] = '-mcmodel=medany -static -std=gnu99 -O2 -fno-common ' \
+                       '-fno-builtin-printf -fvisibility=hidden '
+    entry['linker_args'] = '-static -nostdlib -nostartfiles -lm -lgcc -T'
+    entry['linker_file'] = abspath(join(target_dir, 'link.ld'))
+    entry['asm_file'] = abspath(join(asm_dir, test_name, test_name + '.S'))
+    entry['include'] = [env_dir, target_dir, module_dir]
+    entry['compile_macros'] = compile_macros
+    entry['extra_compile'] = []
+    entry['result'] = 'Unavailable'
+    entry['self_checking'] = self_checking
+    return entry
+
+
 def generate_test_list(asm_dir, uarch_dir, module_dir, isa, test_list, compile_macros_dict, self_checking_dict):
     """
       updates the test_list.yaml file with the location of the
@@ -773,38 +954,14 @@ def generate_test_list(asm_dir, uarch_dir, module_dir, isa, test_list, compile_m
       to use.
     """
     asm_test_list = glob(asm_dir + '/**/*.S')
-    env_dir = join(uarch_dir, 'env/')
-    target_dir = abspath(asm_dir + '/../')
-
-    extension_list = split_isa_string(isa)
-    march = isa.replace('S','').replace('U','').replace('H','').lower()
-    xlen = 32 if '32' in isa else 64
-    mabi = 'ilp32' if xlen == 32 else 'lp64'
 
     for test in asm_test_list:
         logger.debug(f"Current test is {test}")
         base_key = basename(test)[:-2]
-        test_list[base_key] = {}
-        test_list[base_key]['generator'] = 'uatg'
-        test_list[base_key]['work_dir'] = abspath(asm_dir + '/' + base_key)
-        test_list[base_key]['isa'] = isa
-        test_list[base_key]['march'] = march
-        test_list[base_key]['mabi'] = mabi
-        test_list[base_key]['cc'] = f'riscv{xlen}-unknown-elf-gcc'
-        test_list[base_key][
-            'cc_args'] = '-mcmodel=medany -static -std=gnu99 -O2 -fno-common ' \
-                         '-fno-builtin-printf -fvisibility=hidden '
-        test_list[base_key][
-            'linker_args'] = '-static -nostdlib -nostartfiles -lm -lgcc -T'
-        test_list[base_key]['linker_file'] = abspath(join(
-            target_dir, 'link.ld'))
-        test_list[base_key]['asm_file'] = abspath(
-            join(asm_dir, base_key, base_key + '.S'))
-        test_list[base_key]['include'] = [env_dir, target_dir, module_dir]
-        test_list[base_key]['compile_macros'] = compile_macros_dict[base_key]
-        test_list[base_key]['extra_compile'] = []
-        test_list[base_key]['result'] = 'Unavailable'
-        test_list[base_key]['self_checking'] = self_checking_dict[base_key]
+        test_list[base_key] = test_list_entry(base_key, asm_dir, uarch_dir,
+                                              module_dir, isa,
+                                              compile_macros_dict[base_key],
+                                              self_checking_dict[base_key])
     return test_list
 
 
@@ -847,25 +1004,18 @@ def list_of_modules(module_dir):
 
 
 def dump_makefile(isa, link_path, test_path, test_name, env_path, work_dir,
-                  compile_macros):
-    compiler = 'riscv64-unknown-elf-gcc'
-    mcmodel = 'medany'
-    mabi = 'lp64'
-    march = isa.lower()[:8]
-    macros = ''
-
-    if compile_macros:
-        macros = '-D' + ' -D'.join(compile_macros)
-
-    flags = '-static -std=gnu99 -O2 -fno-common -fno-builtin-printf ' \
-            '-fvisibility=hidden -static -nostdlib -nostartfiles -lm -lgcc'
-    cmd = f'{compiler} -mcmodel={mcmodel} {flags} -march={march} -mabi={mabi}' \
-          f' -lm -lgcc -T {join(link_path, "link.ld")} {test_path}' \
-          f' -I {env_path}' \
-          f' -I {work_dir} {macros}' \
-          f' -o /dev/null'
-
-    return cmd
+                  compile_macros, toolchain='gcc'):
+    """
+        :param toolchain: name of the toolchain building the command, see
+                          uatg.toolchain.get_toolchain
+        :return: the command compiling the test
+    """
+    return get_toolchain(toolchain).command(profile=get_isa_profile(isa),
+                                            link_path=link_path,
+                                            test_path=test_path,
+                                            env_path=env_path,
+                                            work_dir=work_dir,
+                                            compile_macros=compile_macros)
 
 
 def setup_pages(pte_dict,
@@ -881,15 +1031,22 @@ def setup_pages(pte_dict,
                 user_supervisor_superpage=False,
                 fault=False,
                 mem_fault=False,
-                misaligned_superpage=False):
+                misaligned_superpage=False,
+                cache_dir=None):
     """
         creates pagetables to run tests in User and Supervisor modes
         Currently works with the sv39 virtual memory addressing.
 
+        The page tables depend only on the arguments, so they are built once
+        per set of arguments and reused (LRU cache of the last
+        page_tables_cache_size sets of arguments). If cache_dir is given, they
+        are also stored in, and loaded from, that directory.
+
         :param page_size: Size of the pages - 4kiB.
         :param paging_mode: Paging mode used in the tests - sv39, for now.
         :param valid_ll_pages: Valid last level pages to be created.
         :param mode: Mode of execution for which the test is being generated.
+        :param cache_dir: directory of the on-disk cache, None to disable it.
         :type page_size: int
         :type paging_mode: string
         :type valid_ll_pages: int
@@ -902,19 +1059,69 @@ def setup_pages(pte_dict,
         # machine mode tests don't have anything to do with pages.
         # so, we return a list of empty strings.
         return ['', '', ''], ''
-    
+
     if pte_dict is None:
-        pte_dict = {
-            'valid': True,
-            'read': True,
-            'write': True,
-            'execute': True,
-            'user': True,
-            'globl': True,
-            'access': True,
-            'dirty': True
-        }
+        pte_dict = default_pte_dict
+
+    # only the truth values of the pte bits are used by the page tables
+    key = (tuple(bool(pte_dict[bit]) for bit in default_pte_dict), page_size,
+           paging_mode, valid_ll_pages, mode, megapage, gigapage, terapage,
+           petapage, user_superpage, user_supervisor_superpage, fault,
+           mem_fault, misaligned_superpage)
+
+    if cache_dir is None:
+        out_code_string, out_data_string = cached_page_tables(key)
+        return list(out_code_string), out_data_string
+
+    cache_file = join(
+        cache_dir, 'pages-' + sha256(
+            (page_tables_digest() + repr(key)).encode()).hexdigest()[:16] +
+        '.pickle')
+    try:
+        with open(cache_file, 'rb') as f:
+            out_code_string, out_data_string = pickle_load(f)
+        return list(out_code_string), out_data_string
+    except (OSError, EOFError, UnpicklingError, ValueError):
+        pass
+
+    out_code_string, out_data_string = cached_page_tables(key)
+    makedirs(cache_dir, exist_ok=True)
+    tmp_file = f'{cache_file}.{getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle_dump((out_code_string, out_data_string), f, HIGHEST_PROTOCOL)
+    replace(tmp_file, cache_file)
+    return list(out_code_string), out_data_string
+
+
+@lru_cache(maxsize=None)
+def page_tables_digest():
+    """
+        :return: hash of this file, so that the on-disk page table cache is
+                 invalidated when the page table generation changes
+    """
+    with open(__file__, 'rb') as f:
+        return sha256(f.read()).hexdigest()
+
+
+@lru_cache(maxsize=page_tables_cache_size)
+def cached_page_tables(key):
+    """
+        :param key: normalized arguments of setup_pages
+        :return: (tuple of out_code_strings, out_data_string) of build_pages
+    """
+    pte_bits, *args = key
+    out_code_string, out_data_string = build_pages(
+        dict(zip(default_pte_dict, pte_bits)), *args)
+    return tuple(out_code_string), out_data_string
+
 
+def build_pages(pte_dict, page_size, paging_mode, valid_ll_pages, mode,
+                megapage, gigapage, terapage, petapage, user_superpage,
+                user_supervisor_superpage, fault, mem_fault,
+                misaligned_superpage):
+    """
+        builds the page tables of setup_pages, without caching.
+    """
     entries_per_pt = page_size // 8
     # assuming that the size will always be a power of 2
     power = len(bin(page_size)[2:]) - 1
@@ -1054,16 +1261,15 @@ def setup_pages(pte_dict,
     # data section
     pre = f"\n.align {align}\n\n"
 
-    initial_level_pages_s = ''
-    for level in range(levels - 1):
-        initial_level_pages_s += f"l{level}_pt:\n.rept {entries}\n{word_fill} 0x0" \
-                                 f"\n.endr\n"
+    initial_level_pages_s = ''.join(
+        f"l{level}_pt:\n.rept {entries}\n{word_fill} 0x0\n.endr\n"
+        for level in range(levels - 1))
 
     initial_level_pages_u = ''
     if mode == 'user':
-        for level in range(1, levels - 1):
-            initial_level_pages_u += f"l{level}_u_pt:\n.rept {entries}\n" \
-                                     f"{word_fill} 0x0\n.endr\n"
+        initial_level_pages_u = ''.join(
+            f"l{level}_u_pt:\n.rept {entries}\n{word_fill} 0x0\n.endr\n"
+            for level in range(1, levels - 1))
 
     # assumption that the l3 pt entry 0 will point to 80000000
 
@@ -1080,32 +1286,23 @@ def setup_pages(pte_dict,
     access_bit = 0x40
     dirty_bit = 0x80
 
-    ll_entries_s = ''
-    ll_entries_u = ''
-    # ll_page_s = ''
-    # ll_page_u = ''
-    base_address_new = base_address
+    pte_bits_s = (dirty_bit | access_bit | global_bit | u_bit_s |
+                  execute_bit | write_bit | read_bit | valid_bit)
+    pte_bits_u = (dirty_bit | access_bit | global_bit | u_bit_u |
+                  execute_bit | write_bit | read_bit | valid_bit)
+    # PTE address fields of the valid last level pages
+    pte_addresses = [((base_address + i * page_size) >> power) << 10
+                     for i in range(valid_ll_pages)]
 
+    ll_entries_u = ''
     if mode == 'user':
-        for i in range(valid_ll_pages):
-            pte_address_u = base_address_new >> power
-            pte_address_u = pte_address_u << 10
-            pte_entry_u = pte_address_u | dirty_bit | access_bit | \
-                          global_bit | u_bit_u | execute_bit | write_bit | \
-                          read_bit | valid_bit
-            ll_entries_u += '{0} {1} # entry_{2}\n'.format(word_fill,
-                hex(pte_entry_u), i)
-            base_address_new += page_size
-
-    base_address_new = base_address
-    for i in range(valid_ll_pages):
-        pte_address_s = base_address_new >> power
-        pte_address_s = pte_address_s << 10
-        pte_entry_s = pte_address_s | dirty_bit | access_bit | \
-                      global_bit | u_bit_s | execute_bit | write_bit | \
-                      read_bit | valid_bit
-        ll_entries_s += '{0} {1} # entry_{2}\n'.format(word_fill,hex(pte_entry_s), i)
-        base_address_new += page_size
+        ll_entries_u = ''.join(
+            f'{word_fill} {hex(pte_address | pte_bits_u)} # entry_{i}\n'
+            for i, pte_address in enumerate(pte_addresses))
+
+    ll_entries_s = ''.join(
+        f'{word_fill} {hex(pte_address | pte_bits_s)} # entry_{i}\n'
+        for i, pte_address in enumerate(pte_addresses))
 
     ll_page_s = f'l{levels - 1}_pt:\n' \
                 f'{ll_entries_s}.rept {entries - valid_ll_pages}\n' \
@@ -1126,9 +1323,9 @@ def setup_pages(pte_dict,
     out_code_string = []
 
     # calculation to set up root level pages
-    pte_updation = f"\n.option norvc" \
-                   f"\n\t# setting up root PTEs\n" \
-                   f"\tla t0, l0_pt # load address of root page\n\n"
+    pte_updation = ["\n.option norvc"
+                    "\n\t# setting up root PTEs\n"
+                    "\tla t0, l0_pt # load address of root page\n\n"]
 
     data_for_misaligned_test = f"\n\tla t4, faulty_page_address\n"\
                                f"\tSREG t0, (t4)\n"\
@@ -1150,35 +1347,37 @@ def setup_pages(pte_dict,
                                        (user_superpage == False) \
                                        else ''
 
-        pte_updation += f"\t# setting up l{i} table to point l{i + 1} table\n" \
-                        f"\taddi t1, x0, 1 # add value 1 to reg\n" \
-                        f"\tslli t2, t1, {power} # left shift to create a " \
-                        f"page with value == page size\n" \
-                        f"\tadd t3, t2, t0 # add with the existing " \
-                        f"address to get address of level l page\n" \
-                        f"\tsrli t4, t3, {power} # divide that address with " \
-                        f"page size\n" \
-                        f"\tslli t4, t4, 10 # left shift for PTE format\n" \
-                        f"\tadd t4, t4, t1 # set valid bit to 1\n" \
-                        f"{offset_root}"\
-                        f"{superpage_entry_s}"\
-                        f"\tSREG t4, (t0)\n"\
-                        f"{s_superpage_address_load}\n"\
-                        f"{offset_move_t0}"\
-                        f"# store l{i + 1} first entry address " \
-                        f"into the first entry of l{i}\n\n"
+        pte_updation.append(
+            f"\t# setting up l{i} table to point l{i + 1} table\n"
+            f"\taddi t1, x0, 1 # add value 1 to reg\n"
+            f"\tslli t2, t1, {power} # left shift to create a "
+            f"page with value == page size\n"
+            f"\tadd t3, t2, t0 # add with the existing "
+            f"address to get address of level l page\n"
+            f"\tsrli t4, t3, {power} # divide that address with "
+            f"page size\n"
+            f"\tslli t4, t4, 10 # left shift for PTE format\n"
+            f"\tadd t4, t4, t1 # set valid bit to 1\n"
+            f"{offset_root}"
+            f"{superpage_entry_s}"
+            f"\tSREG t4, (t0)\n"
+            f"{s_superpage_address_load}\n"
+            f"{offset_move_t0}"
+            f"# store l{i + 1} first entry address "
+            f"into the first entry of l{i}\n\n")
         if i < levels-2:
-            pte_updation += f"\t#address updation\n" \
-                            f"\tadd t0, t3, 0 # move the address of " \
-                            f"level {i + 1} page to t0\n\n"
+            pte_updation.append(f"\t#address updation\n"
+                                f"\tadd t0, t3, 0 # move the address of "
+                                f"level {i + 1} page to t0\n\n")
 
-    pte_updation += "\n"
+    pte_updation.append("\n")
 
     if mode == 'user':
         #user_lowest_level = f"{levels-3}_u" if (levels-3 != 0) else "0"
-        pte_updation += f"\t# user page table set up\n"
-        pte_updation += f"\tla t0, l0_pt # load address of root page\n\n"
-        pte_updation += f"\tla t3, l1_u_pt # load address of l1 user page\n\n"
+        pte_updation.append("\t# user page table set up\n")
+        pte_updation.append("\tla t0, l0_pt # load address of root page\n\n")
+        pte_updation.append(
+            "\tla t3, l1_u_pt # load address of l1 user page\n\n")
         common_setup = f"\tsrli t5, t3, 12\n" \
                        f"\tslli t5, t5, 10\n" \
                        f"\tli t4, 1\n" \
@@ -1193,23 +1392,22 @@ def setup_pages(pte_dict,
                                            (user_superpage == True)\
                                         else ''
 
-            pte_updation += f"\n\t# update l{levels-3+i} page entry with address " \
-                            f"of l{levels-2+i} page\n"
+            pte_updation.append(f"\n\t# update l{levels-3+i} page entry "
+                                f"with address of l{levels-2+i} page\n")
             if i != 0:
-                pte_updation += f"\taddi t2, x0, 1\n" \
-                                f"\tslli t2, t2, 12\n" \
-                                f"\tadd t3, t0, t2\n"
-            
-            pte_updation += f"{common_setup}\n"
-            pte_updation += f'{superpage_entry_u}'\
-                            f'{common_setup_store}'\
-                            f'{u_superpage_address_load}\n'
-            #pte_updation += f'{common_setup_store}'
+                pte_updation.append("\taddi t2, x0, 1\n"
+                                    "\tslli t2, t2, 12\n"
+                                    "\tadd t3, t0, t2\n")
+
+            pte_updation.append(f"{common_setup}\n")
+            pte_updation.append(f'{superpage_entry_u}'
+                                f'{common_setup_store}'
+                                f'{u_superpage_address_load}\n')
 
             if i < levels-2:
-                pte_updation += f"\t# address updation\n" \
-                                f"\tadd t0, t3, 0 # move address of " \
-                                f"l{i + 1} page into t0\n"
+                pte_updation.append(f"\t# address updation\n"
+                                    f"\tadd t0, t3, 0 # move address of "
+                                    f"l{i + 1} page into t0\n")
 
     if (terapage == True) or (petapage == True):
         a0_reg = 0
@@ -1287,7 +1485,7 @@ def setup_pages(pte_dict,
     else:
         fault_creation = ""
 
-    pte_updation += fault_creation
+    pte_updation.append(fault_creation)
 
     if mode == 'user' and user_superpage == False:
         u_mode_a1_reg = '\n\tli a1, 173\n'
@@ -1297,7 +1495,7 @@ def setup_pages(pte_dict,
     user_entry = "RVTEST_USER_ENTRY()\n" if mode == 'user' else ""
     user_exit = "RVTEST_USER_EXIT()\n" if mode == 'user' else ""
 
-    out_code_string.append(pte_updation)
+    out_code_string.append(''.join(pte_updation))
 
     out_code_string.append(f"\nRVTEST_SUPERVISOR_ENTRY({power}, {mode_val}, "
                            f"{shift_amount})\n"
@@ -1313,36 +1511,222 @@ def setup_pages(pte_dict,
     return out_code_string, out_data_string
 
 
-def run_make(work_dir, jobs):
+def makefile_commands(makefile_path):
+    """
+        reads the compile commands of the tests from the makefile dumped by
+        generate_tests.
+
+        :param makefile_path: path to the makefile
+        :return: list of (test_name, command)
+    """
+    commands = []
+    with open(makefile_path) as f:
+        lines = f.read().splitlines()
+    # the rules of the tests have no prerequisites and a single recipe line.
+    # The module targets list their tests as prerequisites instead.
+    for line, recipe in zip(lines, lines[1:]):
+        target, colon, prerequisites = line.partition(':')
+        if colon and not prerequisites.strip() and not line.startswith('\t') \
+                and recipe.startswith('\t'):
+            commands.append((target, recipe[1:]))
+    return commands
+
+
+@lru_cache(maxsize=None)
+def include_digest(paths):
+    """
+        :param paths: linker scripts and include directories of a command
+        :return: hash of the linker scripts and of the headers in the include
+                 directories
+    """
+    digest = sha256()
+    for path in paths:
+        files = sorted(glob(join(path, '*.h'))) if isdir(path) else [path]
+        for file in files:
+            digest.update(file.encode())
+            with open(file, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def compile_digest(command):
+    """
+        :param command: compile command of a test
+        :return: hash of the command, the assembly file and the headers and
+                 linker script it uses, None if one of them is missing
+    """
+    args = split(command)
+    includes = tuple(args[i + 1]
+                     for i, arg in enumerate(args[:-1])
+                     if arg in ('-I', '-T'))
+    sources = [arg for arg in args if arg.endswith('.S')]
+    try:
+        digest = sha256(command.encode())
+        digest.update(include_digest(includes).encode())
+        for source in sources:
+            with open(source, 'rb') as f:
+                digest.update(f.read())
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+class failure_limit:
+    """
+        Failure count of the compilation, shared by the threads of run_make.
+        The threads count their failures themselves, so that no test is
+        started once the limit is reached.
+    """
+
+    def __init__(self, max_failures=0):
+        """
+            :param max_failures: stop after these many failures, 0 to compile
+                                 all the tests
+        """
+        self.max_failures = max_failures
+        self.failures = 0
+        self.lock = Lock()
+
+    def add(self):
+        """
+            counts a failed test
+        """
+        with self.lock:
+            self.failures += 1
+
+    def reached(self):
+        """
+            :return: True once max_failures tests failed
+        """
+        return 0 < self.max_failures <= self.failures
+
+
+def compile_test(args):
+    """
+        compiles a single test.
+
+        :param args: (test_name, command, limit) where limit is the
+                     failure_limit of the compilation
+        :return: result record of the test
     """
-        function to invoke the empty compilation makefile
+    test_name, command, limit = args
+    result = {'name': test_name, 'status': 'skipped', 'duration': 0.0,
+              'stderr': ''}
+    if limit.reached():
+        return result
+    start = perf_counter()
+    args = split(command)
+    try:
+        # the tests of the stub toolchain are checked within this process
+        stub_args = stub_arguments(args)
+        if stub_args is not None:
+            errors = check_arguments(stub_args)
+            result['status'] = 'fail' if errors else 'pass'
+            result['stderr'] = ''.join(f'{error}\n' for error in errors)
+        else:
+            out = run(args, stdout=PIPE, stderr=PIPE)
+            result['status'] = 'pass' if out.returncode == 0 else 'fail'
+            result['stderr'] = out.stderr.decode(errors='replace')
+    except OSError as e:
+        result['status'] = 'fail'
+        result['stderr'] = str(e)
+    if result['status'] == 'fail':
+        limit.add()
+    result['duration'] = round(perf_counter() - start, 4)
+    return result
+
+
+def run_make(work_dir, jobs, max_failures=0):
+    """
+        function to perform the empty compilation of the tests in the makefile
+
+        The commands of the makefile are run by a pool of jobs threads, each
+        waiting on its compiler process, or checking the command in-process
+        for the stub toolchain. The tests which compiled cleanly are recorded
+        by the hash of their command, assembly file and headers, and are not
+        compiled again until one of them changes. The result of each test is
+        written to compile_report.json in the work_dir.
 
         :param work_dir: path to the work directory
-        :param jobs: number of parallel processes for the make utility to spawn
-        :returns: placeholder int
-        :rtype: int
+        :param jobs: number of compilations to run in parallel
+        :param max_failures: stop after these many failures, 0 to compile all
+                             the tests
+        :returns: the report of the compilation
+        :rtype: dict
     """
-    cwd = getcwd()
-    chdir(abspath(work_dir))
-    logger.debug(f'Current directory is: {work_dir}')
+    work_dir = abspath(work_dir)
     logger.info(f'Invoking makefile to perform an empty compilation')
     logger.warning(f'Based on the number of tests and their size, '
                    f'this step might take a lot of time.')
 
+    cache_file = join(work_dir, compile_cache_file)
     try:
-        out = run(split(f'make -j{jobs}'), check=True, stdout=PIPE, stderr=PIPE)
-        logger.debug(out.stdout.decode('ascii'))
-        logger.info('All the generated Assmebly files are syntatically correct')
-        logger.info('Empty Syntax Check - Complete! No errors found.')
-
-    except CalledProcessError as e:
-        logger.error(e.stderr.decode('ascii'))
+        with open(cache_file) as f:
+            cache = json_load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    # the headers are hashed once per compilation
+    include_digest.cache_clear()
+    start = perf_counter()
+    results = []
+    pending = []
+    digests = {}
+    limit = failure_limit(max_failures)
+    for test_name, command in makefile_commands(join(work_dir, 'makefile')):
+        digests[test_name] = compile_digest(command)
+        if digests[test_name] is not None and \
+                cache.get(test_name) == digests[test_name]:
+            results.append({'name': test_name, 'status': 'pass',
+                            'duration': 0.0, 'stderr': '', 'cached': True})
+        else:
+            pending.append((test_name, command, limit))
+    logger.info(f'{len(results)} tests are unchanged since their last '
+                f'successful compilation, compiling {len(pending)} tests')
+
+    if pending:
+        with ThreadPool(max(1, min(jobs, len(pending)))) as pool:
+            for result in pool.imap_unordered(compile_test, pending):
+                result['cached'] = False
+                results.append(result)
+                if result['status'] == 'pass' and \
+                        digests[result['name']] is not None:
+                    cache[result['name']] = digests[result['name']]
+                elif result['status'] == 'fail':
+                    cache.pop(result['name'], None)
+                    logger.error(f'{result["name"]} failed to compile\n'
+                                 f'{result["stderr"]}')
+
+    summary = {
+        status: sum(result['status'] == status for result in results)
+        for status in ('pass', 'fail', 'skipped')
+    }
+    summary['total'] = len(results)
+    summary['cached'] = sum(result['cached'] for result in results)
+    summary['duration'] = round(perf_counter() - start, 4)
+    report = {'summary': summary,
+              'tests': sorted(results, key=lambda result: result['name'])}
+
+    with open(cache_file + '.tmp', 'w') as f:
+        json_dump(cache, f)
+    replace(cache_file + '.tmp', cache_file)
+    with open(join(work_dir, compile_report_file), 'w') as f:
+        json_dump(report, f, indent=2)
+
+    if summary['fail']:
+        if summary['skipped']:
+            logger.warning(f'Stopped after {summary["fail"]} failures, '
+                           f'{summary["skipped"]} tests were not compiled')
         logger.warning(f'Please fix the errors and re-generate the tests')
         logger.info('Empty Syntax Check - Complete! Error found.')
-
-    chdir(cwd)
-    logger.debug(f'Current directory is: {getcwd()}')
-    return 1
+    else:
+        logger.info('All the generated Assmebly files are syntatically '
+                    'correct')
+        logger.info('Empty Syntax Check - Complete! No errors found.')
+    logger.info(f'{summary["pass"]} passed, {summary["fail"]} failed, '
+                f'{summary["skipped"]} skipped in {summary["duration"]}s. '
+                f'Report: {join(work_dir, compile_report_file)}')
+    return report
 
 
 def paging_modes(yaml_string, isa):
@@ -1357,7 +1741,7 @@ def paging_modes(yaml_string, isa):
 
     valid_modes = []
 
-    if 'RV64' in isa:
+    if get_isa_profile(isa).xlen == 64:
         if 8 in valid_list:
             valid_modes.append('sv39')
         if 9 in valid_list:
@@ -1400,10 +1784,25 @@ def select_paging_modes(paging_modes):
     return mode
 
 
-def macros_parser(_path=[join(dirname(__file__), 'env/arch_test_unpriv.h'),
-                         join(dirname(__file__), 'env/arch_test_priv.h')]):
-    
-    macros = []
+def arch_test_macros(_path=arch_test_headers):
+    """
+        returns the macros checked with #ifdef in the arch_test headers, which
+        the tests can enable as compile macros.
+
+        The headers are parsed once; the result is reused until the path,
+        modification time or size of one of the headers changes.
+
+        :param _path: paths of the headers to be parsed
+        :return: frozenset of the macro names
+    """
+    key = tuple((path, stat(path).st_mtime_ns, stat(path).st_size)
+                for path in _path)
+    try:
+        return macros_memo[key]
+    except KeyError:
+        pass
+
+    macros = set()
 
     for arch_test_path in _path:
 
@@ -1413,6 +1812,15 @@ def macros_parser(_path=[join(dirname(__file__), 'env/arch_test_unpriv.h'),
             if '#ifdef' in line:
                 pref = line[0:line.find('#ifdef')]
                 if '//' not in pref and '/*' not in pref:
-                    macros.append(line[line.find('#ifdef') + 6:].strip('\n '))
-    
-    return list(set(macros))
+                    macros.add(line[line.find('#ifdef') + 6:].strip('\n '))
+
+    macros_memo[key] = frozenset(macros)
+    return macros_memo[key]
+
+
+def macros_parser(_path=arch_test_headers):
+    """
+        returns the macros checked with #ifdef in the arch_test headers as a
+        list. See arch_test_macros.
+    """
+    return list(arch_test_macros(tuple(_path)))